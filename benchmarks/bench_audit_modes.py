@@ -0,0 +1,75 @@
+"""
+Confronto di latenza di validate_luhn(log_audit=True) tra le modalità di audit.
+
+- sincrona: scrittura diretta con log_validation_to_csv
+- locked: LockedAuditSink (buffer + write atomica sotto lock)
+- async: AsyncAuditWriter (coda limitata + thread in background)
+
+Uso:
+    python benchmarks/bench_audit_modes.py [numero_validazioni]
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "core"))
+
+from luhnalgorithm import validate_luhn
+from luhn_audit_sink import AsyncAuditWriter, LockedAuditSink
+from luhn_metrics import LatencyHistogram
+
+CARDS = ["4111111111111111", "5555555555554444", "378282246310005", "4111111111111112"]
+
+
+def bench_mode(name: str, iterations: int, audit_file: str, sink=None) -> LatencyHistogram:
+    """Misura la latenza per chiamata vista dal chiamante."""
+    histogram = LatencyHistogram(name, name)
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(audit_file))
+    try:
+        for i in range(iterations):
+            card = CARDS[i % len(CARDS)]
+            start_ns = time.perf_counter_ns()
+            validate_luhn(card, log_audit=True, audit_sink=sink)
+            histogram.observe_ns(time.perf_counter_ns() - start_ns)
+    finally:
+        os.chdir(cwd)
+    return histogram
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    # Il logging per riga dominerebbe la misura
+    logging.getLogger("luhnalgorithm").setLevel(logging.WARNING)
+    
+    print("=" * 70)
+    print(f"LATENZA AUDIT PER CHIAMATA ({iterations} validazioni)")
+    print("=" * 70)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = [("sincrona", bench_mode("sincrona", iterations, os.path.join(tmp_dir, "validation_audit.csv")))]
+        
+        with LockedAuditSink(os.path.join(tmp_dir, "locked.csv")) as sink:
+            results.append(("locked", bench_mode("locked", iterations, sink.filename, sink)))
+        
+        writer = AsyncAuditWriter(os.path.join(tmp_dir, "async.csv"))
+        results.append(("async", bench_mode("async", iterations, writer.filename, writer)))
+        start = time.perf_counter()
+        writer.close()
+        shutdown_ms = (time.perf_counter() - start) * 1e3
+    
+    print(f"{'Modalità':<10} {'p50 us':>10} {'p99 us':>10} {'max us':>10} {'medio us':>10}")
+    for name, histogram in results:
+        print(
+            f"{name:<10} {histogram.percentile(50) / 1e3:>10.1f} {histogram.percentile(99) / 1e3:>10.1f} "
+            f"{histogram.max_ns / 1e3:>10.1f} {histogram.total_ns / histogram.count / 1e3:>10.1f}"
+        )
+    print(f"\nFlush finale async alla chiusura: {shutdown_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark del motore di cifre di controllo, per schema.
+
+Misura validazione singola, batch e generazione della cifra di controllo.
+
+Uso:
+    python benchmarks/bench_checkdigit.py [numero_valori]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "core"))
+
+from luhn_checkdigit import SCHEMES
+
+
+def _rate(func, count: int) -> float:
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = random.Random(42)
+    
+    print("=" * 72)
+    print(f"MOTORE CIFRE DI CONTROLLO ({count} valori da 16 simboli per schema)")
+    print("=" * 72)
+    print(f"{'Schema':<14} {'singola/s':>14} {'batch/s':>14} {'generazione/s':>16}")
+    
+    for name, scheme in SCHEMES.items():
+        payloads = [''.join(rng.choice(scheme.alphabet) for _ in range(15)) for _ in range(1000)]
+        values = [scheme.append_check_digit(p) for p in payloads]
+        rounds = max(1, count // len(values))
+        total = rounds * len(values)
+        
+        def single():
+            is_valid = scheme.is_valid
+            for _ in range(rounds):
+                for value in values:
+                    is_valid(value)
+        
+        def batch():
+            for _ in range(rounds):
+                scheme.validate_batch(values)
+        
+        def generate():
+            generate_check_digit = scheme.generate_check_digit
+            for _ in range(rounds):
+                for payload in payloads:
+                    generate_check_digit(payload)
+        
+        print(f"{name:<14} {_rate(single, total):>14,.0f} {_rate(batch, total):>14,.0f} "
+              f"{_rate(generate, total):>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
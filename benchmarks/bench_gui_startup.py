@@ -0,0 +1,70 @@
+"""
+Tempo di avvio della GUI (time-to-first-paint) e dell'import del core.
+
+Lancia più volte gui/luhn_gui.py con LUHN_GUI_STARTUP_BENCH=1: la GUI
+stampa i millisecondi dal lancio del modulo al primo disegno della finestra
+ed esce. Senza display si usa la piattaforma Qt 'offscreen'. Misura anche
+l'import di luhnalgorithm, che la GUI rimanda alla prima validazione.
+
+Uso:
+    python benchmarks/bench_gui_startup.py [ripetizioni]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CORE_DIR = str(ROOT / "core")
+GUI_SCRIPT = str(ROOT / "gui" / "luhn_gui.py")
+
+IMPORT_CORE = (
+    "import time; start = time.perf_counter(); import luhnalgorithm; "
+    "print(f'import_ms={(time.perf_counter() - start) * 1000:.1f}')"
+)
+
+
+def run_measure(args, env, key: str) -> float:
+    out = subprocess.run(args, env=env, capture_output=True, text=True, check=True, timeout=60)
+    for line in out.stdout.splitlines():
+        if line.startswith(f"{key}="):
+            return float(line.split("=", 1)[1])
+    raise RuntimeError(f"Misura '{key}' non trovata nell'output:\n{out.stdout}{out.stderr}")
+
+
+def summarize(label: str, samples) -> None:
+    print(f"{label:<32} mediana {statistics.median(samples):8.1f} ms   min {min(samples):8.1f} ms")
+
+
+def main() -> None:
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    # Il core va in testa al PYTHONPATH esistente (es. PyQt6 installato altrove)
+    pythonpath = os.pathsep.join(filter(None, [CORE_DIR, os.environ.get("PYTHONPATH")]))
+    env = dict(os.environ, PYTHONPATH=pythonpath)
+    
+    print("=" * 64)
+    print(f"Avvio GUI e import del core ({repeats} ripetizioni)")
+    print("=" * 64)
+    
+    summarize("import luhnalgorithm", [
+        run_measure([sys.executable, "-c", IMPORT_CORE], env, "import_ms") for _ in range(repeats)
+    ])
+    
+    try:
+        import PyQt6  # noqa: F401
+    except ImportError:
+        print("(PyQt6 non installato: time-to-first-paint non misurato)")
+        return
+    
+    gui_env = dict(env, LUHN_GUI_STARTUP_BENCH="1")
+    if not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY"):
+        gui_env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    summarize("GUI time-to-first-paint", [
+        run_measure([sys.executable, GUI_SCRIPT], gui_env, "first_paint_ms") for _ in range(repeats)
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark di throughput dei backend di hashing per l'audit.
+
+Uso:
+    python benchmarks/bench_hash_backends.py [numero_hash]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "core"))
+
+from luhnalgorithm import available_hash_backends, get_hash_backend
+
+BENCH_KEY = b"chiave-benchmark-non-segreta"
+CARDS = [f"4111111111{i:06d}" for i in range(1000)]
+
+
+def bench_backend(name: str, iterations: int) -> float:
+    """Restituisce gli hash al secondo per il backend indicato."""
+    backend = get_hash_backend(name, BENCH_KEY)
+    digest = backend.digest
+    rounds = max(1, iterations // len(CARDS))
+    
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for card in CARDS:
+            digest(card)
+    elapsed = time.perf_counter() - start
+    
+    return rounds * len(CARDS) / elapsed
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    
+    print("=" * 60)
+    print(f"THROUGHPUT BACKEND DI HASHING ({iterations} hash per backend)")
+    print("=" * 60)
+    
+    results = sorted(
+        ((bench_backend(name, iterations), name) for name in available_hash_backends()),
+        reverse=True
+    )
+    for rate, name in results:
+        keyed = "con chiave" if get_hash_backend(name, BENCH_KEY).keyed else "senza chiave"
+        print(f"{name:<16} {rate:>12,.0f} hash/s   ({keyed})")
+
+
+if __name__ == "__main__":
+    main()
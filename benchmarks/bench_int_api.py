@@ -0,0 +1,61 @@
+"""
+Confronto tra l'API su interi e il percorso str per PAN memorizzati come uint64.
+
+- str: validate_luhn(str(n)) per ogni intero
+- int: validate_luhn_int(n) (divmod su coppie di cifre, nessuna str)
+- batch: validate_luhn_int_batch su array('Q') e, se disponibile, NumPy
+
+Uso:
+    python benchmarks/bench_int_api.py [numero_pan]
+"""
+
+import random
+import sys
+import time
+from array import array
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "core"))
+
+from luhnalgorithm import validate_luhn, validate_luhn_int, validate_luhn_int_batch
+
+
+def measure(label: str, count: int, func) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {count / elapsed:>14,.0f} PAN/s  {elapsed * 1e9 / count:>8.0f} ns/PAN")
+    return elapsed
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(0)
+    numbers = [rng.randrange(10 ** 15, 10 ** 16) for _ in range(count)]
+    packed = array('Q', numbers)
+    
+    print("=" * 72)
+    print(f"API su interi vs str - {count:,} PAN a 16 cifre")
+    print("=" * 72)
+    
+    baseline = measure("validate_luhn(str(n))", count, lambda: [validate_luhn(str(n)) for n in numbers])
+    single = measure("validate_luhn_int(n)", count, lambda: [validate_luhn_int(n) for n in numbers])
+    batch = measure("validate_luhn_int_batch(array('Q'))", count, lambda: validate_luhn_int_batch(packed))
+    
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is not None:
+        values = numpy.array(numbers, dtype=numpy.uint64)
+        vectorized = measure("validate_luhn_int_batch(numpy.uint64)", count, lambda: validate_luhn_int_batch(values))
+        print(f"Speedup NumPy vs str:  {baseline / vectorized:.1f}x")
+    else:
+        print("(NumPy non installato: percorso vettoriale non misurato)")
+    
+    print(f"Speedup int vs str:    {baseline / single:.2f}x")
+    print(f"Speedup batch vs str:  {baseline / batch:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Picco di memoria della validazione batch in modalità a memoria limitata.
+
+Genera file CSV di dimensione crescente (fino a 10M righe per default) e
+valida ognuno in un processo separato con memory_ceiling e
+ChunkedResultSink, riportando picco di RSS e throughput. Con memoria
+limitata il picco deve restare piatto al crescere delle righe.
+
+Uso:
+    python benchmarks/bench_memory_ceiling.py [righe_massime] [tetto_MiB]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CORE_DIR = str(Path(__file__).resolve().parent.parent / "core")
+CARDS = [b"4111111111111111", b"5555555555554444", b"4111111111111112", b"378282246310005"]
+
+WORKER = """
+import logging, resource, sys
+logging.disable(logging.INFO)
+from luhnalgorithm import validate_cards_from_csv
+from luhn_memory import ChunkedResultSink
+sink = ChunkedResultSink(lambda chunk: None)
+validate_cards_from_csv(sys.argv[1], enable_audit=False, result_sink=sink,
+                        collect_results=False, memory_ceiling=int(sys.argv[2]))
+print(sink.rows_written, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def write_cards_csv(path: str, rows: int) -> None:
+    block = b"\n".join(CARDS[i % len(CARDS)] for i in range(10000)) + b"\n"
+    with open(path, 'wb') as f:
+        f.write(b"card_number\n")
+        for _ in range(rows // 10000):
+            f.write(block)
+        f.write(b"".join(CARDS[i % len(CARDS)] + b"\n" for i in range(rows % 10000)))
+
+
+def main() -> None:
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    ceiling = (int(sys.argv[2]) if len(sys.argv) > 2 else 256) * 1024 * 1024
+    sizes = []
+    rows = 10_000
+    while rows < max_rows:
+        sizes.append(rows)
+        rows *= 10
+    sizes.append(max_rows)
+    
+    env = dict(os.environ, PYTHONPATH=CORE_DIR)
+    print("=" * 60)
+    print(f"Modalità a memoria limitata (tetto {ceiling // (1024 * 1024)} MiB)")
+    print("=" * 60)
+    print(f"{'righe':>12} {'picco RSS':>12} {'righe/s':>12}")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            csv_file = os.path.join(tmp, f"cards_{rows}.csv")
+            write_cards_csv(csv_file, rows)
+            start = time.perf_counter()
+            out = subprocess.run(
+                [sys.executable, "-c", WORKER, csv_file, str(ceiling)],
+                env=env, capture_output=True, text=True, check=True
+            )
+            elapsed = time.perf_counter() - start
+            done, peak_kib = map(int, out.stdout.split())
+            print(f"{done:>12,} {peak_kib / 1024:>9.1f} MiB {done / elapsed:>12,.0f}")
+            os.remove(csv_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark dell'overhead delle metriche su validate_luhn.
+
+Uso:
+    python benchmarks/bench_metrics_overhead.py [numero_validazioni]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "core"))
+
+from luhnalgorithm import validate_luhn
+from luhn_metrics import METRICS, VALIDATION_LATENCY, enable_metrics, disable_metrics
+
+CARDS = ["4111111111111111", "5555555555554444", "378282246310005", "4111111111111112"]
+
+
+class _DiscardSink:
+    """Sink di audit che scarta i record: misura hash e tipo carta senza I/O."""
+    
+    def write(self, record: dict) -> None:
+        pass
+
+
+def bench(iterations: int, audit_sink=None) -> float:
+    """Restituisce i nanosecondi medi per validazione."""
+    rounds = max(1, iterations // len(CARDS))
+    log_audit = audit_sink is not None
+    start = time.perf_counter_ns()
+    for _ in range(rounds):
+        for card in CARDS:
+            validate_luhn(card, log_audit=log_audit, audit_sink=audit_sink)
+    return (time.perf_counter_ns() - start) / (rounds * len(CARDS))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 400_000
+    
+    print("=" * 60)
+    print(f"OVERHEAD METRICHE ({iterations} validazioni)")
+    print("=" * 60)
+    
+    for label, sink in (("senza audit", None), ("con audit (sink nullo)", _DiscardSink())):
+        disable_metrics()
+        bench(iterations // 10, sink)  # warm-up
+        disabled_ns = bench(iterations, sink)
+        
+        enable_metrics()
+        enabled_ns = bench(iterations, sink)
+        disable_metrics()
+        
+        print(f"[{label}]")
+        print(f"  Metriche disabilitate: {disabled_ns:8.0f} ns/validazione")
+        print(f"  Metriche abilitate:    {enabled_ns:8.0f} ns/validazione "
+              f"(+{enabled_ns - disabled_ns:.0f} ns)")
+    print(f"Latenza p50/p99 registrata: {VALIDATION_LATENCY.percentile(50)} / "
+          f"{VALIDATION_LATENCY.percentile(99)} ns")
+    METRICS.reset()
+
+
+if __name__ == "__main__":
+    main()
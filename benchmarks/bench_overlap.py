@@ -0,0 +1,70 @@
+"""
+Benchmark del confronto out-of-core tra due feed (default 100M righe ciascuno).
+
+Genera due feed sintetici di numeri a 16 cifre (prefisso di test, non PAN
+reali) con una frazione di righe in comune, esegue find_overlap e riporta
+tempo, throughput, spazio di spill e picco di RSS del processo.
+
+Uso:
+    python benchmarks/bench_overlap.py [righe_per_feed] [memoria_MiB] [quota_comune]
+"""
+
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "core"))
+
+from luhn_overlap import OverlapSource, find_overlap
+
+PREFIX = "999999"
+
+
+def write_feed(path: str, rows: int, first: int) -> None:
+    """Scrive righe consecutive a partire da first (le sovrapposizioni sono controllate)."""
+    with open(path, 'w', encoding='ascii') as f:
+        f.write("card_number\n")
+        batch = 100_000
+        for start in range(first, first + rows, batch):
+            stop = min(start + batch, first + rows)
+            f.write("".join(f"{PREFIX}{n:010d}\n" for n in range(start, stop)))
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000_000
+    memory_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    common = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    
+    print("=" * 60)
+    print(f"Overlap out-of-core: {rows:,} righe per feed, budget {memory_mb} MiB")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        left = os.path.join(tmp, "nuovo.csv")
+        right = os.path.join(tmp, "vecchio.csv")
+        start = time.perf_counter()
+        write_feed(left, rows, 0)
+        write_feed(right, rows, int(rows * (1 - common)))
+        print(f"Generazione feed:   {time.perf_counter() - start:8.1f} s "
+              f"({2 * os.path.getsize(left) / 1e9:.2f} GB)")
+        
+        start = time.perf_counter()
+        report = find_overlap(
+            OverlapSource(left), OverlapSource(right),
+            memory_budget=memory_mb * 1024 * 1024, work_dir=tmp
+        )
+        elapsed = time.perf_counter() - start
+        
+        digest_rows = report.left_rows + report.right_rows
+        print(f"find_overlap:       {elapsed:8.1f} s ({digest_rows / elapsed:,.0f} righe/s)")
+        print(f"Partizioni:         {report.partitions}")
+        print(f"Spill su disco:     {digest_rows * 40 / 1e9:8.2f} GB (digest sha3_256 + riga)")
+        print(f"Carte in comune:    {report.common_cards:,}")
+        print(f"Picco RSS:          {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
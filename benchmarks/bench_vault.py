@@ -0,0 +1,75 @@
+"""
+Throughput del vault di tokenizzazione: chiamate singole e batch.
+
+Misura tokenize/tokenize_many su PAN nuovi, detokenize con cache fredda e
+calda e detokenize_many, su un vault sqlite3 temporaneo. I PAN sono
+sintetici (prefisso di test, checksum di Luhn valido).
+
+Uso:
+    python benchmarks/bench_vault.py [numero_pan]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "core"))
+
+from luhn_checkdigit import LUHN
+from luhn_vault import TokenVault
+
+KEY = b"chiave-di-benchmark"
+
+
+def synthetic_pans(count: int, start: int = 0):
+    return [LUHN.append_check_digit(f"999999{n:09d}") for n in range(start, start + count)]
+
+
+def measure(label: str, count: int, func) -> None:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {count / elapsed:>12,.0f} op/s  {elapsed * 1e6 / count:>8.1f} µs/op")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    single = synthetic_pans(count)
+    bulk = synthetic_pans(count, start=count)
+    
+    print("=" * 70)
+    print(f"Vault di tokenizzazione - {count:,} PAN per scenario")
+    print("=" * 70)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vault.db")
+        with TokenVault(path, key=KEY, cache_size=2 * count) as vault:
+            single_tokens = []
+            measure("tokenize (singolo, PAN nuovi)", count,
+                    lambda: single_tokens.extend(vault.tokenize(pan) for pan in single))
+            measure("tokenize (singolo, già nel vault)", count,
+                    lambda: [vault.tokenize(pan) for pan in single])
+            bulk_tokens = []
+            measure("tokenize_many (batch da 1000)", count,
+                    lambda: [bulk_tokens.extend(vault.tokenize_many(bulk[i:i + 1000]))
+                             for i in range(0, count, 1000)])
+            measure("detokenize (singolo, cache calda)", count,
+                    lambda: [vault.detokenize(token) for token in single_tokens])
+        
+        with TokenVault(path, key=KEY, cache_size=0) as vault:
+            measure("detokenize (singolo, senza cache)", count,
+                    lambda: [vault.detokenize(token) for token in single_tokens])
+            measure("detokenize_many (batch da 1000)", count,
+                    lambda: [vault.detokenize_many(bulk_tokens[i:i + 1000])
+                             for i in range(0, count, 1000)])
+        
+        start = time.perf_counter()
+        with TokenVault(path, key=KEY) as vault:
+            size = len(vault)
+        print(f"Apertura e caricamento indice ({size:,} token): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Analisi incrementale del file di audit in un solo passaggio.
+
+Calcola il tasso di validità per tipo di carta, per ora del giorno e per
+lunghezza della carta, salvando i totali in un file di riepilogo compatto
+insieme all'offset in byte già elaborato. Le esecuzioni successive leggono
+solo le righe accodate dopo quell'offset.
+
+Uso da riga di comando:
+    python luhn_audit_analytics.py validation_audit.csv [--summary riepilogo.json]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from luhnalgorithm import AUDIT_LOG_FILE
+
+SUMMARY_VERSION = 2
+DEFAULT_SUMMARY_SUFFIX = ".summary.json"
+
+
+class AuditSummary:
+    """Totali materializzati dell'audit: [validi, totali] per dimensione."""
+    
+    def __init__(self, audit_file: str):
+        self.audit_file = audit_file
+        self.offset = 0
+        self.header = ""
+        self.device = 0
+        self.inode = 0
+        self.first_row_hash = ""
+        self.rows = 0
+        self.by_card_type: Dict[str, List[int]] = {}
+        self.by_hour: Dict[str, List[int]] = {}
+        self.by_length: Dict[str, List[int]] = {}
+        self.updated: Optional[str] = None
+    
+    def add(self, card_type: str, hour: str, length: str, is_valid: bool) -> None:
+        """Aggiunge una validazione ai totali."""
+        valid = 1 if is_valid else 0
+        for table, key in ((self.by_card_type, card_type), (self.by_hour, hour), (self.by_length, length)):
+            counts = table.get(key)
+            if counts is None:
+                table[key] = [valid, 1]
+            else:
+                counts[0] += valid
+                counts[1] += 1
+        self.rows += 1
+    
+    def to_dict(self) -> dict:
+        return {
+            'version': SUMMARY_VERSION,
+            'audit_file': self.audit_file,
+            'offset': self.offset,
+            'header': self.header,
+            'device': self.device,
+            'inode': self.inode,
+            'first_row_hash': self.first_row_hash,
+            'rows': self.rows,
+            'by_card_type': self.by_card_type,
+            'by_hour': self.by_hour,
+            'by_length': self.by_length,
+            'updated': self.updated,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "AuditSummary":
+        summary = cls(data['audit_file'])
+        summary.offset = data['offset']
+        summary.header = data['header']
+        summary.device = data['device']
+        summary.inode = data['inode']
+        summary.first_row_hash = data['first_row_hash']
+        summary.rows = data['rows']
+        summary.by_card_type = data['by_card_type']
+        summary.by_hour = data['by_hour']
+        summary.by_length = data['by_length']
+        summary.updated = data.get('updated')
+        return summary
+    
+    def report(self) -> str:
+        """Restituisce il report testuale dei tassi di validità."""
+        lines = [f"Audit: {self.audit_file} - {self.rows} validazioni"]
+        sections = (
+            ("Tipo carta", self.by_card_type, lambda key: key),
+            ("Ora", self.by_hour, lambda key: int(key) if key.isdigit() else 99),
+            ("Lunghezza", self.by_length, lambda key: int(key) if key.isdigit() else 99),
+        )
+        for title, table, sort_key in sections:
+            lines.append("")
+            lines.append(f"{title:<18} {'Valide':>10} {'Totale':>10} {'% valide':>9}")
+            lines.append("-" * 50)
+            for key in sorted(table, key=sort_key):
+                valid, total = table[key]
+                lines.append(f"{key:<18} {valid:>10} {total:>10} {100 * valid / total:>8.1f}%")
+        return "\n".join(lines)
+
+
+def _default_summary_file(audit_file: str) -> str:
+    return f"{audit_file}{DEFAULT_SUMMARY_SUFFIX}"
+
+
+def load_summary(summary_file: str) -> Optional[AuditSummary]:
+    """Carica un riepilogo salvato, o None se assente o di versione diversa."""
+    try:
+        with open(summary_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    if data.get('version') != SUMMARY_VERSION:
+        return None
+    return AuditSummary.from_dict(data)
+
+
+def save_summary(summary_file: str, summary: AuditSummary) -> None:
+    """Salva il riepilogo in modo atomico."""
+    tmp_path = f"{summary_file}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary.to_dict(), f, separators=(',', ':'))
+    os.replace(tmp_path, summary_file)
+
+
+def update_summary(audit_file: str = AUDIT_LOG_FILE, summary_file: Optional[str] = None) -> AuditSummary:
+    """
+    Aggiorna il riepilogo con le righe accodate dall'ultima esecuzione.
+    
+    Il riepilogo salva l'identità del file (device, inode e hash della prima
+    riga di dati): se il file di audit è stato ruotato o troncato e
+    riscritto, anche con un header uguale e una dimensione maggiore
+    dell'offset, il riepilogo viene ricalcolato da zero. Una riga finale
+    incompleta (scrittura in corso) viene lasciata alla prossima esecuzione.
+    
+    Args:
+        audit_file: File CSV di audit
+        summary_file: File di riepilogo (default: '<audit>.summary.json')
+        
+    Returns:
+        Riepilogo aggiornato
+    """
+    summary_file = summary_file or _default_summary_file(audit_file)
+    summary = load_summary(summary_file)
+    
+    with open(audit_file, 'rb') as raw:
+        header = raw.readline()
+        header_text = header.decode('utf-8').strip()
+        first_row = raw.readline()
+        first_row_hash = hashlib.sha256(first_row).hexdigest() if first_row.endswith(b'\n') else ""
+        stat = os.fstat(raw.fileno())
+        
+        if (summary is None or summary.header != header_text or summary.offset > stat.st_size
+                or (summary.device, summary.inode) != (stat.st_dev, stat.st_ino)
+                or summary.first_row_hash not in ("", first_row_hash)
+                or os.path.abspath(summary.audit_file) != os.path.abspath(audit_file)):
+            summary = AuditSummary(audit_file)
+            summary.header = header_text
+            summary.device = stat.st_dev
+            summary.inode = stat.st_ino
+            summary.offset = len(header)
+        if not summary.first_row_hash:
+            # Nessuna riga di dati completa al riepilogo precedente: l'offset è
+            # ancora a fine header, quindi il file va letto comunque da lì
+            summary.first_row_hash = first_row_hash
+        
+        if not header.endswith(b'\n'):
+            # Header non ancora completo
+            return summary
+        
+        fieldnames = next(csv.reader([header_text]))
+        try:
+            i_timestamp = fieldnames.index('timestamp')
+            i_valid = fieldnames.index('is_valid')
+            i_type = fieldnames.index('card_type')
+            i_length = fieldnames.index('card_length')
+        except ValueError as e:
+            raise ValueError(f"Header di audit non riconosciuto: {e}")
+        
+        raw.seek(summary.offset)
+        offset = summary.offset
+        add = summary.add
+        for line in raw:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            fields = next(csv.reader([line.decode('utf-8')]))
+            if len(fields) < len(fieldnames):
+                continue
+            is_valid = fields[i_valid]
+            # Solo righe di validazione (Si/No); eventuali record di servizio vengono ignorati
+            if is_valid not in ('Si', 'No'):
+                continue
+            add(fields[i_type], fields[i_timestamp][11:13], fields[i_length], is_valid == 'Si')
+        summary.offset = offset
+    
+    summary.updated = datetime.now().isoformat()
+    save_summary(summary_file, summary)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Punto di ingresso da riga di comando."""
+    parser = argparse.ArgumentParser(description="Report incrementale del file di audit")
+    parser.add_argument("audit_file", nargs='?', default=AUDIT_LOG_FILE, help="File CSV di audit")
+    parser.add_argument("--summary", help="File di riepilogo (default: <audit>.summary.json)")
+    args = parser.parse_args(argv)
+    
+    try:
+        summary = update_summary(args.audit_file, args.summary)
+    except FileNotFoundError:
+        parser.error(f"File di audit non trovato: {args.audit_file}")
+    print(summary.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Catena di hash a prova di manomissione per il file di audit.
+
+Ogni record di un audit "a catena" contiene, oltre alle colonne di
+AUDIT_FIELDNAMES, il numero di sequenza, il digest del record precedente
+(prev_hash) e il proprio digest (record_hash, SHA-256 di tutti i campi).
+Modificare, eliminare o riordinare una riga rompe la catena da quel punto.
+
+Ogni checkpoint_every record di validazione viene aggiunto un record di
+checkpoint firmato con HMAC-SHA256 (is_valid='CHECKPOINT', firma nella
+colonna card_hash): senza la chiave non si può ricalcolare una catena
+alterata fino a un checkpoint valido.
+
+La verifica è incrementale: lo stato (offset e digest dell'ultimo checkpoint
+verificato, a sua volta autenticato con HMAC) viene salvato in
+'<audit>.chain.json' e la verifica successiva riparte da lì, con costo
+proporzionale ai soli record nuovi.
+
+Uso da riga di comando:
+    LUHN_AUDIT_CHAIN_KEY=... python luhn_audit_chain.py validation_audit.csv [--full]
+"""
+
+import argparse
+import csv
+import hashlib
+import hmac
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from luhn_audit_sink import DEFAULT_BUFFER_RECORDS, _O_BINARY, _FileLock
+from luhn_metrics import METRICS, AUDIT_WRITE_LATENCY
+from luhn_profiling import span, STAGE_AUDIT_IO
+from luhnalgorithm import AUDIT_FIELDNAMES
+
+CHAIN_KEY_ENV_VAR = "LUHN_AUDIT_CHAIN_KEY"
+CHAIN_FIELDNAMES = AUDIT_FIELDNAMES + ['seq', 'prev_hash', 'record_hash']
+CHAIN_STATE_VERSION = 1
+DEFAULT_CHECKPOINT_RECORDS = 1000
+DEFAULT_STATE_SUFFIX = ".chain.json"
+GENESIS_HASH = "0" * 64
+CHECKPOINT_MARKER = "CHECKPOINT"
+
+_CHAIN_HEADER = (",".join(CHAIN_FIELDNAMES) + "\r\n").encode('ascii')
+_I_SEQ = CHAIN_FIELDNAMES.index('seq')
+_I_PREV = CHAIN_FIELDNAMES.index('prev_hash')
+_I_HASH = CHAIN_FIELDNAMES.index('record_hash')
+_I_VALID = CHAIN_FIELDNAMES.index('is_valid')
+_I_SIGNATURE = CHAIN_FIELDNAMES.index('card_hash')
+_TAIL_BYTES = 4096
+
+
+def chain_key(key: Optional[bytes] = None) -> bytes:
+    """Chiave di firma dei checkpoint (parametro o variabile d'ambiente)."""
+    if key is None:
+        env_key = os.environ.get(CHAIN_KEY_ENV_VAR)
+        if not env_key:
+            raise ValueError(
+                f"La catena di audit richiede una chiave di firma (parametro key o {CHAIN_KEY_ENV_VAR})"
+            )
+        key = env_key.encode()
+    return key
+
+
+def record_digest(fields: Iterable[str]) -> str:
+    """Digest di un record: SHA-256 dei campi fino a prev_hash compreso."""
+    return hashlib.sha256("\x1f".join(fields).encode('utf-8')).hexdigest()
+
+
+def checkpoint_signature(key: bytes, seq: int, prev_hash: str) -> str:
+    """Firma HMAC-SHA256 della testa della catena al numero di sequenza seq."""
+    return hmac.new(key, f"{seq}:{prev_hash}".encode('ascii'), hashlib.sha256).hexdigest()
+
+
+def _chain_fields(record: dict, seq: int, prev_hash: str) -> List[str]:
+    fields = [str(record[name]) for name in AUDIT_FIELDNAMES]
+    fields.append(str(seq))
+    fields.append(prev_hash)
+    fields.append(record_digest(fields))
+    return fields
+
+
+def _parse_line(line: bytes) -> List[str]:
+    return next(csv.reader([line.decode('utf-8')]))
+
+
+def _read_at(fd: int, offset: int, length: int) -> bytes:
+    """Legge length byte dall'offset (os.pread non esiste su Windows)."""
+    os.lseek(fd, offset, os.SEEK_SET)
+    parts = []
+    while length > 0:
+        data = os.read(fd, length)
+        if not data:
+            break
+        parts.append(data)
+        length -= len(data)
+    return b"".join(parts)
+
+
+def _chain_tail(fd: int, size: int) -> Tuple[int, str, int]:
+    """
+    (seq, record_hash, record dopo l'ultimo checkpoint) della testa della catena.
+    
+    Il file viene letto all'indietro a blocchi fino all'ultimo checkpoint,
+    quindi al più checkpoint_every record.
+    """
+    header_size = len(_CHAIN_HEADER)
+    if _read_at(fd, 0, header_size) != _CHAIN_HEADER:
+        raise ValueError("Il file di audit non è in formato a catena (header diverso)")
+    
+    head: Optional[Tuple[int, str]] = None
+    since_checkpoint = 0
+    position = size
+    carry = b""
+    while position > header_size:
+        start = max(header_size, position - _TAIL_BYTES)
+        lines = (_read_at(fd, start, position - start) + carry).split(b"\n")
+        if position == size:
+            if lines.pop():
+                raise ValueError("Ultimo record della catena incompleto")
+        position = start
+        # Il primo pezzo è completo solo se il blocco parte subito dopo l'header
+        carry = lines.pop(0) if position > header_size else b""
+        for line in reversed(lines):
+            fields = _parse_line(line)
+            if head is None:
+                head = int(fields[_I_SEQ]), fields[_I_HASH]
+            if fields[_I_VALID] == CHECKPOINT_MARKER:
+                return head[0], head[1], since_checkpoint
+            since_checkpoint += 1
+    
+    if head is None:
+        return 0, GENESIS_HASH, 0
+    return head[0], head[1], since_checkpoint
+
+
+class ChainedAuditSink:
+    """
+    Sink di audit con catena di hash e checkpoint firmati.
+    
+    Come LockedAuditSink bufferizza i record e li accoda sotto file lock;
+    la testa della catena viene riletta dal file sotto lock, quindi più
+    processi possono scrivere la stessa catena.
+    
+    Args:
+        filename: File CSV di audit a catena (colonne CHAIN_FIELDNAMES)
+        key: Chiave di firma dei checkpoint (default: LUHN_AUDIT_CHAIN_KEY)
+        checkpoint_every: Record di validazione tra due checkpoint firmati
+        buffer_records: Numero di record accumulati prima di una scrittura
+    """
+    
+    def __init__(
+        self,
+        filename: str,
+        key: Optional[bytes] = None,
+        checkpoint_every: int = DEFAULT_CHECKPOINT_RECORDS,
+        buffer_records: int = DEFAULT_BUFFER_RECORDS
+    ):
+        self.filename = filename
+        self.checkpoint_every = checkpoint_every
+        self.buffer_records = buffer_records
+        self._key = chain_key(key)
+        self._buffer: List[dict] = []
+        # Testa della catena dopo l'ultima scrittura di questo sink:
+        # ((st_ino, dimensione), seq, prev_hash, record dopo l'ultimo checkpoint)
+        self._tail: Optional[Tuple[Tuple[int, int], int, str, int]] = None
+    
+    def write(self, record: dict) -> None:
+        """Aggiunge un record al buffer (scrive quando il buffer è pieno)."""
+        self._buffer.append(record)
+        if len(self._buffer) >= self.buffer_records:
+            self.flush()
+    
+    def write_many(self, records: Iterable[dict]) -> None:
+        for record in records:
+            self.write(record)
+    
+    def flush(self, checkpoint: bool = False) -> None:
+        """Scrive i record nel buffer; con checkpoint=True chiude con un checkpoint."""
+        if not self._buffer and not checkpoint:
+            return
+        records, self._buffer = self._buffer, []
+        
+        with span(STAGE_AUDIT_IO), _FileLock(f"{self.filename}.lock"):
+            if METRICS.enabled:
+                start_ns = time.perf_counter_ns()
+            fd = os.open(self.filename, os.O_RDWR | os.O_APPEND | os.O_CREAT | _O_BINARY, 0o644)
+            try:
+                stat = os.fstat(fd)
+                size = stat.st_size
+                if size == 0:
+                    os.write(fd, _CHAIN_HEADER)
+                    size = len(_CHAIN_HEADER)
+                if self._tail is not None and self._tail[0] == (stat.st_ino, size):
+                    _, seq, prev_hash, since_checkpoint = self._tail
+                else:
+                    # Il file è cambiato (altro processo o primo flush): rilegge la testa
+                    seq, prev_hash, since_checkpoint = _chain_tail(fd, size)
+                
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, lineterminator='\r\n')
+                for record in records:
+                    seq += 1
+                    fields = _chain_fields(record, seq, prev_hash)
+                    writer.writerow(fields)
+                    prev_hash = fields[_I_HASH]
+                    since_checkpoint += 1
+                    if since_checkpoint >= self.checkpoint_every:
+                        seq += 1
+                        fields = self._checkpoint_fields(seq, prev_hash)
+                        writer.writerow(fields)
+                        prev_hash = fields[_I_HASH]
+                        since_checkpoint = 0
+                if checkpoint and since_checkpoint > 0:
+                    seq += 1
+                    fields = self._checkpoint_fields(seq, prev_hash)
+                    writer.writerow(fields)
+                    prev_hash = fields[_I_HASH]
+                    since_checkpoint = 0
+                
+                data = buffer.getvalue().encode('utf-8')
+                view = memoryview(data)
+                while view:
+                    written = os.write(fd, view)
+                    view = view[written:]
+                self._tail = (stat.st_ino, size + len(data)), seq, prev_hash, since_checkpoint
+            finally:
+                os.close(fd)
+            if METRICS.enabled:
+                AUDIT_WRITE_LATENCY.observe_ns(time.perf_counter_ns() - start_ns)
+    
+    def _checkpoint_fields(self, seq: int, prev_hash: str) -> List[str]:
+        record = {
+            'timestamp': datetime.now().isoformat(),
+            'card_hash': checkpoint_signature(self._key, seq, prev_hash),
+            'hash_algorithm': 'checkpoint',
+            'is_valid': CHECKPOINT_MARKER,
+            'card_type': '',
+            'card_length': '',
+        }
+        return _chain_fields(record, seq, prev_hash)
+    
+    def checkpoint(self) -> None:
+        """Scrive i record in sospeso seguiti da un checkpoint firmato."""
+        self.flush(checkpoint=True)
+    
+    def close(self) -> None:
+        self.checkpoint()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ChainVerification:
+    """Esito di una verifica della catena."""
+    
+    def __init__(self, audit_file: str):
+        self.audit_file = audit_file
+        self.ok = True
+        self.error = ""
+        self.error_offset: Optional[int] = None
+        self.resumed_from = 0
+        self.records_verified = 0
+        self.checkpoints_verified = 0
+        self.last_seq = 0
+        self.unsigned_records = 0
+    
+    def fail(self, offset: int, message: str) -> "ChainVerification":
+        self.ok = False
+        self.error = message
+        self.error_offset = offset
+        return self
+    
+    def report(self) -> str:
+        """Restituisce il report testuale."""
+        status = "OK" if self.ok else f"MANOMESSO all'offset {self.error_offset}: {self.error}"
+        return "\n".join([
+            f"Audit: {self.audit_file} - {status}",
+            f"Ripresa dall'offset {self.resumed_from}",
+            f"Record verificati: {self.records_verified} ({self.checkpoints_verified} checkpoint)",
+            f"Ultima sequenza: {self.last_seq}, record dopo l'ultimo checkpoint: {self.unsigned_records}",
+        ])
+
+
+def _default_state_file(audit_file: str) -> str:
+    return f"{audit_file}{DEFAULT_STATE_SUFFIX}"
+
+
+def _state_mac(key: bytes, state: dict) -> str:
+    payload = json.dumps({k: v for k, v in state.items() if k != 'mac'}, sort_keys=True)
+    return hmac.new(key, payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def load_chain_state(state_file: str, key: bytes, audit_file: str) -> Optional[dict]:
+    """Carica lo stato di verifica, o None se assente, di un altro file o non autentico."""
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if (state.get('version') != CHAIN_STATE_VERSION
+            or os.path.abspath(state.get('audit_file', '')) != os.path.abspath(audit_file)
+            or not hmac.compare_digest(state.get('mac', ''), _state_mac(key, state))):
+        return None
+    return state
+
+
+def save_chain_state(state_file: str, key: bytes, state: dict) -> None:
+    """Salva lo stato (autenticato con HMAC) in modo atomico."""
+    state = dict(state, version=CHAIN_STATE_VERSION)
+    state['mac'] = _state_mac(key, state)
+    tmp_path = f"{state_file}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_file)
+
+
+def verify_chain(
+    audit_file: str,
+    key: Optional[bytes] = None,
+    state_file: Optional[str] = None,
+    full: bool = False
+) -> ChainVerification:
+    """
+    Verifica la catena dall'ultimo checkpoint verificato.
+    
+    Il checkpoint di ripresa viene riletto e confrontato con lo stato
+    salvato (un file troncato o riscritto da lì in poi viene rilevato); i
+    record precedenti sono già stati verificati in un'esecuzione passata.
+    Lo stato avanza solo fino all'ultimo checkpoint firmato: i record
+    successivi vengono verificati ma ricontrollati alla prossima esecuzione.
+    
+    Args:
+        audit_file: File di audit a catena
+        key: Chiave di firma (default: LUHN_AUDIT_CHAIN_KEY)
+        state_file: File di stato (default: '<audit>.chain.json')
+        full: Se True ignora lo stato e verifica tutto il file
+        
+    Returns:
+        ChainVerification con esito, conteggi e offset dell'eventuale errore
+    """
+    key = chain_key(key)
+    state_file = state_file or _default_state_file(audit_file)
+    result = ChainVerification(audit_file)
+    state = None if full else load_chain_state(state_file, key, audit_file)
+    
+    with open(audit_file, 'rb') as raw:
+        if raw.readline() != _CHAIN_HEADER:
+            return result.fail(0, "header non in formato a catena")
+        size = os.fstat(raw.fileno()).st_size
+        
+        seq, prev_hash = 0, GENESIS_HASH
+        offset = len(_CHAIN_HEADER)
+        last_checkpoint = None
+        if state is not None:
+            if state['offset'] >= size:
+                return result.fail(state['offset'], "file troncato prima dell'ultimo checkpoint verificato")
+            raw.seek(state['offset'])
+            line = raw.readline()
+            fields = _parse_line(line) if line.endswith(b'\n') else []
+            if len(fields) != len(CHAIN_FIELDNAMES) or fields[_I_HASH] != state['record_hash']:
+                return result.fail(state['offset'], "checkpoint verificato alterato o rimosso")
+            seq, prev_hash = state['seq'], state['record_hash']
+            result.resumed_from = offset = state['offset']
+            offset += len(line)
+        
+        for line in raw:
+            if not line.endswith(b'\n'):
+                # Scrittura in corso: verrà verificato alla prossima esecuzione
+                break
+            fields = _parse_line(line)
+            if len(fields) != len(CHAIN_FIELDNAMES):
+                return result.fail(offset, "numero di colonne errato")
+            if fields[_I_SEQ] != str(seq + 1):
+                return result.fail(offset, f"sequenza {fields[_I_SEQ]} al posto di {seq + 1}")
+            if fields[_I_PREV] != prev_hash:
+                return result.fail(offset, "prev_hash non corrisponde al record precedente")
+            if record_digest(fields[:_I_HASH]) != fields[_I_HASH]:
+                return result.fail(offset, "record_hash non corrisponde al contenuto")
+            seq += 1
+            prev_hash = fields[_I_HASH]
+            
+            if fields[_I_VALID] == CHECKPOINT_MARKER:
+                expected = checkpoint_signature(key, seq, fields[_I_PREV])
+                if not hmac.compare_digest(fields[_I_SIGNATURE], expected):
+                    return result.fail(offset, "firma del checkpoint non valida")
+                result.checkpoints_verified += 1
+                result.unsigned_records = 0
+                last_checkpoint = (offset, seq, prev_hash)
+            else:
+                result.unsigned_records += 1
+            result.records_verified += 1
+            offset += len(line)
+    
+    result.last_seq = seq
+    if last_checkpoint is not None:
+        checkpoint_offset, checkpoint_seq, checkpoint_hash = last_checkpoint
+        save_chain_state(state_file, key, {
+            'audit_file': audit_file,
+            'offset': checkpoint_offset,
+            'seq': checkpoint_seq,
+            'record_hash': checkpoint_hash,
+            'verified': datetime.now().isoformat(),
+        })
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Punto di ingresso da riga di comando (codice di uscita 1 se manomesso)."""
+    parser = argparse.ArgumentParser(description="Verifica incrementale della catena di audit")
+    parser.add_argument("audit_file", help="File CSV di audit a catena")
+    parser.add_argument("--state", help="File di stato (default: <audit>.chain.json)")
+    parser.add_argument("--full", action="store_true", help="Verifica tutto il file ignorando lo stato")
+    args = parser.parse_args(argv)
+    
+    result = verify_chain(args.audit_file, state_file=args.state, full=args.full)
+    print(result.report())
+    if not result.ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,527 @@
+"""
+Sink di audit sicuri con più processi scrittori e scrittura asincrona.
+
+Due modalità per scrivere lo stesso file di audit da più processi:
+
+- LockedAuditSink: ogni processo bufferizza i record e li accoda con una
+  singola write atomica sotto file lock; anche la creazione dell'header
+  avviene sotto lock, quindi non ci sono header duplicati né righe spezzate.
+- QueueAuditWriter: un unico processo scrittore riceve i record dai worker
+  tramite una multiprocessing.Queue e li scrive a blocchi.
+
+AsyncAuditWriter sposta invece la scrittura su un thread in background, con
+una coda limitata e una politica di backpressure configurabile.
+
+I record sono già hashati (build_audit_record) prima di lasciare il processo
+che valida: il numero di carta in chiaro non attraversa mai la coda.
+"""
+
+import atexit
+import csv
+import io
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from luhn_metrics import METRICS, AUDIT_DROPPED, AUDIT_QUEUE_DEPTH, AUDIT_WRITE_LATENCY
+from luhn_profiling import span, STAGE_AUDIT_IO
+from luhnalgorithm import AUDIT_FIELDNAMES, logger, prepare_audit_file
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Su Windows os.open apre in modalità testo senza O_BINARY
+_O_BINARY = getattr(os, 'O_BINARY', 0)
+
+DEFAULT_BUFFER_RECORDS = 256
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_ASYNC_QUEUE_SIZE = 10000
+SPILL_CHUNK_BYTES = 1 << 20
+
+# Politiche di backpressure di AsyncAuditWriter
+BACKPRESSURE_BLOCK = "block"
+BACKPRESSURE_DROP = "drop"
+BACKPRESSURE_SPILL = "spill"
+BACKPRESSURE_POLICIES = (BACKPRESSURE_BLOCK, BACKPRESSURE_DROP, BACKPRESSURE_SPILL)
+
+
+class _FileLock:
+    """
+    Lock esclusivo tra processi basato su un file '<audit>.lock'.
+    
+    Con blocking=False l'acquisizione non attende: se il lock è già
+    detenuto solleva OSError.
+    """
+    
+    def __init__(self, path: str, blocking: bool = True):
+        self.path = path
+        self.blocking = blocking
+        self._fd: Optional[int] = None
+    
+    def __enter__(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX if self.blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK if self.blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+        return False
+
+
+def format_audit_rows(records: Iterable[dict], header: bool = False) -> bytes:
+    """
+    Serializza i record di audit in CSV (UTF-8).
+    
+    Args:
+        records: Record con le colonne di AUDIT_FIELDNAMES
+        header: Se True, antepone la riga di header
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=AUDIT_FIELDNAMES, lineterminator='\r\n')
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue().encode('utf-8')
+
+
+def append_audit_records(filename: str, records: List[dict]) -> None:
+    """
+    Accoda i record al file di audit con una scrittura atomica sotto lock.
+    
+    L'header viene scritto solo se il file è vuoto, controllandolo con il
+    lock acquisito: più processi non possono scriverlo entrambi.
+    """
+    if records:
+        _append_audit_data(filename, format_audit_rows(records))
+
+
+def _append_audit_data(filename: str, data: bytes) -> None:
+    """Accoda righe CSV già serializzate, aggiungendo l'header se il file è vuoto."""
+    _append_audit_chunks(filename, (data,))
+
+
+def _append_audit_chunks(filename: str, chunks: Iterable[bytes]) -> None:
+    """
+    Accoda blocchi di righe CSV già serializzate con un'unica acquisizione del lock.
+    
+    I blocchi possono spezzare una riga: il lock resta acquisito fino
+    all'ultimo, quindi nessun altro scrittore si inserisce in mezzo.
+    Un file con header diverso viene archiviato sotto lock (prepare_audit_file).
+    Con le metriche attive la durata della scrittura sotto lock viene
+    registrata in luhn_audit_write_seconds.
+    """
+    with span(STAGE_AUDIT_IO), _FileLock(f"{filename}.lock"):
+        if METRICS.enabled:
+            start_ns = time.perf_counter_ns()
+        write_header = prepare_audit_file(filename)
+        fd = os.open(filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT | _O_BINARY, 0o644)
+        try:
+            if write_header and os.fstat(fd).st_size == 0:
+                os.write(fd, format_audit_rows((), header=True))
+            for data in chunks:
+                view = memoryview(data)
+                while view:
+                    written = os.write(fd, view)
+                    view = view[written:]
+        finally:
+            os.close(fd)
+        if METRICS.enabled:
+            AUDIT_WRITE_LATENCY.observe_ns(time.perf_counter_ns() - start_ns)
+
+
+class LockedAuditSink:
+    """
+    Sink di audit bufferizzato con scritture atomiche sotto file lock.
+    
+    Args:
+        filename: Path del file CSV di audit
+        buffer_records: Numero di record accumulati prima di una scrittura
+    """
+    
+    def __init__(self, filename: str, buffer_records: int = DEFAULT_BUFFER_RECORDS):
+        self.filename = filename
+        self.buffer_records = buffer_records
+        self._buffer: List[dict] = []
+    
+    def write(self, record: dict) -> None:
+        """Aggiunge un record al buffer (scrive quando il buffer è pieno)."""
+        self._buffer.append(record)
+        if len(self._buffer) >= self.buffer_records:
+            self.flush()
+    
+    def write_many(self, records: Iterable[dict]) -> None:
+        for record in records:
+            self.write(record)
+    
+    def flush(self) -> None:
+        """Scrive su disco i record nel buffer."""
+        if self._buffer:
+            records, self._buffer = self._buffer, []
+            append_audit_records(self.filename, records)
+    
+    def close(self) -> None:
+        self.flush()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class QueueAuditSink:
+    """
+    Estremità di un QueueAuditWriter da passare ai processi worker.
+    
+    Serializzabile (pickle): può essere passata come argomento a un Process
+    o a un Pool. write() accoda il record per il processo scrittore.
+    """
+    
+    def __init__(self, record_queue):
+        self._queue = record_queue
+    
+    def write(self, record: dict) -> None:
+        self._queue.put(record)
+    
+    def write_many(self, records: Iterable[dict]) -> None:
+        for record in records:
+            self._queue.put(record)
+    
+    def flush(self) -> None:
+        pass
+    
+    def close(self) -> None:
+        pass
+
+
+def _queue_writer_loop(record_queue, filename: str, batch_size: int, flush_interval: float) -> None:
+    """Ciclo del processo scrittore: raccoglie record a blocchi e li scrive."""
+    batch: List[dict] = []
+    while True:
+        try:
+            record = record_queue.get(timeout=flush_interval)
+        except queue.Empty:
+            # Coda inattiva: scrive il blocco parziale
+            if batch:
+                append_audit_records(filename, batch)
+                batch = []
+            continue
+        
+        if record is None:
+            break
+        batch.append(record)
+        if len(batch) >= batch_size:
+            append_audit_records(filename, batch)
+            batch = []
+    
+    if batch:
+        append_audit_records(filename, batch)
+
+
+class QueueAuditWriter:
+    """
+    Processo scrittore unico per l'audit, alimentato da una coda.
+    
+    Args:
+        filename: Path del file CSV di audit
+        batch_size: Numero massimo di record per scrittura
+        flush_interval: Secondi di inattività dopo cui il blocco parziale
+            viene scritto
+        context: Contesto multiprocessing (default: quello di sistema)
+        
+    Example:
+        >>> with QueueAuditWriter("validation_audit.csv") as writer:
+        ...     sink = writer.sink()
+        ...     # passare sink ai worker: validate_luhn(..., audit_sink=sink)
+    """
+    
+    def __init__(
+        self,
+        filename: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        context=None
+    ):
+        self.filename = filename
+        ctx = context or multiprocessing.get_context()
+        self._queue = ctx.Queue()
+        self._process = ctx.Process(
+            target=_queue_writer_loop,
+            args=(self._queue, filename, batch_size, flush_interval),
+            name="luhn-audit-writer",
+            daemon=True
+        )
+        self._process.start()
+    
+    def sink(self) -> QueueAuditSink:
+        """Restituisce l'estremità da usare nei processi worker."""
+        return QueueAuditSink(self._queue)
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Scrive i record rimanenti e termina il processo scrittore."""
+        if self._process.is_alive():
+            self._queue.put(None)
+            self._process.join(timeout)
+            if self._process.is_alive():
+                logger.error("Processo scrittore audit non terminato entro il timeout")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class _FlushRequest:
+    """Marcatore in coda: il thread scrittore segnala l'evento dopo aver scritto."""
+    
+    __slots__ = ("done",)
+    
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class AsyncAuditWriter:
+    """
+    Scrittore di audit asincrono con coda limitata.
+    
+    write() accoda il record e ritorna subito; un thread in background svuota
+    la coda a blocchi con scritture atomiche sotto file lock. Quando la coda
+    è piena si applica la politica di backpressure:
+    
+    - "block": il chiamante attende che si liberi spazio (nessuna perdita)
+    - "drop": il record viene scartato e contato in dropped
+    - "spill": il record viene scritto in un file di overflow, riversato
+      nell'audit quando la coda si svuota (ordine non garantito)
+    
+    Args:
+        filename: Path del file CSV di audit
+        max_queue: Capacità massima della coda
+        batch_size: Numero massimo di record per scrittura
+        policy: Politica di backpressure (block, drop, spill)
+        spill_file: File di overflow (default: '<filename>.spill')
+        flush_interval: Secondi di inattività dopo cui il blocco parziale
+            viene scritto
+    """
+    
+    def __init__(
+        self,
+        filename: str,
+        max_queue: int = DEFAULT_ASYNC_QUEUE_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        policy: str = BACKPRESSURE_BLOCK,
+        spill_file: Optional[str] = None,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL
+    ):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Politica di backpressure non supportata: {policy}")
+        
+        self.filename = filename
+        self.batch_size = batch_size
+        self.policy = policy
+        self.spill_file = spill_file or f"{filename}.spill"
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._spill_handle = None
+        self._drain_offset = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="luhn-audit-async", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def write(self, record: dict) -> None:
+        """Accoda un record di audit secondo la politica di backpressure."""
+        if self._closed:
+            raise ValueError("AsyncAuditWriter già chiuso")
+        
+        if self.policy == BACKPRESSURE_BLOCK:
+            self._queue.put(record)
+            return
+        
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            if self.policy == BACKPRESSURE_DROP:
+                self.dropped += 1
+                if METRICS.enabled:
+                    AUDIT_DROPPED.inc()
+            else:
+                self._spill([record])
+    
+    def write_many(self, records: Iterable[dict]) -> None:
+        for record in records:
+            self.write(record)
+    
+    def queue_depth(self) -> int:
+        """Numero di record in attesa di scrittura."""
+        return self._queue.qsize()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attende che i record accodati (e quelli in overflow) siano su disco.
+        
+        Returns:
+            True se lo svuotamento è terminato entro il timeout
+        """
+        if self._closed:
+            return True
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Svuota la coda, ferma il thread e chiude il file di overflow."""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error("Thread di audit asincrono non terminato entro il timeout")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+    
+    def _spill(self, records: List[dict]) -> None:
+        with self._spill_lock:
+            if self._spill_handle is None:
+                self._spill_handle = open(self.spill_file, 'ab')
+            self._spill_handle.write(format_audit_rows(records))
+            self.spilled += len(records)
+    
+    def _drain_spill(self) -> None:
+        """
+        Riversa nell'audit i record finiti nel file di overflow.
+        
+        Un file '.draining' rimasto da un riversamento fallito (anche di un
+        processo precedente) viene completato prima di rinominare il nuovo
+        overflow, che altrimenti lo sovrascriverebbe. Un nuovo tentativo
+        riparte dal primo blocco non ancora scritto.
+        """
+        draining = f"{self.spill_file}.draining"
+        if os.path.exists(draining):
+            self._append_draining(draining)
+        
+        with self._spill_lock:
+            if self._spill_handle is None:
+                return
+            self._spill_handle.close()
+            self._spill_handle = None
+            os.replace(self.spill_file, draining)
+        self._append_draining(draining)
+    
+    def _append_draining(self, draining: str) -> None:
+        with open(draining, 'rb') as f:
+            f.seek(self._drain_offset)
+            _append_audit_chunks(self.filename, self._counted_chunks(f))
+        os.remove(draining)
+        self._drain_offset = 0
+    
+    def _counted_chunks(self, f) -> Iterable[bytes]:
+        """Legge il file di overflow a blocchi fissi contando le righe riversate."""
+        while True:
+            chunk = f.read(SPILL_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+            # Il blocco è stato scritto: avanza solo ora
+            self._drain_offset += len(chunk)
+            self.written += chunk.count(b'\n')
+    
+    def _write_batch(self, batch: List[dict]) -> None:
+        """
+        Scrive un blocco nell'audit.
+        
+        Se la scrittura fallisce, con la politica spill il blocco finisce nel
+        file di overflow e viene ritentato al riversamento successivo; con le
+        altre politiche (o se anche l'overflow fallisce) i record sono
+        contati in dropped.
+        """
+        try:
+            append_audit_records(self.filename, batch)
+            self.written += len(batch)
+            return
+        except Exception as e:
+            logger.error(f"Errore nel logging audit asincrono: {e}")
+        
+        if self.policy == BACKPRESSURE_SPILL:
+            try:
+                self._spill(batch)
+                return
+            except Exception as e:
+                logger.error(f"Errore nella scrittura overflow audit: {e}")
+        self.dropped += len(batch)
+        if METRICS.enabled:
+            AUDIT_DROPPED.inc(amount=len(batch))
+    
+    def _run(self) -> None:
+        batch: List[dict] = []
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            
+            if METRICS.enabled:
+                AUDIT_QUEUE_DEPTH.set(self._queue.qsize())
+            
+            if isinstance(item, dict):
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+                self._write_batch(batch)
+                batch = []
+                continue
+            
+            # Coda inattiva, richiesta di flush o arresto: scrive tutto
+            if batch:
+                self._write_batch(batch)
+                batch = []
+            if item is not None or self._queue.empty():
+                try:
+                    self._drain_spill()
+                except Exception as e:
+                    logger.error(f"Errore nel riversamento overflow audit: {e}")
+            
+            if isinstance(item, _FlushRequest):
+                item.done.set()
+            elif item is _STOP:
+                return
@@ -0,0 +1,330 @@
+"""
+Motore generico per cifre di controllo basato su tabelle precalcolate.
+
+Ogni schema viene compilato una sola volta in tabelle:
+
+- schemi additivi (Luhn, Luhn mod N): una tabella di translate per fase che
+  mappa ogni simbolo al suo contributo; la somma avviene su bytes, senza
+  cicli Python per cifra
+- schemi a transizione (Verhoeff, Damm): una tabella di transizione
+  stato x simbolo per fase, percorsa una volta sull'input
+
+Tutti gli schemi offrono le stesse API: is_valid, validate_batch,
+validate_stream, generate_check_digit e append_check_digit.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+DIGITS = "0123456789"
+ALPHANUMERIC = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def _to_bytes(value) -> bytes:
+    """Converte l'input in bytes ASCII (ValueError se contiene caratteri non ASCII)."""
+    if isinstance(value, str):
+        if not value.isascii():
+            raise ValueError("Il valore contiene caratteri non validi")
+        return value.encode('ascii')
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    return value
+
+
+class CheckDigitScheme:
+    """
+    Base degli schemi di cifra di controllo.
+    
+    Args:
+        name: Nome dello schema
+        alphabet: Simboli ammessi, nell'ordine del loro valore (0..N-1)
+    """
+    
+    def __init__(self, name: str, alphabet: str):
+        self.name = name
+        self.alphabet = alphabet
+        self.modulus = len(alphabet)
+        self._alphabet_bytes = alphabet.encode('ascii')
+        self._value_table = bytes.maketrans(self._alphabet_bytes, bytes(range(self.modulus)))
+    
+    def checksum_ok(self, data: bytes) -> bool:
+        """
+        Verifica il checksum su bytes già controllati (solo simboli dell'alfabeto).
+        
+        Percorso veloce per chi ha già validato il formato dell'input.
+        """
+        raise NotImplementedError
+    
+    def _check_symbols(self, data: bytes) -> None:
+        if not data:
+            raise ValueError("Il valore non può essere vuoto")
+        if data.translate(None, self._alphabet_bytes):
+            raise ValueError(f"Il valore contiene caratteri non ammessi dallo schema {self.name}")
+    
+    def is_valid(self, value) -> bool:
+        """
+        Valida un singolo valore (str, bytes, bytearray o memoryview).
+        
+        Raises:
+            ValueError: Se il valore è vuoto o contiene simboli non ammessi
+        """
+        data = _to_bytes(value)
+        self._check_symbols(data)
+        return self.checksum_ok(data)
+    
+    def validate_batch(self, values: Iterable) -> List[bool]:
+        """Valida una sequenza di valori; i valori malformati risultano False."""
+        check_symbols = self._check_symbols
+        checksum_ok = self.checksum_ok
+        results = []
+        for value in values:
+            try:
+                data = _to_bytes(value)
+                check_symbols(data)
+            except ValueError:
+                results.append(False)
+            else:
+                results.append(checksum_ok(data))
+        return results
+    
+    def validate_stream(self, lines: Iterable) -> Iterator[Tuple[object, bool, str]]:
+        """
+        Valida in streaming righe di testo o bytes (spazi e a capo rimossi).
+        
+        Yields:
+            Tuple (valore, è_valido, messaggio_errore)
+        """
+        for line in lines:
+            value = line.strip()
+            try:
+                yield value, self.is_valid(value), ""
+            except ValueError as e:
+                yield value, False, str(e)
+    
+    def generate_check_digit(self, payload) -> str:
+        """
+        Calcola la cifra di controllo da accodare al payload.
+        
+        Raises:
+            ValueError: Se il payload contiene simboli non ammessi
+        """
+        data = _to_bytes(payload)
+        if data:
+            self._check_symbols(data)
+        return self._generate(data)
+    
+    def append_check_digit(self, payload) -> str:
+        """Restituisce il payload con la cifra di controllo accodata."""
+        check = self.generate_check_digit(payload)
+        if isinstance(payload, str):
+            return payload + check
+        return _to_bytes(payload).decode('ascii') + check
+    
+    def _generate(self, data: bytes) -> str:
+        # Generico: il simbolo che rende valido payload + simbolo
+        for symbol in self.alphabet:
+            if self.checksum_ok(data + symbol.encode('ascii')):
+                return symbol
+        raise ValueError(f"Nessuna cifra di controllo valida per lo schema {self.name}")
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class AdditiveScheme(CheckDigitScheme):
+    """
+    Schema additivo: somma (mod N) dei contributi per fase, da destra.
+    
+    Args:
+        name: Nome dello schema
+        alphabet: Simboli ammessi
+        addends: Per ogni fase (posizione da destra modulo il periodo),
+            il contributo di ciascun valore 0..N-1
+    """
+    
+    def __init__(self, name: str, alphabet: str, addends: Sequence[Sequence[int]]):
+        super().__init__(name, alphabet)
+        self.period = len(addends)
+        self._phase_tables = [
+            bytes.maketrans(self._alphabet_bytes, bytes(phase_addends))
+            for phase_addends in addends
+        ]
+        # Valore del contributo in fase 0 -> simbolo, per la generazione
+        self._completion: Dict[int, str] = {}
+        for value, addend in enumerate(addends[0]):
+            self._completion.setdefault(addend % self.modulus, alphabet[value])
+    
+    def _sum(self, data: bytes, phase_offset: int) -> int:
+        period = self.period
+        total = 0
+        for phase, table in enumerate(self._phase_tables):
+            start = (phase - phase_offset) % period
+            total += sum(data[-1 - start::-period].translate(table))
+        return total
+    
+    def checksum_ok(self, data: bytes) -> bool:
+        if self.period == 2:
+            # Caso Luhn, senza il ciclo sulle fasi
+            phase0, phase1 = self._phase_tables
+            return (sum(data[-1::-2].translate(phase0)) + sum(data[-2::-2].translate(phase1))) % self.modulus == 0
+        return self._sum(data, 0) % self.modulus == 0
+    
+    def _generate(self, data: bytes) -> str:
+        # Il payload occupa le posizioni dalla fase 1 in poi
+        missing = -self._sum(data, 1) % self.modulus
+        try:
+            return self._completion[missing]
+        except KeyError:
+            raise ValueError(f"Nessuna cifra di controllo valida per lo schema {self.name}")
+
+
+class TransitionScheme(CheckDigitScheme):
+    """
+    Schema a transizione di stato: stato = tabella[fase][stato][valore].
+    
+    Args:
+        name: Nome dello schema
+        alphabet: Simboli ammessi
+        tables: Per ogni fase, la matrice di transizione N x N
+        right_to_left: Se True l'input viene percorso da destra
+        accept_state: Stato finale che indica un valore valido
+        inverse: Per gli schemi di gruppo da destra (Verhoeff): valore della
+            cifra di controllo in funzione dello stato dopo il payload
+            percorso a partire dalla fase 1
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        alphabet: str,
+        tables: Sequence[Sequence[Sequence[int]]],
+        right_to_left: bool = False,
+        accept_state: int = 0,
+        inverse: Optional[Sequence[int]] = None
+    ):
+        super().__init__(name, alphabet)
+        self.period = len(tables)
+        self.right_to_left = right_to_left
+        self.accept_state = accept_state
+        self._tables = tuple(tuple(tuple(row) for row in table) for table in tables)
+        self._inverse = tuple(inverse) if inverse is not None else None
+        # Schemi da sinistra a fase unica: simbolo che porta ogni stato in accettazione
+        self._completion: Optional[Tuple[Optional[str], ...]] = None
+        if not right_to_left and self.period == 1:
+            self._completion = tuple(
+                next((alphabet[v] for v, target in enumerate(row) if target == accept_state), None)
+                for row in self._tables[0]
+            )
+    
+    def _run(self, data: bytes, phase_offset: int = 0) -> int:
+        values = data.translate(self._value_table)
+        if self.right_to_left:
+            values = values[::-1]
+        state = 0
+        if self.period == 1:
+            table = self._tables[0]
+            for value in values:
+                state = table[state][value]
+        else:
+            tables, period = self._tables, self.period
+            for position, value in enumerate(values, start=phase_offset):
+                state = tables[position % period][state][value]
+        return state
+    
+    def checksum_ok(self, data: bytes) -> bool:
+        return self._run(data) == self.accept_state
+    
+    def _generate(self, data: bytes) -> str:
+        if self._inverse is not None:
+            return self.alphabet[self._inverse[self._run(data, phase_offset=1)]]
+        if self._completion is not None:
+            symbol = self._completion[self._run(data)]
+            if symbol is not None:
+                return symbol
+        return super()._generate(data)
+
+
+def luhn_mod_n(alphabet: str, name: Optional[str] = None) -> AdditiveScheme:
+    """
+    Compila lo schema Luhn mod N sull'alfabeto indicato.
+    
+    Da destra i fattori alternano 1 e 2; il contributo di un valore è la
+    somma delle "cifre" in base N del prodotto. Con N = 10 è il Luhn classico.
+    """
+    n = len(alphabet)
+    doubled = [(2 * v) // n + (2 * v) % n for v in range(n)]
+    return AdditiveScheme(name or f"luhn_mod_{n}", alphabet, [list(range(n)), doubled])
+
+
+# Tabelle di Verhoeff (gruppo diedrale D5)
+_VERHOEFF_D = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 2, 3, 4, 0, 6, 7, 8, 9, 5),
+    (2, 3, 4, 0, 1, 7, 8, 9, 5, 6),
+    (3, 4, 0, 1, 2, 8, 9, 5, 6, 7),
+    (4, 0, 1, 2, 3, 9, 5, 6, 7, 8),
+    (5, 9, 8, 7, 6, 0, 4, 3, 2, 1),
+    (6, 5, 9, 8, 7, 1, 0, 4, 3, 2),
+    (7, 6, 5, 9, 8, 2, 1, 0, 4, 3),
+    (8, 7, 6, 5, 9, 3, 2, 1, 0, 4),
+    (9, 8, 7, 6, 5, 4, 3, 2, 1, 0),
+)
+_VERHOEFF_P = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 5, 7, 6, 2, 8, 3, 0, 9, 4),
+    (5, 8, 0, 3, 7, 9, 6, 1, 4, 2),
+    (8, 9, 1, 6, 0, 4, 3, 5, 2, 7),
+    (9, 4, 5, 3, 1, 2, 6, 8, 7, 0),
+    (4, 2, 8, 6, 5, 7, 3, 9, 0, 1),
+    (2, 7, 9, 3, 8, 0, 6, 4, 1, 5),
+    (7, 0, 4, 6, 9, 1, 3, 2, 5, 8),
+)
+
+_VERHOEFF_INV = (0, 4, 3, 2, 1, 5, 6, 7, 8, 9)
+
+# Quasigruppo totalmente antisimmetrico di ordine 10 (Damm)
+_DAMM_TABLE = (
+    (0, 3, 1, 7, 5, 9, 8, 6, 4, 2),
+    (7, 0, 9, 2, 1, 5, 4, 8, 6, 3),
+    (4, 2, 0, 6, 8, 7, 1, 3, 5, 9),
+    (1, 7, 5, 0, 9, 8, 3, 4, 2, 6),
+    (6, 1, 2, 3, 0, 4, 5, 9, 7, 8),
+    (3, 6, 7, 4, 2, 0, 9, 5, 8, 1),
+    (5, 8, 6, 9, 7, 2, 0, 1, 3, 4),
+    (8, 9, 4, 5, 3, 6, 2, 0, 1, 7),
+    (9, 4, 3, 8, 6, 1, 7, 2, 0, 5),
+    (2, 5, 8, 1, 4, 3, 6, 7, 9, 0),
+)
+
+LUHN = luhn_mod_n(DIGITS, name="luhn")
+LUHN_MOD_36 = luhn_mod_n(ALPHANUMERIC)
+VERHOEFF = TransitionScheme(
+    "verhoeff", DIGITS,
+    # Fase k: stato' = d[stato][p[k][valore]]
+    [[[_VERHOEFF_D[state][_VERHOEFF_P[phase][v]] for v in range(10)] for state in range(10)]
+     for phase in range(8)],
+    right_to_left=True,
+    inverse=_VERHOEFF_INV
+)
+DAMM = TransitionScheme("damm", DIGITS, [_DAMM_TABLE])
+
+SCHEMES: Dict[str, CheckDigitScheme] = {
+    scheme.name: scheme for scheme in (LUHN, LUHN_MOD_36, VERHOEFF, DAMM)
+}
+
+
+def get_scheme(name: str) -> CheckDigitScheme:
+    """
+    Restituisce lo schema registrato con il nome indicato.
+    
+    Raises:
+        ValueError: Se lo schema non esiste
+    """
+    try:
+        return SCHEMES[name]
+    except KeyError:
+        raise ValueError(f"Schema non supportato: {name}")
+
+
+def register_scheme(scheme: CheckDigitScheme) -> None:
+    """Registra uno schema compilato (es. luhn_mod_n su un alfabeto interno)."""
+    SCHEMES[scheme.name] = scheme
@@ -0,0 +1,239 @@
+"""
+Checkpoint e ripresa per la validazione batch di file CSV di grandi dimensioni.
+
+Un checkpoint registra, dopo l'ultima riga completamente validata e
+registrata nell'audit, l'offset in byte nel CSV di input, il numero di riga
+e la dimensione del file di audit (e dell'eventuale file dei risultati) in
+quel momento. Alla ripresa la lettura riparte dall'offset; le righe di audit
+scritte dopo il checkpoint non vengono mai rimosse (il file può avere altri
+scrittori): quelle del run interrotto vengono riconosciute confrontandone
+l'hash con le righe successive del CSV e non vengono ripetute.
+"""
+
+import csv
+import json
+import os
+from datetime import datetime
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+DEFAULT_CHECKPOINT_EVERY = 10000
+CHECKPOINT_VERSION = 1
+READ_BLOCK_BYTES = 64 * 1024
+
+
+class OffsetLineReader:
+    """
+    Itera sulle righe (decodificate) di un file binario tenendo traccia
+    dell'offset in byte.
+    
+    Il modulo csv legge le righe solo quando servono: dopo che un record è
+    stato restituito, offset punta esattamente alla fine di quel record.
+    Il file viene letto a blocchi di READ_BLOCK_BYTES e, come in modalità
+    testo (universal newlines), '\n', '\r\n' e '\r' da solo terminano una
+    riga: anche i CSV con soli CR vengono letti correttamente.
+    Con max_line_bytes >= 0 una riga più lunga solleva ValueError invece di
+    essere caricata interamente in memoria.
+    """
+    
+    def __init__(self, raw: BinaryIO, encoding: str = 'utf-8', max_line_bytes: int = -1):
+        self._raw = raw
+        self._encoding = encoding
+        self._max_line_bytes = max_line_bytes
+        self._lines: List[bytes] = []
+        self._index = 0
+        # Pezzi della riga non ancora terminata alla fine dell'ultimo blocco
+        self._partial: List[bytes] = []
+        self.offset = raw.tell()
+    
+    def seek(self, offset: int) -> None:
+        self._raw.seek(offset)
+        self._lines = []
+        self._index = 0
+        self._partial = []
+        self.offset = offset
+    
+    def __iter__(self) -> Iterator[str]:
+        return self
+    
+    def __next__(self) -> str:
+        index = self._index
+        if index >= len(self._lines):
+            self._fill()
+            index = 0
+        line = self._lines[index]
+        self._index = index + 1
+        self.offset += len(line)
+        return line.decode(self._encoding)
+    
+    def _fill(self) -> None:
+        """Legge blocchi finché non c'è almeno una riga completa."""
+        partial = self._partial
+        while True:
+            block = self._raw.read(READ_BLOCK_BYTES)
+            if not block:
+                if not partial:
+                    raise StopIteration
+                lines = [b''.join(partial)]
+                partial.clear()
+                break
+            
+            lines = block.splitlines(True)
+            if partial:
+                if partial[-1][-1] == 0x0D and block[0] != 0x0A:
+                    # Il '\r' finale del blocco precedente chiudeva una riga
+                    lines.insert(0, b''.join(partial))
+                    partial.clear()
+                elif len(lines) == 1 and block[-1] not in b'\r\n':
+                    # Ancora nessun fine riga: accumula senza ricopiare
+                    lines.pop()
+                    partial.append(block)
+                else:
+                    lines[0] = b''.join(partial) + lines[0]
+                    partial.clear()
+            if lines and lines[-1][-1] != 0x0A:
+                # Riga incompleta, o '\r' a cui potrebbe seguire '\n' nel blocco dopo
+                partial.append(lines.pop())
+            if 0 <= self._max_line_bytes < sum(map(len, partial)):
+                self._raise_too_long(self.offset + sum(map(len, lines)))
+            if lines:
+                break
+        
+        if self._max_line_bytes >= 0 and max(map(len, lines)) > self._max_line_bytes:
+            offset = self.offset
+            for line in lines:
+                if len(line) > self._max_line_bytes:
+                    self._raise_too_long(offset)
+                offset += len(line)
+        self._lines = lines
+        self._index = 0
+    
+    def _raise_too_long(self, offset: int) -> None:
+        raise ValueError(f"Riga oltre {self._max_line_bytes} byte all'offset {offset}")
+
+
+class BatchCheckpoint:
+    """Stato di avanzamento di una validazione batch."""
+    
+    def __init__(
+        self,
+        csv_file: str,
+        byte_offset: int,
+        row_num: int,
+        audit_file: Optional[str] = None,
+        audit_size: int = 0,
+        completed: bool = False,
+        timestamp: Optional[str] = None,
+        result_size: int = 0
+    ):
+        self.csv_file = csv_file
+        self.byte_offset = byte_offset
+        self.row_num = row_num
+        self.audit_file = audit_file
+        self.audit_size = audit_size
+        self.completed = completed
+        self.result_size = result_size
+        self.timestamp = timestamp or datetime.now().isoformat()
+    
+    def to_dict(self) -> dict:
+        return {
+            'version': CHECKPOINT_VERSION,
+            'csv_file': self.csv_file,
+            'byte_offset': self.byte_offset,
+            'row_num': self.row_num,
+            'audit_file': self.audit_file,
+            'audit_size': self.audit_size,
+            'completed': self.completed,
+            'result_size': self.result_size,
+            'timestamp': self.timestamp,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "BatchCheckpoint":
+        if data.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"Versione checkpoint non supportata: {data.get('version')}")
+        return cls(
+            csv_file=data['csv_file'],
+            byte_offset=data['byte_offset'],
+            row_num=data['row_num'],
+            audit_file=data.get('audit_file'),
+            audit_size=data.get('audit_size', 0),
+            completed=data.get('completed', False),
+            timestamp=data.get('timestamp'),
+            result_size=data.get('result_size', 0),
+        )
+
+
+def save_checkpoint(path: str, checkpoint: BatchCheckpoint) -> None:
+    """Salva il checkpoint in modo atomico (file temporaneo + fsync + rename)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint.to_dict(), f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> Optional[BatchCheckpoint]:
+    """Carica il checkpoint, o None se il file non esiste."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return BatchCheckpoint.from_dict(json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def audit_position(audit_file: Optional[str]) -> int:
+    """Dimensione attuale del file di audit (0 se non esiste)."""
+    if audit_file is None:
+        return 0
+    try:
+        return os.path.getsize(audit_file)
+    except FileNotFoundError:
+        return 0
+
+
+def count_audited_rows(
+    audit_file: Optional[str],
+    audit_size: int,
+    expected_hashes: Iterator[str]
+) -> Tuple[int, int]:
+    """
+    Conta le righe di audit del run interrotto scritte dopo il checkpoint.
+    
+    Le righe oltre audit_size vengono confrontate in ordine con gli hash
+    attesi per le righe del CSV successive al checkpoint: una riga uguale al
+    prossimo hash atteso appartiene al run interrotto, le altre (scritte da
+    altri processi sullo stesso audit) vengono lasciate dove sono. Il file
+    non viene modificato e viene letto in streaming. Una riga di un altro
+    scrittore con lo stesso hash della prossima carta attesa è
+    indistinguibile e viene contata come del run.
+    
+    Args:
+        audit_file: File di audit (None se l'audit è disattivato)
+        audit_size: Dimensione dell'audit al momento del checkpoint
+        expected_hashes: Hash, in ordine, dei record che il run scrive dopo
+            il checkpoint
+    
+    Returns:
+        (righe del run già registrate, righe di altri scrittori)
+    """
+    if audit_position(audit_file) <= audit_size:
+        return 0, 0
+    
+    own = foreign = 0
+    with open(audit_file, 'rb') as raw:
+        lines = OffsetLineReader(raw)
+        header = next(csv.reader(lines), [])
+        if 'card_hash' not in header:
+            raise ValueError(f"Header di audit non riconosciuto in {audit_file}")
+        column = header.index('card_hash')
+        lines.seek(max(audit_size, lines.offset))
+        
+        expected = next(expected_hashes, None)
+        for row in csv.reader(lines):
+            if expected is not None and len(row) > column and row[column] == expected:
+                own += 1
+                expected = next(expected_hashes, None)
+            else:
+                foreign += 1
+    return own, foreign
@@ -0,0 +1,182 @@
+"""
+Modalità a memoria limitata per la validazione di file molto grandi.
+
+Pensata per container con limiti di memoria stretti:
+
+- buffer di lettura di dimensione fissa e righe di lunghezza massima fissa
+  (una riga malformata senza a capo non può esaurire la memoria);
+- risultati consegnati a blocchi di dimensione fissa (ChunkedResultSink)
+  invece di accumularli in una lista;
+- un tetto di memoria configurabile (MemoryCeiling) controllato durante il
+  batch: se l'RSS del processo lo supera, l'elaborazione si interrompe con
+  MemoryError prima che intervenga l'OOM killer.
+"""
+
+import os
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+DEFAULT_READ_BUFFER = 64 * 1024
+DEFAULT_MAX_LINE_BYTES = 64 * 1024
+DEFAULT_CHUNK_ROWS = 10000
+DEFAULT_CHECK_EVERY = 1000
+
+ResultRow = Tuple[int, str, bool, str]
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def current_rss() -> Optional[int]:
+    """
+    Memoria residente attuale del processo in byte.
+    
+    Su Linux legge /proc/self/statm; altrove ripiega sul picco riportato da
+    resource.getrusage. Restituisce None se nessuna fonte è disponibile.
+    """
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS riporta byte, Linux e BSD kilobyte
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+class MemoryCeiling:
+    """
+    Tetto di memoria (RSS) per un batch.
+    
+    check() va chiamato a ogni riga: l'RSS viene letto solo ogni
+    check_every chiamate, per un costo trascurabile.
+    
+    Args:
+        max_bytes: RSS massimo consentito in byte
+        check_every: Numero di righe tra due letture dell'RSS
+    """
+    
+    def __init__(self, max_bytes: int, check_every: int = DEFAULT_CHECK_EVERY):
+        if max_bytes <= 0:
+            raise ValueError("Il tetto di memoria deve essere positivo")
+        self.max_bytes = max_bytes
+        self.check_every = max(1, check_every)
+        self.peak_rss = 0
+        self._countdown = 1
+    
+    def check(self) -> None:
+        self._countdown -= 1
+        if self._countdown:
+            return
+        self._countdown = self.check_every
+        rss = current_rss()
+        if rss is None:
+            return
+        self.peak_rss = max(self.peak_rss, rss)
+        if rss > self.max_bytes:
+            raise MemoryError(
+                f"Tetto di memoria superato: {rss // (1024 * 1024)} MiB "
+                f"> {self.max_bytes // (1024 * 1024)} MiB"
+            )
+
+
+class ChunkedResultSink:
+    """
+    Sink di risultati che consegna blocchi di al massimo chunk_rows righe.
+    
+    Alternativa a collect_results=True con memoria limitata: il callback
+    riceve una lista di tuple (riga, numero_carta, è_valido, errore) che
+    viene riutilizzata dopo il ritorno, quindi va consumata o copiata.
+    
+    Args:
+        callback: Funzione chiamata con ogni blocco completo (e con l'ultimo
+            blocco parziale in flush())
+        chunk_rows: Dimensione massima di un blocco
+    """
+    
+    def __init__(self, callback: Callable[[List[ResultRow]], None], chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        if chunk_rows <= 0:
+            raise ValueError("La dimensione del blocco deve essere positiva")
+        self.callback = callback
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0
+        self._chunk: List[ResultRow] = []
+    
+    def write(self, row_num: int, card_number: str, is_valid: bool, error: str = "") -> None:
+        self._chunk.append((row_num, card_number, is_valid, error))
+        self.rows_written += 1
+        if len(self._chunk) >= self.chunk_rows:
+            self.flush()
+    
+    def flush(self) -> None:
+        if self._chunk:
+            self.callback(self._chunk)
+            self._chunk.clear()
+    
+    def tell(self) -> int:
+        """Righe consegnate al callback (per i checkpoint)."""
+        return self.rows_written - len(self._chunk)
+    
+    def rewind(self, size: int) -> None:
+        # I blocchi già consegnati non si possono ritirare: si riparte
+        # semplicemente dal conteggio salvato nel checkpoint
+        self._chunk.clear()
+        self.rows_written = size
+    
+    def close(self) -> None:
+        self.flush()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def read_tail_lines(
+    path: str,
+    max_lines: int,
+    encoding: str = 'utf-8',
+    block_size: int = DEFAULT_READ_BUFFER
+) -> Tuple[str, List[str]]:
+    """
+    Legge l'intestazione e le ultime max_lines righe di un file di testo.
+    
+    Il file viene letto a ritroso a blocchi fissi: la memoria dipende da
+    max_lines, non dalla dimensione del file.
+    
+    Returns:
+        Tupla (intestazione, ultime righe senza terminatore)
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        header_end = f.tell()
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        
+        tail = deque(maxlen=max_lines)
+        pending = b""
+        while position > header_end and len(tail) < max_lines:
+            step = min(block_size, position - header_end)
+            position -= step
+            f.seek(position)
+            block = f.read(step) + pending
+            lines = block.split(b"\n")
+            pending = lines[0]
+            for line in reversed(lines[1:]):
+                if line.strip() and len(tail) < max_lines:
+                    tail.appendleft(line)
+        if pending.strip() and len(tail) < max_lines:
+            tail.appendleft(pending)
+    
+    def decode(raw: bytes) -> str:
+        return raw.rstrip(b"\r\n").decode(encoding, errors='replace')
+    
+    return decode(header), [decode(line) for line in tail]
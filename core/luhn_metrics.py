@@ -0,0 +1,298 @@
+"""
+Registro di metriche a basso overhead per il validatore Luhn.
+
+Contatori per esito e tipo di carta, istogrammi di latenza in stile HDR
+(bucket log-lineari, errore relativo < 2%) ed esportazione nel formato
+testuale di Prometheus, su file o tramite un endpoint HTTP locale.
+
+Le metriche sono disabilitate di default: con il registro disabilitato il
+costo per chiamata si riduce al controllo di un attributo booleano.
+"""
+
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Parametri degli istogrammi HDR: 2^SUB_BUCKET_BITS sotto-bucket per ottava
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT // 2
+MAX_TRACKABLE_NS = 1 << 40  # ~18 minuti
+
+# Bordi (in secondi) dei bucket esportati verso Prometheus
+PROMETHEUS_BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005,
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _bucket_index(value_ns: int) -> int:
+    """Indice del bucket HDR che contiene il valore (in nanosecondi)."""
+    if value_ns < SUB_BUCKET_COUNT:
+        return value_ns if value_ns > 0 else 0
+    shift = value_ns.bit_length() - SUB_BUCKET_BITS
+    return (shift + 1) * SUB_BUCKET_HALF + (value_ns >> shift) - SUB_BUCKET_HALF
+
+
+def _bucket_upper_bound(index: int) -> int:
+    """Valore massimo (in nanosecondi) contenuto nel bucket HDR."""
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = index // SUB_BUCKET_HALF - 1
+    sub_bucket = index % SUB_BUCKET_HALF + SUB_BUCKET_HALF
+    return ((sub_bucket + 1) << shift) - 1
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape_label(str(value))}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Contatore monotono con etichette opzionali."""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        """Incrementa il contatore per la combinazione di etichette indicata."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def get(self, labels: Tuple[str, ...] = ()) -> float:
+        """Restituisce il valore corrente (0 se mai incrementato)."""
+        return self._values.get(labels, 0)
+    
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    """Valore istantaneo (es. profondità di una coda)."""
+    
+    def set(self, value: float, labels: Tuple[str, ...] = ()) -> None:
+        with self._lock:
+            self._values[labels] = value
+    
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class LatencyHistogram:
+    """
+    Istogramma di latenze in stile HDR.
+    
+    I valori vengono registrati in nanosecondi in bucket log-lineari
+    preallocati: la registrazione è O(1) e non alloca memoria.
+    """
+    
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._counts = [0] * (_bucket_index(MAX_TRACKABLE_NS) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns: Optional[int] = None
+        self.max_ns = 0
+    
+    def observe_ns(self, value_ns: int) -> None:
+        """Registra una latenza in nanosecondi."""
+        index = _bucket_index(min(value_ns, MAX_TRACKABLE_NS))
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total_ns += value_ns
+            if self.min_ns is None or value_ns < self.min_ns:
+                self.min_ns = value_ns
+            if value_ns > self.max_ns:
+                self.max_ns = value_ns
+    
+    def percentile(self, q: float) -> int:
+        """
+        Restituisce il percentile q (0-100) in nanosecondi.
+        
+        Il valore è il limite superiore del bucket, con errore relativo
+        inferiore a 1/64.
+        """
+        if self.count == 0:
+            return 0
+        target = max(1, int(round(self.count * q / 100.0)))
+        seen = 0
+        for index, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(_bucket_upper_bound(index), self.max_ns)
+        return self.max_ns
+    
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * len(self._counts)
+            self.count = 0
+            self.total_ns = 0
+            self.min_ns = None
+            self.max_ns = 0
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            counts = list(self._counts)
+            count, total_ns = self.count, self.total_ns
+        
+        cumulative = 0
+        index = 0
+        for bound in PROMETHEUS_BUCKETS:
+            bound_ns = int(bound * 1e9)
+            while index < len(counts) and _bucket_upper_bound(index) <= bound_ns:
+                cumulative += counts[index]
+                index += 1
+            lines.append(f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total_ns / 1e9:.9f}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro delle metriche, abilitabile e disabilitabile a runtime."""
+    
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._metrics: Dict[str, object] = {}
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str) -> LatencyHistogram:
+        return self._register(LatencyHistogram(name, documentation))
+    
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metrica già registrata: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def get(self, name: str):
+        """Restituisce la metrica registrata con il nome indicato."""
+        return self._metrics[name]
+    
+    def reset(self) -> None:
+        """Azzera tutte le metriche (le registrazioni restano)."""
+        for metric in self._metrics.values():
+            metric.reset()
+    
+    def render_prometheus(self) -> str:
+        """Restituisce tutte le metriche nel formato testuale di Prometheus."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path: str) -> None:
+        """
+        Scrive le metriche su file in modo atomico.
+        
+        Adatto al textfile collector di node_exporter: il file viene scritto
+        in un file temporaneo e poi rinominato.
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+    
+    def start_http_server(self, port: int = 9464, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+        """
+        Espone le metriche su http://host:port/metrics in un thread daemon.
+        
+        Returns:
+            Il server avviato (usare shutdown() per fermarlo)
+        """
+        # Import differito: http.server pesa sull'avvio di chi non espone metriche
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        registry = self
+        
+        class _MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, name="luhn-metrics-http", daemon=True)
+        thread.start()
+        return server
+
+
+# Registro globale usato dal modulo luhnalgorithm
+METRICS = MetricsRegistry()
+
+VALIDATIONS = METRICS.counter(
+    "luhn_validations_total", "Validazioni per esito e tipo di carta", ("result", "card_type")
+)
+VALIDATION_LATENCY = METRICS.histogram(
+    "luhn_validation_seconds", "Latenza della validazione Luhn"
+)
+HASH_LATENCY = METRICS.histogram(
+    "luhn_audit_hash_seconds", "Latenza dell'hashing del numero di carta"
+)
+AUDIT_WRITE_LATENCY = METRICS.histogram(
+    "luhn_audit_write_seconds", "Latenza della scrittura del record di audit"
+)
+
+AUDIT_DROPPED = METRICS.counter(
+    "luhn_audit_dropped_total", "Record di audit scartati per coda piena"
+)
+AUDIT_QUEUE_DEPTH = METRICS.gauge(
+    "luhn_audit_queue_depth", "Record di audit in attesa di scrittura asincrona"
+)
+
+
+def enable_metrics() -> None:
+    """Abilita la raccolta delle metriche nel registro globale."""
+    METRICS.enabled = True
+
+
+def disable_metrics() -> None:
+    """Disabilita la raccolta delle metriche nel registro globale."""
+    METRICS.enabled = False
@@ -0,0 +1,386 @@
+"""
+Sovrapposizione di PAN tra file più grandi della RAM.
+
+Individua i PAN di un nuovo feed già presenti in feed precedenti o nel file
+di audit confrontando i digest di hash_card_number, mai i numeri in chiaro:
+
+1. partizionamento: ogni sorgente viene letta in streaming e i record
+   (digest binario, numero di riga) vengono distribuiti per prefisso del
+   digest in file di spill su disco;
+2. join: per ogni partizione i record delle due sorgenti vengono ordinati e
+   uniti con un merge-join.
+
+La memoria dipende dalla dimensione di una partizione, non dai file:
+il numero di partizioni viene scelto in base a memory_budget, fino a
+MAX_PARTITIONS file aperti contemporaneamente. Una partizione che supera
+comunque il budget (file enormi o distribuzione sbilanciata) viene
+ripartizionata ricorsivamente sui 4 byte successivi del digest.
+
+Uso da riga di comando:
+    python luhn_overlap.py nuovo_feed.csv feed_precedente.csv --output overlap.csv
+    python luhn_overlap.py nuovo_feed.csv validation_audit.csv --right-audit
+"""
+
+import argparse
+import csv
+import math
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from luhnalgorithm import DEFAULT_HASH_ALGORITHM, HashBackend, get_hash_backend
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+# Limite ai file di spill aperti insieme; le partizioni più grandi del budget
+# vengono ripartizionate ricorsivamente
+MAX_PARTITIONS = 512
+PARTITION_KEY_BYTES = 4
+SPILL_BUFFER = 8 * 1024
+ROW_BYTES = 8
+
+# Stime per il dimensionamento: byte medi per riga di input e byte di
+# memoria Python per record durante l'ordinamento di una partizione
+_ESTIMATED_LINE_BYTES = 17
+_ESTIMATED_RECORD_MEMORY = 100
+
+OVERLAP_FIELDNAMES = ['card_hash', 'left_rows', 'right_rows']
+
+
+class OverlapSource:
+    """
+    Sorgente di digest per il confronto.
+    
+    Args:
+        path: File CSV
+        audit: Se True il file è un audit log (colonna 'card_hash' già in
+            hash); altrimenti un feed con PAN in chiaro nella colonna column
+        column: Colonna dei PAN per i feed
+    
+    I numeri di riga seguono la convenzione di validate_cards_from_csv
+    (la prima riga di dati è la 2).
+    """
+    
+    def __init__(self, path: str, audit: bool = False, column: str = 'card_number'):
+        self.path = path
+        self.audit = audit
+        self.column = 'card_hash' if audit else column
+        self.rows = 0
+        self.skipped = 0
+    
+    def iter_digests(self, backend: HashBackend) -> Iterator[Tuple[bytes, int]]:
+        """Restituisce (digest binario, numero di riga) per ogni riga utile."""
+        self.rows = self.skipped = 0
+        with open(self.path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None or self.column not in header:
+                raise ValueError(f"Il CSV {self.path} deve avere una colonna '{self.column}'")
+            index = header.index(self.column)
+            algorithm_index = header.index('hash_algorithm') if 'hash_algorithm' in header else None
+            
+            for row_num, row in enumerate(reader, start=2):
+                if len(row) <= index or not row[index].strip():
+                    self.skipped += 1
+                    continue
+                if not self.audit:
+                    self.rows += 1
+                    yield backend.digest_bytes(row[index].strip()), row_num
+                    continue
+                # Audit: confrontabili solo i digest dello stesso backend
+                # (i file senza colonna hash_algorithm sono in sha3_256)
+                algorithm = row[algorithm_index] if algorithm_index is not None else DEFAULT_HASH_ALGORITHM
+                if algorithm != backend.name:
+                    self.skipped += 1
+                    continue
+                try:
+                    digest = bytes.fromhex(row[index])
+                except ValueError:
+                    self.skipped += 1
+                    continue
+                self.rows += 1
+                yield digest, row_num
+
+
+class OverlapReport:
+    """Esito del confronto tra due sorgenti."""
+    
+    def __init__(self, left: str, right: str, hash_algorithm: str, partitions: int):
+        self.left = left
+        self.right = right
+        self.hash_algorithm = hash_algorithm
+        self.partitions = partitions
+        self.left_rows = 0
+        self.right_rows = 0
+        self.left_skipped = 0
+        self.right_skipped = 0
+        self.common_cards = 0
+        self.left_matches = 0
+        self.right_matches = 0
+    
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+    
+    def report(self) -> str:
+        """Restituisce il report testuale."""
+        lines = [
+            f"Sinistra: {self.left} - {self.left_rows} righe ({self.left_skipped} scartate)",
+            f"Destra:   {self.right} - {self.right_rows} righe ({self.right_skipped} scartate)",
+            f"Hash: {self.hash_algorithm}, partizioni: {self.partitions}",
+            f"Carte in comune: {self.common_cards}",
+            f"Righe a sinistra con corrispondenza: {self.left_matches}",
+            f"Righe a destra con corrispondenza: {self.right_matches}",
+        ]
+        return "\n".join(lines)
+
+
+def _partitions_for(estimated_rows: float, memory_budget: int) -> int:
+    needed = math.ceil(estimated_rows * _ESTIMATED_RECORD_MEMORY / memory_budget)
+    partitions = 1
+    while partitions < needed and partitions < MAX_PARTITIONS:
+        partitions *= 2
+    return partitions
+
+
+def choose_partitions(paths: List[str], memory_budget: int = DEFAULT_MEMORY_BUDGET) -> int:
+    """Numero di partizioni (potenza di 2, al massimo MAX_PARTITIONS) perché una partizione stia nel budget."""
+    estimated_rows = sum(os.path.getsize(path) for path in paths) / _ESTIMATED_LINE_BYTES
+    return _partitions_for(estimated_rows, memory_budget)
+
+
+def _partition_of(digest: bytes, partitions: int, level: int = 0) -> int:
+    start = level * PARTITION_KEY_BYTES
+    return int.from_bytes(digest[start:start + PARTITION_KEY_BYTES], 'big') % partitions
+
+
+def spill_partitions(
+    source: OverlapSource,
+    backend: HashBackend,
+    work_dir: str,
+    prefix: str,
+    partitions: int
+) -> List[str]:
+    """Scrive i record (digest + riga big-endian) della sorgente nei file di spill."""
+    paths = [os.path.join(work_dir, f"{prefix}_{i:04d}.bin") for i in range(partitions)]
+    files: List[BinaryIO] = []
+    try:
+        for path in paths:
+            files.append(open(path, 'wb', buffering=SPILL_BUFFER))
+        for digest, row_num in source.iter_digests(backend):
+            files[_partition_of(digest, partitions)].write(digest + row_num.to_bytes(ROW_BYTES, 'big'))
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+def _split_partition(path: str, digest_size: int, partitions: int, level: int) -> List[str]:
+    """Ridistribuisce i record di una partizione in sotto-partizioni del livello indicato."""
+    record_size = digest_size + ROW_BYTES
+    base = os.path.splitext(path)[0]
+    paths = [f"{base}_{i:04d}.bin" for i in range(partitions)]
+    files: List[BinaryIO] = []
+    try:
+        for sub_path in paths:
+            files.append(open(sub_path, 'wb', buffering=SPILL_BUFFER))
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(record_size * 4096)
+                if not data:
+                    break
+                for i in range(0, len(data), record_size):
+                    record = data[i:i + record_size]
+                    files[_partition_of(record, partitions, level)].write(record)
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+def _sorted_records(path: str, record_size: int) -> List[bytes]:
+    """Legge e ordina i record di una partizione (digest, poi riga)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    records = [data[i:i + record_size] for i in range(0, len(data), record_size)]
+    del data
+    records.sort()
+    return records
+
+
+def _group(records: List[bytes], start: int, digest_size: int) -> Tuple[bytes, List[int], int]:
+    """Raggruppa i record consecutivi con lo stesso digest."""
+    digest = records[start][:digest_size]
+    rows = []
+    end = start
+    while end < len(records) and records[end][:digest_size] == digest:
+        rows.append(int.from_bytes(records[end][digest_size:], 'big'))
+        end += 1
+    return digest, rows, end
+
+
+def merge_join_partition(left_path: str, right_path: str, digest_size: int) -> Iterator[Tuple[bytes, List[int], List[int]]]:
+    """Merge-join di una partizione: (digest, righe a sinistra, righe a destra)."""
+    record_size = digest_size + ROW_BYTES
+    if os.path.getsize(left_path) == 0 or os.path.getsize(right_path) == 0:
+        return
+    left = _sorted_records(left_path, record_size)
+    right = _sorted_records(right_path, record_size)
+    
+    i = j = 0
+    while i < len(left) and j < len(right):
+        left_digest = left[i][:digest_size]
+        right_digest = right[j][:digest_size]
+        if left_digest < right_digest:
+            i += 1
+        elif left_digest > right_digest:
+            j += 1
+        else:
+            digest, left_rows, i = _group(left, i, digest_size)
+            _, right_rows, j = _group(right, j, digest_size)
+            yield digest, left_rows, right_rows
+
+
+def _join_partition(
+    left_path: str,
+    right_path: str,
+    digest_size: int,
+    memory_budget: int,
+    level: int = 0
+) -> Iterator[Tuple[bytes, List[int], List[int]]]:
+    """
+    Merge-join di una partizione, ripartizionata prima se supera il budget.
+    
+    La ricorsione si ferma quando i byte del digest sono esauriti o quando
+    la suddivisione non separa i record (stesso digest ripetuto): in quel
+    caso la partizione viene unita in memoria.
+    """
+    left_size = os.path.getsize(left_path)
+    right_size = os.path.getsize(right_path)
+    if left_size == 0 or right_size == 0:
+        return
+    records = (left_size + right_size) // (digest_size + ROW_BYTES)
+    next_level = level + 1
+    if (records * _ESTIMATED_RECORD_MEMORY <= memory_budget
+            or (next_level + 1) * PARTITION_KEY_BYTES > digest_size):
+        yield from merge_join_partition(left_path, right_path, digest_size)
+        return
+    
+    partitions = max(2, _partitions_for(records, memory_budget))
+    left_paths = _split_partition(left_path, digest_size, partitions, next_level)
+    right_paths = _split_partition(right_path, digest_size, partitions, next_level)
+    try:
+        for sub_left, sub_right in zip(left_paths, right_paths):
+            if os.path.getsize(sub_left) == left_size and os.path.getsize(sub_right) == right_size:
+                # Nessuna separazione: ripartizionare ancora non servirebbe
+                yield from merge_join_partition(sub_left, sub_right, digest_size)
+            else:
+                yield from _join_partition(sub_left, sub_right, digest_size, memory_budget, next_level)
+            os.remove(sub_left)
+            os.remove(sub_right)
+    finally:
+        for sub_path in left_paths + right_paths:
+            if os.path.exists(sub_path):
+                os.remove(sub_path)
+
+
+def find_overlap(
+    left: OverlapSource,
+    right: OverlapSource,
+    output_file: Optional[str] = None,
+    hash_algorithm: str = DEFAULT_HASH_ALGORITHM,
+    hash_key: Optional[bytes] = None,
+    partitions: Optional[int] = None,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    work_dir: Optional[str] = None
+) -> OverlapReport:
+    """
+    Trova le carte presenti in entrambe le sorgenti.
+    
+    Args:
+        left: Sorgente di cui cercare i duplicati (es. il nuovo feed)
+        right: Sorgente di riferimento (feed precedente o audit log)
+        output_file: Se indicato, CSV con una riga per carta in comune:
+            card_hash, righe a sinistra, righe a destra (separate da spazio)
+        hash_algorithm: Backend di hashing (per un audit deve essere quello
+            con cui è stato scritto)
+        hash_key: Chiave per i backend con chiave
+        partitions: Numero di partizioni; default calcolato da memory_budget
+        memory_budget: Memoria indicativa per la fase di join; le
+            partizioni che lo superano vengono ripartizionate
+        work_dir: Directory per i file di spill (default: temporanea)
+        
+    Returns:
+        OverlapReport con i conteggi
+        
+    Note:
+        Nei file di spill e nell'output ci sono solo digest e numeri di
+        riga: nessun PAN in chiaro viene scritto su disco
+    """
+    backend = get_hash_backend(hash_algorithm, hash_key)
+    digest_size = len(backend.digest_bytes("0"))
+    if partitions is None:
+        partitions = choose_partitions([left.path, right.path], memory_budget)
+    report = OverlapReport(left.path, right.path, hash_algorithm, partitions)
+    
+    spill_dir = tempfile.mkdtemp(prefix="luhn_overlap_", dir=work_dir)
+    out = None
+    try:
+        left_paths = spill_partitions(left, backend, spill_dir, "left", partitions)
+        right_paths = spill_partitions(right, backend, spill_dir, "right", partitions)
+        report.left_rows, report.left_skipped = left.rows, left.skipped
+        report.right_rows, report.right_skipped = right.rows, right.skipped
+        
+        writer = None
+        if output_file is not None:
+            out = open(output_file, 'w', newline='', encoding='utf-8')
+            writer = csv.writer(out)
+            writer.writerow(OVERLAP_FIELDNAMES)
+        
+        for left_path, right_path in zip(left_paths, right_paths):
+            joined = _join_partition(left_path, right_path, digest_size, memory_budget)
+            for digest, left_rows, right_rows in joined:
+                report.common_cards += 1
+                report.left_matches += len(left_rows)
+                report.right_matches += len(right_rows)
+                if writer is not None:
+                    writer.writerow([
+                        digest.hex(),
+                        " ".join(map(str, left_rows)),
+                        " ".join(map(str, right_rows))
+                    ])
+            # Ogni partizione serve una volta sola: libera subito il disco
+            os.remove(left_path)
+            os.remove(right_path)
+    finally:
+        if out is not None:
+            out.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Punto di ingresso da riga di comando."""
+    parser = argparse.ArgumentParser(description="Carte in comune tra due file (solo digest)")
+    parser.add_argument("left", help="CSV da controllare (es. nuovo feed)")
+    parser.add_argument("right", help="CSV di riferimento (feed precedente o audit)")
+    parser.add_argument("--left-audit", action="store_true", help="Il file di sinistra è un audit log")
+    parser.add_argument("--right-audit", action="store_true", help="Il file di destra è un audit log")
+    parser.add_argument("--output", help="CSV con le carte in comune e i numeri di riga")
+    parser.add_argument("--hash-algorithm", default=DEFAULT_HASH_ALGORITHM, help="Backend di hashing")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help="Memoria indicativa per il join (MiB)")
+    parser.add_argument("--work-dir", help="Directory per i file di spill")
+    args = parser.parse_args(argv)
+    
+    report = find_overlap(
+        OverlapSource(args.left, audit=args.left_audit),
+        OverlapSource(args.right, audit=args.right_audit),
+        output_file=args.output, hash_algorithm=args.hash_algorithm,
+        memory_budget=args.memory_mb * 1024 * 1024, work_dir=args.work_dir
+    )
+    print(report.report())
+
+
+if __name__ == "__main__":
+    main()
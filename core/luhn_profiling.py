@@ -0,0 +1,214 @@
+"""
+Profiling opzionale per stadio della pipeline di validazione.
+
+Un Profiler attivo riceve uno span per ogni stadio (parsing CSV, validazione
+delle cifre, rilevamento del tipo di carta, hashing, I/O dell'audit) e a fine
+esecuzione produce un report con tempo totale e numero di chiamate per stadio.
+Gli span possono anche essere esportati in formato Chrome trace-event
+(chrome://tracing, Perfetto).
+
+Senza profiler attivo il costo è un singolo controllo su None.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# Stadi strumentati dal modulo luhnalgorithm
+STAGE_CSV_PARSE = "csv_parse"
+STAGE_VALIDATE = "validate_digits"
+STAGE_CARD_TYPE = "detect_card_type"
+STAGE_HASH = "hash"
+STAGE_AUDIT_IO = "audit_io"
+
+SpanCallback = Callable[[str, int, int], None]
+
+_active: Optional["Profiler"] = None
+
+
+class _Span:
+    """Context manager che misura uno stadio e lo registra nel profiler."""
+    
+    __slots__ = ("_profiler", "_name", "_start_ns")
+    
+    def __init__(self, profiler: "Profiler", name: str):
+        self._profiler = profiler
+        self._name = name
+        self._start_ns = 0
+    
+    def __enter__(self):
+        self._start_ns = time.perf_counter_ns()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._profiler.record(self._name, self._start_ns, time.perf_counter_ns() - self._start_ns)
+        return False
+
+
+class _NullSpan:
+    """Span che non fa nulla, usato quando nessun profiler è attivo."""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """
+    Raccoglie tempo e numero di chiamate per stadio.
+    
+    Args:
+        trace: Se True, conserva i singoli span per l'export Chrome trace
+        max_trace_events: Numero massimo di span conservati per il trace
+        callback: Funzione opzionale chiamata a ogni span con
+            (nome_stadio, inizio_ns, durata_ns)
+    """
+    
+    def __init__(
+        self,
+        trace: bool = False,
+        max_trace_events: int = 1_000_000,
+        callback: Optional[SpanCallback] = None
+    ):
+        self.trace = trace
+        self.max_trace_events = max_trace_events
+        self.callback = callback
+        self._totals: Dict[str, List[int]] = {}
+        self._events: List[tuple] = []
+        self._lock = threading.Lock()
+        self._origin_ns = time.perf_counter_ns()
+    
+    def span(self, name: str) -> _Span:
+        """Restituisce un context manager che misura lo stadio indicato."""
+        return _Span(self, name)
+    
+    def record(self, name: str, start_ns: int, duration_ns: int) -> None:
+        """Registra uno span già misurato."""
+        with self._lock:
+            totals = self._totals.get(name)
+            if totals is None:
+                self._totals[name] = [duration_ns, 1]
+            else:
+                totals[0] += duration_ns
+                totals[1] += 1
+            if self.trace and len(self._events) < self.max_trace_events:
+                self._events.append((name, start_ns, duration_ns, threading.get_ident()))
+        if self.callback is not None:
+            self.callback(name, start_ns, duration_ns)
+    
+    def iter(self, iterable: Iterable, name: str) -> Iterator:
+        """Itera su iterable misurando ogni next() come uno span."""
+        iterator = iter(iterable)
+        while True:
+            start_ns = time.perf_counter_ns()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(name, start_ns, time.perf_counter_ns() - start_ns)
+            yield item
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Restituisce le statistiche per stadio.
+        
+        Returns:
+            Dizionario stadio -> {'calls', 'total_ms', 'avg_us'}
+        """
+        with self._lock:
+            totals = {name: list(values) for name, values in self._totals.items()}
+        return {
+            name: {
+                'calls': calls,
+                'total_ms': total_ns / 1e6,
+                'avg_us': total_ns / calls / 1e3,
+            }
+            for name, (total_ns, calls) in totals.items()
+        }
+    
+    def report(self) -> str:
+        """Restituisce un report testuale per stadio, ordinato per tempo totale."""
+        stats = self.stats()
+        grand_total = sum(s['total_ms'] for s in stats.values()) or 1.0
+        lines = [
+            f"{'Stadio':<18} {'Chiamate':>10} {'Totale ms':>12} {'Medio us':>10} {'%':>6}",
+            "-" * 60,
+        ]
+        for name, s in sorted(stats.items(), key=lambda item: item[1]['total_ms'], reverse=True):
+            lines.append(
+                f"{name:<18} {s['calls']:>10} {s['total_ms']:>12.3f} "
+                f"{s['avg_us']:>10.2f} {100 * s['total_ms'] / grand_total:>6.1f}"
+            )
+        return "\n".join(lines)
+    
+    def export_chrome_trace(self, path: str) -> None:
+        """
+        Esporta gli span in formato Chrome trace-event JSON.
+        
+        Raises:
+            ValueError: Se il profiler non è stato creato con trace=True
+        """
+        if not self.trace:
+            raise ValueError("Export trace disponibile solo con Profiler(trace=True)")
+        
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+        trace_events = [
+            {
+                'name': name,
+                'cat': 'luhn',
+                'ph': 'X',
+                'ts': (start_ns - self._origin_ns) / 1e3,
+                'dur': duration_ns / 1e3,
+                'pid': pid,
+                'tid': tid,
+            }
+            for name, start_ns, duration_ns, tid in events
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+
+
+def active_profiler() -> Optional[Profiler]:
+    """Restituisce il profiler attivo, o None."""
+    return _active
+
+
+def span(name: str):
+    """Span sul profiler attivo; senza profiler restituisce uno span nullo."""
+    profiler = _active
+    if profiler is None:
+        return _NULL_SPAN
+    return profiler.span(name)
+
+
+@contextmanager
+def profile(profiler: Optional[Profiler] = None, **kwargs):
+    """
+    Attiva un profiler per la durata del blocco with.
+    
+    Example:
+        >>> with profile() as prof:
+        ...     validate_cards_from_csv("carte_test.csv")
+        >>> print(prof.report())
+    """
+    global _active
+    if profiler is None:
+        profiler = Profiler(**kwargs)
+    previous = _active
+    _active = profiler
+    try:
+        yield profiler
+    finally:
+        _active = previous
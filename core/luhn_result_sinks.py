@@ -0,0 +1,138 @@
+"""
+Sink di output in streaming per la validazione batch.
+
+Ogni sink scrive i risultati man mano che le righe vengono validate, con un
+buffer di scrittura ampio: insieme a validate_cards_from_csv(...,
+collect_results=False) permette una validazione file-to-file a memoria
+costante.
+
+- CsvResultSink: CSV con numero di riga, numero di carta, esito ed errore
+- JsonlResultSink: un oggetto JSON per riga
+- MaskedReportSink: report con PAN mascherato (prime 6 e ultime 4 cifre)
+"""
+
+import csv
+import json
+import os
+from typing import List
+
+from luhnalgorithm import detect_card_type, mask_card_number
+
+DEFAULT_WRITE_BUFFER = 1 << 20  # 1 MiB
+
+
+class _StreamingResultSink:
+    """
+    Base dei sink di output: file aperto con buffer ampio.
+    
+    Args:
+        path: File di output
+        buffer_size: Dimensione del buffer di scrittura in byte
+        append: Se True, accoda a un file esistente (necessario per la
+            ripresa da checkpoint)
+    """
+    
+    def __init__(self, path: str, buffer_size: int = DEFAULT_WRITE_BUFFER, append: bool = False):
+        self.path = path
+        self.rows_written = 0
+        new_file = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a' if append else 'w', buffering=buffer_size, encoding='utf-8', newline='')
+        if new_file:
+            self._write_header()
+    
+    def _write_header(self) -> None:
+        pass
+    
+    def write(self, row_num: int, card_number: str, is_valid: bool, error: str = "") -> None:
+        """Scrive il risultato di una riga."""
+        raise NotImplementedError
+    
+    def flush(self) -> None:
+        self._file.flush()
+    
+    def tell(self) -> int:
+        """Posizione (in byte) nel file di output dopo il flush."""
+        self.flush()
+        return os.path.getsize(self.path)
+    
+    def rewind(self, size: int) -> None:
+        """
+        Tronca l'output alla dimensione registrata in un checkpoint.
+        
+        Raises:
+            ValueError: Se il file è più corto (sink non aperto con append=True)
+        """
+        current = self.tell()
+        if current < size:
+            raise ValueError(
+                f"File dei risultati più corto del checkpoint ({current} < {size}): "
+                "aprire il sink con append=True per la ripresa"
+            )
+        self._file.truncate(size)
+        self._file.seek(size)
+    
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class CsvResultSink(_StreamingResultSink):
+    """Risultati in CSV: row_num, card_number, is_valid, error."""
+    
+    FIELDNAMES: List[str] = ['row_num', 'card_number', 'is_valid', 'error']
+    
+    def __init__(self, path: str, buffer_size: int = DEFAULT_WRITE_BUFFER, append: bool = False):
+        self._writer = None
+        super().__init__(path, buffer_size, append)
+    
+    def _csv(self):
+        if self._writer is None:
+            self._writer = csv.writer(self._file)
+        return self._writer
+    
+    def _write_header(self) -> None:
+        self._csv().writerow(self.FIELDNAMES)
+    
+    def write(self, row_num: int, card_number: str, is_valid: bool, error: str = "") -> None:
+        self._csv().writerow((row_num, card_number, 'Si' if is_valid else 'No', error))
+        self.rows_written += 1
+
+
+class JsonlResultSink(_StreamingResultSink):
+    """Risultati in JSON Lines, un oggetto per riga."""
+    
+    def write(self, row_num: int, card_number: str, is_valid: bool, error: str = "") -> None:
+        self._file.write(json.dumps({
+            'row_num': row_num,
+            'card_number': card_number,
+            'is_valid': is_valid,
+            'error': error,
+        }) + "\n")
+        self.rows_written += 1
+
+
+class MaskedReportSink(CsvResultSink):
+    """
+    Report CSV con PAN mascherato (prime 6 e ultime 4 cifre) e tipo di carta.
+    
+    Adatto alla condivisione: non contiene numeri di carta in chiaro.
+    """
+    
+    FIELDNAMES: List[str] = ['row_num', 'masked_pan', 'card_type', 'is_valid', 'error']
+    
+    def write(self, row_num: int, card_number: str, is_valid: bool, error: str = "") -> None:
+        self._csv().writerow((
+            row_num,
+            mask_card_number(card_number),
+            detect_card_type(card_number) if not error else "Unknown",
+            'Si' if is_valid else 'No',
+            error,
+        ))
+        self.rows_written += 1
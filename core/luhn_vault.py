@@ -0,0 +1,352 @@
+"""
+Vault locale di tokenizzazione dei numeri di carta.
+
+Sostituisce i PAN con token surrogati che conservano il formato:
+
+- stessa lunghezza e stesse ultime 4 cifre del PAN (utili per assistenza e
+  ricevute), cifre iniziali casuali;
+- checksum di Luhn valido, quindi i token passano i controlli di formato
+  dei sistemi a valle.
+
+I token sono conservati in un database sqlite3 insieme al PAN cifrato e a
+un suo digest con chiave usato come indice. Il PAN è cifrato con AES-256-GCM
+se è installato il pacchetto opzionale cryptography; altrimenti con un
+keystream BLAKE2b con nonce casuale, autenticato con BLAKE2b con chiave
+(solo libreria standard). Il primo byte del dato cifrato indica lo schema:
+i PAN restano leggibili qualunque schema li abbia scritti, ma quelli in
+AES-GCM richiedono cryptography.
+
+All'apertura il vault carica in memoria un indice digest -> token e
+token -> riga, così tokenize e il controllo di unicità non interrogano il
+database; una cache LRU conserva i PAN detokenizzati più richiesti. Più
+istanze possono condividere lo stesso database: un PAN già tokenizzato da
+un'altra istanza riceve il token esistente.
+
+La chiave principale (parametro key o variabile LUHN_VAULT_KEY) non viene
+mai salvata: senza di essa il database contiene solo dati cifrati.
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from luhnalgorithm import validate_luhn
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    AESGCM = None
+
+VAULT_KEY_ENV_VAR = "LUHN_VAULT_KEY"
+DEFAULT_VAULT_FILE = "token_vault.db"
+DEFAULT_CACHE_SIZE = 10000
+KEEP_LAST_DIGITS = 4
+NONCE_SIZE = 16
+AESGCM_NONCE_SIZE = 12
+TAG_SIZE = 16
+DIGEST_SIZE = 16
+_SQL_CHUNK = 500
+_MAX_TOKEN_ATTEMPTS = 100
+_MAX_INSERT_ATTEMPTS = 5
+
+# Primo byte del PAN cifrato: schema di cifratura
+SCHEME_BLAKE2B = 1
+SCHEME_AESGCM = 2
+
+# Cifra ASCII -> valore e valore raddoppiato secondo Luhn (2d, meno 9 se > 9)
+_DIGIT_VALUE = bytes.maketrans(b"0123456789", bytes(range(10)))
+_DOUBLED_VALUE = bytes.maketrans(b"0123456789", bytes((0, 2, 4, 6, 8, 1, 3, 5, 7, 9)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    id INTEGER PRIMARY KEY,
+    pan_digest BLOB NOT NULL UNIQUE,
+    token TEXT NOT NULL UNIQUE,
+    pan_encrypted BLOB NOT NULL,
+    created TEXT NOT NULL
+)
+"""
+
+
+def vault_key(key: Optional[bytes] = None) -> bytes:
+    """Chiave principale del vault (parametro o variabile d'ambiente)."""
+    if key is None:
+        env_key = os.environ.get(VAULT_KEY_ENV_VAR)
+        if not env_key:
+            raise ValueError(f"Il vault richiede una chiave (parametro key o {VAULT_KEY_ENV_VAR})")
+        key = env_key.encode()
+    return key
+
+
+def _derive(key: bytes, purpose: bytes) -> bytes:
+    """Sottochiave indipendente per scopo (cifratura, MAC, indice)."""
+    return hashlib.blake2b(key, digest_size=32, person=purpose).digest()
+
+
+def _luhn_token(pan: str) -> str:
+    """
+    Genera un token con lunghezza e ultime 4 cifre del PAN e checksum valido.
+    
+    La cifra subito prima delle ultime 4 è in posizione dispari da destra
+    (non raddoppiata): la si sceglie in modo da chiudere il checksum.
+    """
+    # Prima cifra mai zero: il token resta un numero della stessa lunghezza
+    low = 10 ** (len(pan) - KEEP_LAST_DIGITS - 2)
+    head = str(low + secrets.randbelow(9 * low))
+    tail = pan[-KEEP_LAST_DIGITS:]
+    
+    digits = (head + "0" + tail)[::-1].encode('ascii')
+    total = sum(digits[0::2].translate(_DIGIT_VALUE)) + sum(digits[1::2].translate(_DOUBLED_VALUE))
+    return head + str(-total % 10) + tail
+
+
+def _xor(data: bytes, keystream: bytes) -> bytes:
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(keystream, 'big')).to_bytes(len(data), 'big')
+
+
+class TokenVault:
+    """
+    Vault di token surrogati su sqlite3.
+    
+    tokenize è deterministico: lo stesso PAN riceve sempre lo stesso token.
+    I metodi sono sicuri tra thread dello stesso processo.
+    
+    Args:
+        path: File sqlite3 del vault (':memory:' per un vault temporaneo)
+        key: Chiave principale (default: LUHN_VAULT_KEY)
+        cache_size: Numero di PAN detokenizzati tenuti in cache (0 = nessuna)
+    """
+    
+    def __init__(self, path: str = DEFAULT_VAULT_FILE, key: Optional[bytes] = None, cache_size: int = DEFAULT_CACHE_SIZE):
+        master = vault_key(key)
+        self._encryption_key = _derive(master, b"luhn-vault-enc")
+        self._mac_key = _derive(master, b"luhn-vault-mac")
+        self._index_key = _derive(master, b"luhn-vault-idx")
+        self._aead = AESGCM(_derive(master, b"luhn-vault-aes")) if AESGCM is not None else None
+        self.path = path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+        
+        # Indice in memoria: digest del PAN -> token e token -> id della riga
+        self._by_digest: Dict[bytes, str] = {}
+        self._by_token: Dict[str, int] = {}
+        self._last_id = 0
+        self._sync_index()
+    
+    def _sync_index(self) -> None:
+        """Carica nell'indice le righe non ancora note (anche di altre istanze)."""
+        for row_id, pan_digest, token in self._db.execute(
+                "SELECT id, pan_digest, token FROM tokens WHERE id > ? ORDER BY id", (self._last_id,)):
+            self._by_digest[pan_digest] = token
+            self._by_token[token] = row_id
+            self._last_id = row_id
+    
+    def __len__(self) -> int:
+        return len(self._by_token)
+    
+    def __contains__(self, token: str) -> bool:
+        return token in self._by_token
+    
+    # --- cifratura -----------------------------------------------------------
+    
+    def _pan_digest(self, pan: str) -> bytes:
+        return hashlib.blake2b(pan.encode('ascii'), digest_size=DIGEST_SIZE, key=self._index_key).digest()
+    
+    def _keystream(self, nonce: bytes, size: int) -> bytes:
+        return hashlib.blake2b(nonce, digest_size=size, key=self._encryption_key).digest()
+    
+    def _encrypt(self, pan: str) -> bytes:
+        data = pan.encode('ascii')
+        if self._aead is not None:
+            nonce = secrets.token_bytes(AESGCM_NONCE_SIZE)
+            header = bytes((SCHEME_AESGCM,))
+            return header + nonce + self._aead.encrypt(nonce, data, header)
+        
+        # Fallback senza dipendenze: keystream BLAKE2b + MAC BLAKE2b con chiave
+        nonce = secrets.token_bytes(NONCE_SIZE)
+        header = bytes((SCHEME_BLAKE2B,)) + nonce
+        ciphertext = _xor(data, self._keystream(nonce, len(data)))
+        tag = hashlib.blake2b(header + ciphertext, digest_size=TAG_SIZE, key=self._mac_key).digest()
+        return header + ciphertext + tag
+    
+    def _decrypt(self, blob: bytes) -> str:
+        scheme = blob[0]
+        if scheme == SCHEME_AESGCM:
+            if self._aead is None:
+                raise ValueError("PAN cifrato con AES-GCM: installare il pacchetto cryptography")
+            header, nonce = blob[:1], blob[1:1 + AESGCM_NONCE_SIZE]
+            try:
+                return self._aead.decrypt(nonce, blob[1 + AESGCM_NONCE_SIZE:], header).decode('ascii')
+            except InvalidTag:
+                raise ValueError("PAN cifrato alterato o chiave del vault errata") from None
+        if scheme != SCHEME_BLAKE2B:
+            raise ValueError(f"Schema di cifratura sconosciuto: {scheme}")
+        
+        header, ciphertext, tag = blob[:1 + NONCE_SIZE], blob[1 + NONCE_SIZE:-TAG_SIZE], blob[-TAG_SIZE:]
+        expected = hashlib.blake2b(header + ciphertext, digest_size=TAG_SIZE, key=self._mac_key).digest()
+        if not hmac.compare_digest(tag, expected):
+            raise ValueError("PAN cifrato alterato o chiave del vault errata")
+        return _xor(ciphertext, self._keystream(header[1:], len(ciphertext))).decode('ascii')
+    
+    # --- cache ---------------------------------------------------------------
+    
+    def _cache_get(self, token: str) -> Optional[str]:
+        pan = self._cache.get(token)
+        if pan is not None:
+            self._cache.move_to_end(token)
+        return pan
+    
+    def _cache_put(self, token: str, pan: str) -> None:
+        if self.cache_size <= 0:
+            return
+        self._cache[token] = pan
+        self._cache.move_to_end(token)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    # --- API -----------------------------------------------------------------
+    
+    def _new_token(self, pan: str) -> str:
+        for _ in range(_MAX_TOKEN_ATTEMPTS):
+            token = _luhn_token(pan)
+            if token != pan and token not in self._by_token:
+                return token
+        raise ValueError("Spazio dei token esaurito per questa lunghezza e ultime cifre")
+    
+    def tokenize(self, pan: str) -> str:
+        """
+        Restituisce il token del PAN, creandolo se non esiste.
+        
+        Raises:
+            ValueError: Se il PAN non è un numero di carta valido
+        """
+        return self.tokenize_many([pan])[0]
+    
+    def tokenize_many(self, pans: Iterable[str]) -> List[str]:
+        """
+        Tokenizza una sequenza di PAN con un'unica transazione.
+        
+        Returns:
+            Token nello stesso ordine dei PAN
+            
+        Raises:
+            ValueError: Se un PAN non è valido (nessun token viene salvato)
+        """
+        pans = list(pans)
+        for pan in pans:
+            if not validate_luhn(pan):
+                raise ValueError(f"Numero di carta non valido (checksum di Luhn): ...{pan[-4:]}")
+        
+        with self._lock:
+            digests = [self._pan_digest(pan) for pan in pans]
+            for attempt in range(_MAX_INSERT_ATTEMPTS):
+                pending: Dict[bytes, tuple] = {}
+                created = datetime.now().isoformat()
+                try:
+                    for pan, pan_digest in zip(pans, digests):
+                        if pan_digest in self._by_digest or pan_digest in pending:
+                            continue
+                        token = self._new_token(pan)
+                        pan_encrypted = self._encrypt(pan)
+                        # Riserva subito il token per i PAN successivi del batch
+                        self._by_token[token] = -1
+                        pending[pan_digest] = (pan_digest, token, pan_encrypted, created)
+                    
+                    if pending:
+                        with self._db:
+                            self._db.executemany(
+                                "INSERT INTO tokens (pan_digest, token, pan_encrypted, created) VALUES (?, ?, ?, ?)",
+                                list(pending.values())
+                            )
+                except BaseException as e:
+                    # Annulla le prenotazioni: nessun token del batch resta nell'indice
+                    for row in pending.values():
+                        self._by_token.pop(row[1], None)
+                    if not isinstance(e, sqlite3.IntegrityError) or attempt == _MAX_INSERT_ATTEMPTS - 1:
+                        raise
+                    # Un'altra istanza sullo stesso database ha già inserito il
+                    # PAN (o usato il token): si ricarica l'indice e si riprova
+                    self._sync_index()
+                    continue
+                break
+            
+            if pending:
+                self._sync_index()
+            tokens = [self._by_digest[pan_digest] for pan_digest in digests]
+            # Chi tokenizza di solito detokenizza poco dopo: i PAN vanno in cache
+            for pan, token in zip(pans, tokens):
+                self._cache_put(token, pan)
+            return tokens
+    
+    def detokenize(self, token: str) -> str:
+        """
+        Restituisce il PAN del token.
+        
+        Raises:
+            ValueError: Se il token non è nel vault
+        """
+        with self._lock:
+            pan = self._cache_get(token)
+        if pan is not None:
+            return pan
+        return self.detokenize_many([token])[0]
+    
+    def detokenize_many(self, tokens: Iterable[str]) -> List[str]:
+        """
+        Detokenizza una sequenza di token: cache LRU, poi letture a blocchi.
+        
+        Raises:
+            ValueError: Se un token non è nel vault
+        """
+        tokens = list(tokens)
+        with self._lock:
+            pans: Dict[str, str] = {}
+            missing = []
+            for token in tokens:
+                if token in pans:
+                    continue
+                pan = self._cache_get(token)
+                if pan is not None:
+                    pans[token] = pan
+                elif token not in self._by_token:
+                    raise ValueError(f"Token sconosciuto: {token}")
+                else:
+                    missing.append(self._by_token[token])
+            
+            for start in range(0, len(missing), _SQL_CHUNK):
+                ids = missing[start:start + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(ids))
+                query = f"SELECT token, pan_encrypted FROM tokens WHERE id IN ({placeholders})"
+                for token, blob in self._db.execute(query, ids):
+                    pan = self._decrypt(blob)
+                    pans[token] = pan
+                    self._cache_put(token, pan)
+            
+            return [pans[token] for token in tokens]
+    
+    def close(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._db.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,427 @@
+"""
+Daemon di ingestione da cartella: valida i CSV depositati nella inbox.
+
+Struttura della cartella radice:
+
+    inbox/       file depositati dai partner
+    processing/  una sottocartella per daemon con i file presi in carico
+                 (rename atomico: un solo worker per file)
+    done/        file elaborati + report con PAN mascherato '<nome>.report.csv'
+    failed/      file non elaborabili + motivo in '<nome>.error.txt'
+
+Più daemon possono osservare la stessa radice. Ognuno detiene per tutta la
+sua vita il lock 'processing/<id>.lock': all'avvio vengono riportati nella
+inbox solo i file delle sottocartelle il cui lock è libero (daemon
+terminato). Un file con lo stesso nome di uno già presente in done/ o
+failed/ riceve un contatore ('lotto.1.csv') invece di sovrascriverlo.
+
+I nuovi file vengono rilevati con polling o, se disponibile il pacchetto
+opzionale inotify_simple, con inotify. La validazione avviene in un pool di
+worker limitato; l'audit è scritto con LockedAuditSink (sicuro tra processi).
+
+Uso da riga di comando:
+    python luhn_watch.py /srv/carte --workers 4 --interval 1.0
+"""
+
+import argparse
+import os
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from luhnalgorithm import (
+    AUDIT_LOG_FILE, DEFAULT_HASH_ALGORITHM, configure_logging, logger, validate_cards_from_csv
+)
+from luhn_audit_sink import LockedAuditSink, _FileLock
+from luhn_metrics import METRICS, enable_metrics
+from luhn_result_sinks import MaskedReportSink
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+INBOX_DIR = "inbox"
+PROCESSING_DIR = "processing"
+DONE_DIR = "done"
+FAILED_DIR = "failed"
+IGNORED_SUFFIXES = (".tmp", ".part", ".partial")
+REPORT_SUFFIX = ".report.csv"
+ERROR_SUFFIX = ".error.txt"
+
+WATCH_QUEUE_DEPTH = METRICS.gauge(
+    "luhn_watch_queue_depth", "File in attesa nella inbox"
+)
+WATCH_IN_FLIGHT = METRICS.gauge(
+    "luhn_watch_in_flight", "File in elaborazione"
+)
+WATCH_FILES = METRICS.counter(
+    "luhn_watch_files_total", "File elaborati per esito", ("status",)
+)
+WATCH_ROWS = METRICS.counter(
+    "luhn_watch_rows_total", "Righe validate dal daemon per esito", ("result",)
+)
+
+
+class _CountingSink:
+    """Inoltra i risultati a un sink contando validi, non validi ed errori."""
+    
+    def __init__(self, inner):
+        self.inner = inner
+        self.counts = {'valid': 0, 'invalid': 0, 'error': 0}
+    
+    def write(self, row_num: int, card_number: str, is_valid: bool, error: str = "") -> None:
+        self.counts['error' if error else 'valid' if is_valid else 'invalid'] += 1
+        self.inner.write(row_num, card_number, is_valid, error)
+    
+    def flush(self) -> None:
+        self.inner.flush()
+    
+    def tell(self) -> int:
+        return self.inner.tell()
+
+
+def _reserve_name(directory: str, name: str, sidecar_suffix: str) -> str:
+    """
+    Sceglie in directory un nome libero per name ('lotto.csv', 'lotto.1.csv', ...).
+    
+    Il nome è riservato creando in modo esclusivo il file accessorio
+    '<nome><sidecar_suffix>' (report o motivo dell'errore), così due worker
+    non possono scegliere lo stesso nome.
+    """
+    stem, ext = os.path.splitext(name)
+    candidate = name
+    counter = 0
+    while True:
+        if not os.path.exists(os.path.join(directory, candidate)):
+            try:
+                fd = os.open(
+                    os.path.join(directory, candidate + sidecar_suffix),
+                    os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644
+                )
+            except FileExistsError:
+                pass
+            else:
+                os.close(fd)
+                return candidate
+        counter += 1
+        candidate = f"{stem}.{counter}{ext}"
+
+
+def process_claimed_file(
+    claimed_path: str,
+    done_dir: str,
+    failed_dir: str,
+    enable_audit: bool = True,
+    audit_file: str = AUDIT_LOG_FILE,
+    hash_algorithm: str = DEFAULT_HASH_ALGORITHM
+) -> Dict[str, object]:
+    """
+    Valida un file già preso in carico e lo sposta in done/ o failed/.
+    
+    Funzione di modulo (serializzabile) per l'uso con ProcessPoolExecutor.
+    
+    Returns:
+        Dizionario con 'file', 'status' ('done' o 'failed'), conteggi per
+        esito e secondi impiegati
+    """
+    name = os.path.basename(claimed_path)
+    started = time.perf_counter()
+    stats: Dict[str, object] = {'file': name, 'valid': 0, 'invalid': 0, 'error': 0}
+    done_name = _reserve_name(done_dir, name, REPORT_SUFFIX)
+    report_path = os.path.join(done_dir, done_name + REPORT_SUFFIX)
+    
+    try:
+        with MaskedReportSink(report_path) as report:
+            sink = _CountingSink(report)
+            audit_sink = LockedAuditSink(audit_file) if enable_audit else None
+            try:
+                validate_cards_from_csv(
+                    claimed_path, enable_audit=enable_audit, hash_algorithm=hash_algorithm,
+                    audit_sink=audit_sink, result_sink=sink, collect_results=False
+                )
+            finally:
+                # Anche in caso di errore le righe già validate restano nell'audit
+                if audit_sink is not None:
+                    audit_sink.close()
+        stats.update(sink.counts)
+        os.replace(claimed_path, os.path.join(done_dir, done_name))
+        stats['status'] = 'done'
+    except Exception as e:
+        logger.error(f"Elaborazione di {name} fallita: {e}")
+        if os.path.exists(report_path):
+            os.remove(report_path)
+        failed_name = _reserve_name(failed_dir, name, ERROR_SUFFIX)
+        with open(os.path.join(failed_dir, failed_name + ERROR_SUFFIX), 'w', encoding='utf-8') as f:
+            f.write(f"{type(e).__name__}: {e}\n")
+        os.replace(claimed_path, os.path.join(failed_dir, failed_name))
+        stats['status'] = 'failed'
+    
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class WatchFolderDaemon:
+    """
+    Osserva la inbox e valida i file con un pool di worker limitato.
+    
+    Args:
+        root: Cartella radice (le sottocartelle vengono create se mancano)
+        workers: Numero massimo di file elaborati in parallelo
+        poll_interval: Secondi tra due scansioni (o timeout di inotify)
+        settle_seconds: Età minima di un file prima della presa in carico,
+            per non leggere file ancora in scrittura
+        use_inotify: Se True usa inotify (richiede inotify_simple), altrimenti
+            o in sua assenza il polling
+        use_processes: Se True il pool usa processi, altrimenti thread
+        enable_audit: Se True registra le validazioni nell'audit
+        audit_file: File di audit condiviso tra i worker
+        hash_algorithm: Backend di hashing per l'audit
+    """
+    
+    def __init__(
+        self,
+        root: str,
+        workers: int = 4,
+        poll_interval: float = 1.0,
+        settle_seconds: float = 1.0,
+        use_inotify: bool = False,
+        use_processes: bool = True,
+        enable_audit: bool = True,
+        audit_file: str = AUDIT_LOG_FILE,
+        hash_algorithm: str = DEFAULT_HASH_ALGORITHM
+    ):
+        self.root = root
+        self.inbox = os.path.join(root, INBOX_DIR)
+        self.processing_root = os.path.join(root, PROCESSING_DIR)
+        self.done = os.path.join(root, DONE_DIR)
+        self.failed = os.path.join(root, FAILED_DIR)
+        for directory in (self.inbox, self.processing_root, self.done, self.failed):
+            os.makedirs(directory, exist_ok=True)
+        
+        # Il lock viene acquisito prima di creare la sottocartella: un altro
+        # daemon non può scambiarla per quella di un daemon terminato
+        self.daemon_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.processing = os.path.join(self.processing_root, self.daemon_id)
+        self._owner_lock: Optional[_FileLock] = _FileLock(f"{self.processing}.lock", blocking=False)
+        self._owner_lock.__enter__()
+        os.makedirs(self.processing)
+        
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.enable_audit = enable_audit
+        self.audit_file = os.path.abspath(audit_file)
+        self.hash_algorithm = hash_algorithm
+        
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self._executor = executor_class(max_workers=workers)
+        self._in_flight: Dict[Future, str] = {}
+        self._running = False
+        self._started = time.monotonic()
+        self.queue_depth = 0
+        self.files_done = 0
+        self.files_failed = 0
+        self.rows_processed = 0
+        
+        self._inotify = None
+        if use_inotify:
+            if inotify_simple is None:
+                logger.warning("inotify_simple non disponibile: uso il polling")
+            else:
+                self._inotify = inotify_simple.INotify()
+                flags = inotify_simple.flags
+                self._inotify.add_watch(self.inbox, flags.CLOSE_WRITE | flags.MOVED_TO)
+        
+        self._recover_processing()
+    
+    def _recover_processing(self) -> None:
+        """Riporta nella inbox i file presi in carico da daemon non più attivi."""
+        with os.scandir(self.processing_root) as entries:
+            orphans = [e.path for e in entries if e.is_dir() and e.path != self.processing]
+        for directory in orphans:
+            try:
+                with _FileLock(f"{directory}.lock", blocking=False):
+                    for name in os.listdir(directory):
+                        os.replace(os.path.join(directory, name), os.path.join(self.inbox, name))
+                        logger.warning(f"File {name} ripreso da un'esecuzione interrotta")
+                    os.rmdir(directory)
+            except FileNotFoundError:
+                # Già recuperata da un altro daemon
+                pass
+            except OSError:
+                # Lock detenuto: il daemon proprietario è ancora attivo
+                continue
+            _remove_quietly(f"{directory}.lock")
+    
+    def _pending_files(self) -> List[str]:
+        now = time.time()
+        pending = []
+        with os.scandir(self.inbox) as entries:
+            for entry in entries:
+                if (not entry.is_file() or entry.name.startswith('.')
+                        or entry.name.endswith(IGNORED_SUFFIXES)):
+                    continue
+                if now - entry.stat().st_mtime < self.settle_seconds:
+                    continue
+                pending.append(entry.name)
+        return sorted(pending)
+    
+    def _claim(self, name: str) -> Optional[str]:
+        """Prende in carico il file con un rename atomico (None se già preso)."""
+        claimed = os.path.join(self.processing, name)
+        try:
+            os.rename(os.path.join(self.inbox, name), claimed)
+        except FileNotFoundError:
+            return None
+        return claimed
+    
+    def _reap(self) -> None:
+        """Raccoglie i risultati dei worker terminati."""
+        for future in [f for f in self._in_flight if f.done()]:
+            name = self._in_flight.pop(future)
+            try:
+                stats = future.result()
+            except Exception as e:
+                logger.error(f"Worker fallito su {name}: {e}")
+                self.files_failed += 1
+                continue
+            
+            rows = stats['valid'] + stats['invalid'] + stats['error']
+            self.rows_processed += rows
+            if stats['status'] == 'done':
+                self.files_done += 1
+            else:
+                self.files_failed += 1
+            if METRICS.enabled:
+                WATCH_FILES.inc((stats['status'],))
+                for result in ('valid', 'invalid', 'error'):
+                    WATCH_ROWS.inc((result,), stats[result])
+            logger.info(f"File {name}: {stats['status']} - {rows} righe in {stats['seconds']:.2f}s")
+    
+    def run_once(self) -> int:
+        """
+        Esegue una scansione: raccoglie i worker terminati e assegna i
+        nuovi file fino a saturare il pool.
+        
+        Returns:
+            Numero di file presi in carico
+        """
+        self._reap()
+        pending = self._pending_files()
+        claimed_count = 0
+        for name in pending:
+            if len(self._in_flight) >= self.workers:
+                break
+            claimed = self._claim(name)
+            if claimed is None:
+                continue
+            future = self._executor.submit(
+                process_claimed_file, claimed, self.done, self.failed,
+                self.enable_audit, self.audit_file, self.hash_algorithm
+            )
+            self._in_flight[future] = name
+            claimed_count += 1
+        
+        self.queue_depth = len(pending) - claimed_count
+        if METRICS.enabled:
+            WATCH_QUEUE_DEPTH.set(self.queue_depth)
+            WATCH_IN_FLIGHT.set(len(self._in_flight))
+        return claimed_count
+    
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Attende che inbox e worker siano vuoti (utile per test e batch)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.run_once()
+            if not self._in_flight and self.queue_depth == 0 and not self._pending_files():
+                return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(min(0.05, self.poll_interval))
+    
+    def _wait_for_events(self) -> None:
+        if self._inotify is not None:
+            self._inotify.read(timeout=int(self.poll_interval * 1000))
+        else:
+            time.sleep(self.poll_interval)
+    
+    def run_forever(self) -> None:
+        """Ciclo principale fino a stop() o KeyboardInterrupt."""
+        self._running = True
+        logger.info(f"Watch folder attivo su {self.inbox} ({self.workers} worker)")
+        try:
+            while self._running:
+                self.run_once()
+                self._wait_for_events()
+        except KeyboardInterrupt:
+            logger.info("Arresto richiesto")
+        finally:
+            self.close()
+    
+    def stop(self) -> None:
+        self._running = False
+    
+    def stats(self) -> Dict[str, float]:
+        """Contatori: profondità della coda, file in corso, esiti e throughput."""
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        return {
+            'queue_depth': self.queue_depth,
+            'in_flight': len(self._in_flight),
+            'files_done': self.files_done,
+            'files_failed': self.files_failed,
+            'rows_processed': self.rows_processed,
+            'rows_per_second': self.rows_processed / elapsed,
+            'files_per_minute': 60 * (self.files_done + self.files_failed) / elapsed,
+        }
+    
+    def close(self) -> None:
+        """Attende i worker in corso, chiude il pool e rilascia la sottocartella."""
+        self._executor.shutdown(wait=True)
+        self._reap()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        if self._owner_lock is not None:
+            if not os.listdir(self.processing):
+                os.rmdir(self.processing)
+            self._owner_lock.__exit__(None, None, None)
+            self._owner_lock = None
+            if not os.path.exists(self.processing):
+                _remove_quietly(f"{self.processing}.lock")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Punto di ingresso da riga di comando."""
+    parser = argparse.ArgumentParser(description="Daemon di validazione da cartella")
+    parser.add_argument("root", help="Cartella radice (inbox/, done/, failed/)")
+    parser.add_argument("--workers", type=int, default=4, help="Worker in parallelo")
+    parser.add_argument("--interval", type=float, default=1.0, help="Intervallo di polling (s)")
+    parser.add_argument("--inotify", action="store_true", help="Usa inotify se disponibile")
+    parser.add_argument("--no-audit", action="store_true", help="Disabilita l'audit log")
+    parser.add_argument("--audit-file", default=AUDIT_LOG_FILE, help="File di audit")
+    parser.add_argument("--metrics-port", type=int, help="Espone le metriche Prometheus su questa porta")
+    args = parser.parse_args(argv)
+    configure_logging()
+    
+    if args.metrics_port:
+        enable_metrics()
+        METRICS.start_http_server(args.metrics_port)
+    
+    daemon = WatchFolderDaemon(
+        args.root, workers=args.workers, poll_interval=args.interval,
+        use_inotify=args.inotify, enable_audit=not args.no_audit, audit_file=args.audit_file
+    )
+    daemon.run_forever()
+
+
+if __name__ == "__main__":
+    main()
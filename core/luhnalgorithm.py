@@ -4,101 +4,346 @@ Validatore numero carta di credito usando l'algoritmo di Luhn.
 ⚠️ AVVISO SICUREZZA:
 - NON usare con numeri di carta reali in produzione
 - Usa SOLO numeri di test autorizzati per testing
-- Implementa tokenization/crittografia per dati reali
+- Implementa tokenization/crittografia per dati reali (vedi luhn_vault)
 - Conforme GDPR e PCI DSS per ambiente di test
 """
 
 import logging
 import csv
 import hashlib
+import hmac
+import os
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import List, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
-# Configurazione logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+from luhn_metrics import METRICS, VALIDATIONS, VALIDATION_LATENCY, HASH_LATENCY, AUDIT_WRITE_LATENCY
+from luhn_checkdigit import LUHN
+from luhn_checkpoint import (
+    DEFAULT_CHECKPOINT_EVERY, BatchCheckpoint, OffsetLineReader,
+    audit_position, count_audited_rows, load_checkpoint, save_checkpoint
 )
+from luhn_memory import DEFAULT_MAX_LINE_BYTES, DEFAULT_READ_BUFFER, MemoryCeiling
+from luhn_profiling import (
+    Profiler, active_profiler, profile, span,
+    STAGE_CSV_PARSE, STAGE_VALIDATE, STAGE_CARD_TYPE, STAGE_HASH, STAGE_AUDIT_IO
+)
+
+# Logging: la libreria non configura handler all'import (lo fanno gli
+# script con configure_logging), così chi la importa resta veloce e decide
+# da sé dove mandare i log
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 logger = logging.getLogger(__name__)
 
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """Configura il logging su console per gli script da riga di comando."""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+
 # Costanti
 MIN_CARD_LENGTH = 13
 MAX_CARD_LENGTH = 19
 AUDIT_LOG_FILE = "validation_audit.csv"
+DEFAULT_HASH_ALGORITHM = 'sha3_256'
+HASH_KEY_ENV_VAR = "LUHN_AUDIT_HASH_KEY"
+AUDIT_FIELDNAMES = ['timestamp', 'card_hash', 'hash_algorithm', 'is_valid', 'card_type', 'card_length']
+
+# Separatori rimossi in modalità normalize (spazi, trattini, tab, a capo)
+CARD_SEPARATORS = " -\t\r\n"
+_STR_SEPARATOR_TABLE = str.maketrans('', '', CARD_SEPARATORS)
+_BYTES_SEPARATORS = CARD_SEPARATORS.encode('ascii')
+
+# API intera: contributo di Luhn di ogni coppia di cifre 00..99 (le decine sono
+# in posizione raddoppiata) e, combinando due coppie, di ogni gruppo di 4 cifre
+_LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+_LUHN_PAIR_SUM = tuple(_LUHN_DOUBLED[pair // 10] + pair % 10 for pair in range(100))
+_LUHN_QUAD_SUM = tuple(_LUHN_PAIR_SUM[quad // 100] + _LUHN_PAIR_SUM[quad % 100] for quad in range(10000))
+_MIN_INT_PAN = 10 ** (MIN_CARD_LENGTH - 1)
+_MAX_INT_PAN = 10 ** MAX_CARD_LENGTH
+
+
+class HashBackend:
+    """
+    Backend di hashing per l'audit, costruito (e con chiave) una sola volta.
+    
+    L'oggetto hash iniziale viene creato alla registrazione: ogni digest
+    parte da una sua copia, senza rifare l'inizializzazione della chiave.
+    """
+    
+    def __init__(self, name: str, prototype, keyed: bool = False):
+        self.name = name
+        self.keyed = keyed
+        self._prototype = prototype
+    
+    def digest(self, card_number: str) -> str:
+        """Restituisce il digest esadecimale del numero di carta."""
+        h = self._prototype.copy()
+        h.update(card_number.encode())
+        return h.hexdigest()
+    
+    def digest_bytes(self, card_number: str) -> bytes:
+        """Restituisce il digest binario (metà spazio dell'esadecimale)."""
+        h = self._prototype.copy()
+        h.update(card_number.encode())
+        return h.digest()
+    
+    def __repr__(self) -> str:
+        return f"HashBackend({self.name!r}, keyed={self.keyed})"
+
+
+# Registro dei backend: nome -> (factory(key) -> oggetto hash, richiede chiave)
+_HASH_BACKEND_FACTORIES: Dict[str, Tuple[Callable[[Optional[bytes]], object], bool]] = {
+    'sha3_256': (lambda key: hashlib.sha3_256(), False),
+    'sha3_512': (lambda key: hashlib.sha3_512(), False),
+    'blake2b_keyed': (lambda key: hashlib.blake2b(key=key, digest_size=32), True),
+    'hmac_sha256': (lambda key: hmac.new(key, digestmod=hashlib.sha256), True),
+}
+_hash_backend_cache: Dict[Tuple[str, Optional[bytes]], HashBackend] = {}
+
+
+def register_hash_backend(
+    name: str,
+    factory: Callable[[Optional[bytes]], object],
+    keyed: bool = False
+) -> None:
+    """
+    Registra un nuovo backend di hashing per l'audit.
+    
+    Args:
+        name: Nome del backend (registrato nella colonna 'hash_algorithm')
+        factory: Funzione che riceve la chiave (o None) e restituisce un
+            oggetto hash con copy(), update() e hexdigest()
+        keyed: Se True, il backend richiede una chiave segreta
+    """
+    _HASH_BACKEND_FACTORIES[name] = (factory, keyed)
+    for cached in [k for k in _hash_backend_cache if k[0] == name]:
+        del _hash_backend_cache[cached]
+
+
+def available_hash_backends() -> List[str]:
+    """Restituisce i nomi dei backend di hashing registrati."""
+    return sorted(_HASH_BACKEND_FACTORIES)
+
+
+def get_hash_backend(name: str = DEFAULT_HASH_ALGORITHM, key: Optional[bytes] = None) -> HashBackend:
+    """
+    Restituisce il backend di hashing richiesto, costruendolo al primo uso.
+    
+    Args:
+        name: Nome del backend (vedi available_hash_backends())
+        key: Chiave segreta per i backend con chiave; se assente viene letta
+            dalla variabile d'ambiente LUHN_AUDIT_HASH_KEY
+        
+    Returns:
+        Backend pronto all'uso (condiviso tra chiamate con gli stessi parametri)
+        
+    Raises:
+        ValueError: Se il backend non esiste o manca la chiave richiesta
+    """
+    if name not in _HASH_BACKEND_FACTORIES:
+        raise ValueError(f"Algoritmo non supportato: {name}")
+    
+    factory, keyed = _HASH_BACKEND_FACTORIES[name]
+    if keyed:
+        if key is None:
+            env_key = os.environ.get(HASH_KEY_ENV_VAR)
+            if not env_key:
+                raise ValueError(
+                    f"Il backend '{name}' richiede una chiave (parametro key o {HASH_KEY_ENV_VAR})"
+                )
+            key = env_key.encode()
+    else:
+        key = None
+    
+    backend = _hash_backend_cache.get((name, key))
+    if backend is None:
+        backend = HashBackend(name, factory(key), keyed=keyed)
+        _hash_backend_cache[(name, key)] = backend
+    return backend
 
 
-def hash_card_number(card_number: str, algorithm: str = 'sha3_256') -> str:
+def hash_card_number(
+    card_number: str,
+    algorithm: str = DEFAULT_HASH_ALGORITHM,
+    key: Optional[bytes] = None
+) -> str:
     """
-    Genera un hash del numero di carta usando SHA-3.
+    Genera un hash del numero di carta con il backend richiesto.
     
     Args:
         card_number: Numero di carta in chiaro
-        algorithm: Algoritmo di hashing (default: sha3_256)
+        algorithm: Backend di hashing (default: sha3_256, vedi available_hash_backends())
+        key: Chiave segreta per i backend con chiave (blake2b_keyed, hmac_sha256)
         
     Returns:
-        Hash SHA-3 del numero di carta
+        Hash esadecimale del numero di carta
         
     Note:
         Il numero originale NON può essere recuperato dall'hash (one-way function)
         Conforme PCI DSS e GDPR - Non salva dati in chiaro
+        I backend con chiave resistono al brute-force dello spazio dei PAN
     """
-    if algorithm == 'sha3_256':
-        return hashlib.sha3_256(card_number.encode()).hexdigest()
-    elif algorithm == 'sha3_512':
-        return hashlib.sha3_512(card_number.encode()).hexdigest()
-    else:
-        raise ValueError(f"Algoritmo non supportato: {algorithm}")
+    return get_hash_backend(algorithm, key).digest(card_number)
+
+
+def build_audit_record(
+    card_number: str,
+    is_valid: bool,
+    card_type: str = "Unknown",
+    backend: Optional[HashBackend] = None
+) -> dict:
+    """
+    Costruisce un record di audit (con numero hashato) pronto per la scrittura.
+    
+    Args:
+        card_number: Numero di carta (verrà hashato)
+        is_valid: Risultato della validazione
+        card_type: Tipo di carta
+        backend: Backend di hashing (default: sha3_256)
+        
+    Returns:
+        Dizionario con le colonne di AUDIT_FIELDNAMES
+    """
+    if backend is None:
+        backend = get_hash_backend()
+    
+    with span(STAGE_HASH):
+        if METRICS.enabled:
+            start_ns = time.perf_counter_ns()
+            card_hash = backend.digest(card_number)
+            HASH_LATENCY.observe_ns(time.perf_counter_ns() - start_ns)
+        else:
+            card_hash = backend.digest(card_number)
+    
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'card_hash': card_hash,
+        'hash_algorithm': backend.name,
+        'is_valid': 'Si' if is_valid else 'No',
+        'card_type': card_type,
+        'card_length': len(card_number)
+    }
+
+
+# File di audit il cui header è già stato controllato: path -> (st_dev, st_ino)
+_checked_audit_files: Dict[str, Tuple[int, int]] = {}
+
+
+def prepare_audit_file(filename: str) -> bool:
+    """
+    Controlla l'header del file di audit prima di accodare nuove righe.
+    
+    Un file con header diverso da AUDIT_FIELDNAMES (es. creato prima della
+    colonna 'hash_algorithm') viene rinominato in '<filename>.legacy-<data>':
+    le nuove righe non finiscono mai sotto un header con colonne diverse.
+    L'esito viene memorizzato per inode, quindi l'header si rilegge solo
+    quando il file cambia.
+    
+    Returns:
+        True se il file è nuovo (o vuoto) e va scritto l'header
+    """
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return True
+    if stat.st_size == 0:
+        return True
+    
+    path = os.path.abspath(filename)
+    identity = (stat.st_dev, stat.st_ino)
+    if _checked_audit_files.get(path) == identity:
+        return False
+    
+    with open(filename, 'rb') as f:
+        header = f.readline().rstrip(b'\r\n').decode('utf-8', 'replace')
+    if header.split(',') != AUDIT_FIELDNAMES:
+        rotated = f"{filename}.legacy-{datetime.now():%Y%m%d%H%M%S}"
+        suffix = 1
+        while os.path.exists(rotated):
+            rotated = f"{filename}.legacy-{datetime.now():%Y%m%d%H%M%S}-{suffix}"
+            suffix += 1
+        os.rename(filename, rotated)
+        _checked_audit_files.pop(path, None)
+        logger.warning(
+            f"Header di audit diverso da {','.join(AUDIT_FIELDNAMES)}: "
+            f"{filename} archiviato in {rotated}"
+        )
+        return True
+    
+    _checked_audit_files[path] = identity
+    return False
 
 
 def log_validation_to_csv(
     card_number: str, 
     is_valid: bool, 
     card_type: str = "Unknown",
-    filename: str = AUDIT_LOG_FILE
+    filename: str = AUDIT_LOG_FILE,
+    hash_algorithm: str = DEFAULT_HASH_ALGORITHM,
+    hash_key: Optional[bytes] = None
 ) -> None:
     """
-    Registra la validazione in un file CSV con hash SHA-3.
+    Registra la validazione in un file CSV con il numero hashato.
     
     Args:
         card_number: Numero di carta (verrà hashato)
         is_valid: Risultato della validazione
         card_type: Tipo di carta (Visa, Mastercard, ecc.)
         filename: Path del file CSV per l'audit log
+        hash_algorithm: Backend di hashing (registrato nella colonna 'hash_algorithm')
+        hash_key: Chiave segreta per i backend con chiave
         
     Note:
         - Il numero di carta viene hashato prima di salvare
         - Timestamp automatico
         - Conforme GDPR - No dati personali in chiaro
         - Conforme PCI DSS - Hashing crittografico
+        - Un file esistente con header diverso viene archiviato (prepare_audit_file)
     """
     try:
-        card_hash = hash_card_number(card_number)
-        timestamp = datetime.now().isoformat()
+        record = build_audit_record(
+            card_number, is_valid, card_type, get_hash_backend(hash_algorithm, hash_key)
+        )
         
-        # Crea il file se non esiste
-        file_exists = Path(filename).exists()
+        if METRICS.enabled:
+            start_ns = time.perf_counter_ns()
         
-        with open(filename, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['timestamp', 'card_hash', 'is_valid', 'card_type', 'card_length'])
-            
-            if not file_exists:
-                writer.writeheader()
+        with span(STAGE_AUDIT_IO):
+            # Crea il file se non esiste (o se aveva un header diverso)
+            write_header = prepare_audit_file(filename)
             
-            writer.writerow({
-                'timestamp': timestamp,
-                'card_hash': card_hash,
-                'is_valid': 'Si' if is_valid else 'No',
-                'card_type': card_type,
-                'card_length': len(card_number)
-            })
+            with open(filename, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=AUDIT_FIELDNAMES)
+                
+                if write_header:
+                    writer.writeheader()
+                
+                writer.writerow(record)
+        
+        if METRICS.enabled:
+            AUDIT_WRITE_LATENCY.observe_ns(time.perf_counter_ns() - start_ns)
         
-        logger.info(f"Audit log salvato: {card_hash[:8]}... - Valido: {is_valid}")
+        logger.info(f"Audit log salvato: {record['card_hash'][:8]}... - Valido: {is_valid}")
     
     except Exception as e:
         logger.error(f"Errore nel logging audit: {e}")
 
 
+def mask_card_number(card_number: str) -> str:
+    """
+    Maschera il numero di carta lasciando visibili le prime 6 e le ultime 4 cifre.
+    
+    Example:
+        >>> mask_card_number("4111111111111111")
+        '411111******1111'
+    """
+    if len(card_number) < MIN_CARD_LENGTH or not card_number.isdigit():
+        return '*' * len(card_number)
+    return card_number[:6] + '*' * (len(card_number) - 10) + card_number[-4:]
+
+
 def detect_card_type(card_number: str) -> str:
     """
     Rileva il tipo di carta dal numero.
@@ -130,13 +375,80 @@ def detect_card_type(card_number: str) -> str:
         return 'Other'
 
 
-def validate_luhn(card_number: str, log_audit: bool = False) -> bool:
+def _check_luhn_ascii(data) -> bool:
+    """
+    Controlla formato e checksum di Luhn su cifre ASCII (bytes o bytearray).
+    
+    Percorso veloce condiviso da tutte le API: il checksum usa lo schema
+    LUHN del motore a tabelle (luhn_checkdigit), che raddoppia le cifre in
+    posizione pari con una tabella di translate e somma direttamente i bytes.
+    
+    Raises:
+        ValueError: Se il formato non è valido
+    """
+    if not data:
+        raise ValueError("Il numero non può essere vuoto")
+    
+    if not data.isdigit():
+        raise ValueError("Il numero deve contenere solo cifre")
+    
+    if len(data) < MIN_CARD_LENGTH or len(data) > MAX_CARD_LENGTH:
+        raise ValueError(f"Il numero deve avere {MIN_CARD_LENGTH}-{MAX_CARD_LENGTH} cifre")
+    
+    return LUHN.checksum_ok(data)
+
+
+def _check_luhn(card_number: str) -> bool:
+    """Controlla formato e checksum di Luhn (ValueError se il formato non è valido)."""
+    if not card_number:
+        raise ValueError("Il numero non può essere vuoto")
+    
+    # isdigit() accetta anche cifre Unicode (es. arabo-indiane): solo ASCII
+    if not (card_number.isascii() and card_number.isdigit()):
+        raise ValueError("Il numero deve contenere solo cifre")
+    
+    return _check_luhn_ascii(card_number.encode('ascii'))
+
+
+def _check_luhn_with_metrics(card_number: str) -> Tuple[bool, str]:
+    """
+    Come _check_luhn, registrando latenza ed esito nelle metriche.
+    
+    Returns:
+        (è_valido, tipo di carta): il tipo, già calcolato per l'etichetta
+        della metrica, viene riusato per il record di audit
+    """
+    card_type = detect_card_type(card_number)
+    start_ns = time.perf_counter_ns()
+    try:
+        is_valid = _check_luhn(card_number)
+    except ValueError:
+        VALIDATIONS.inc(('error', card_type))
+        raise
+    VALIDATION_LATENCY.observe_ns(time.perf_counter_ns() - start_ns)
+    VALIDATIONS.inc(('valid' if is_valid else 'invalid', card_type))
+    return is_valid, card_type
+
+
+def validate_luhn(
+    card_number: str,
+    log_audit: bool = False,
+    hash_algorithm: str = DEFAULT_HASH_ALGORITHM,
+    hash_key: Optional[bytes] = None,
+    audit_sink=None,
+    normalize: bool = False
+) -> bool:
     """
     Valida un numero di carta usando l'algoritmo di Luhn.
     
     Args:
         card_number: Stringa contenente il numero della carta
         log_audit: Se True, registra la validazione nel file di audit (hashata)
+        hash_algorithm: Backend di hashing per l'audit (default: sha3_256)
+        hash_key: Chiave segreta per i backend con chiave
+        audit_sink: Sink di audit (es. LockedAuditSink) al posto della scrittura
+            diretta su validation_audit.csv; riceve il record già hashato
+        normalize: Se True, rimuove prima spazi e trattini (es. "4111 1111 1111 1111")
         
     Returns:
         True se il numero è valido, False altrimenti
@@ -155,55 +467,322 @@ def validate_luhn(card_number: str, log_audit: bool = False) -> bool:
         NON usare numeri di carta reali per testing!
         Se log_audit=True, il numero viene hashato con SHA-3 prima di essere salvato
     """
-    if not card_number:
-        raise ValueError("Il numero non può essere vuoto")
+    if normalize:
+        card_number = card_number.translate(_STR_SEPARATOR_TABLE)
     
-    if not card_number.isdigit():
-        raise ValueError("Il numero deve contenere solo cifre")
+    profiler = active_profiler()
+    card_type = None
+    
+    if profiler is None:
+        if METRICS.enabled:
+            is_valid, card_type = _check_luhn_with_metrics(card_number)
+        else:
+            is_valid = _check_luhn(card_number)
+    else:
+        with profiler.span(STAGE_VALIDATE):
+            if METRICS.enabled:
+                is_valid, card_type = _check_luhn_with_metrics(card_number)
+            else:
+                is_valid = _check_luhn(card_number)
+    
+    # Log audit opzionale (numero hashato, non in chiaro)
+    if log_audit:
+        # Con le metriche attive il tipo di carta è già stato calcolato
+        if card_type is None:
+            if profiler is None:
+                card_type = detect_card_type(card_number)
+            else:
+                with profiler.span(STAGE_CARD_TYPE):
+                    card_type = detect_card_type(card_number)
+        if audit_sink is None:
+            log_validation_to_csv(
+                card_number, is_valid, card_type,
+                hash_algorithm=hash_algorithm, hash_key=hash_key
+            )
+        else:
+            audit_sink.write(build_audit_record(
+                card_number, is_valid, card_type, get_hash_backend(hash_algorithm, hash_key)
+            ))
     
-    if len(card_number) < MIN_CARD_LENGTH or len(card_number) > MAX_CARD_LENGTH:
+    return is_valid
+
+
+def validate_luhn_bytes(
+    data,
+    log_audit: bool = False,
+    normalize: bool = False,
+    hash_algorithm: str = DEFAULT_HASH_ALGORITHM,
+    hash_key: Optional[bytes] = None,
+    audit_sink=None
+) -> bool:
+    """
+    Valida un numero di carta ricevuto come bytes (es. da socket o file).
+    
+    Args:
+        data: Cifre ASCII come bytes, bytearray o memoryview
+        log_audit: Se True, registra la validazione nell'audit (hashata)
+        normalize: Se True, rimuove spazi, trattini, tab e a capo
+        hash_algorithm: Backend di hashing per l'audit (default: sha3_256)
+        hash_key: Chiave segreta per i backend con chiave
+        audit_sink: Sink di audit (vedi validate_luhn)
+        
+    Returns:
+        True se il numero è valido, False altrimenti
+        
+    Raises:
+        ValueError: Se l'input non contiene solo cifre ASCII o ha lunghezza errata
+        
+    Example:
+        >>> validate_luhn_bytes(b"4111-1111-1111-1111\r\n", normalize=True)
+        True
+        
+    Note:
+        Nessuna decodifica in str: controllo e checksum lavorano direttamente
+        sui bytes (un memoryview viene copiato una sola volta).
+    """
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if normalize:
+        data = data.translate(None, _BYTES_SEPARATORS)
+    
+    if not log_audit and not METRICS.enabled and active_profiler() is None:
+        return _check_luhn_ascii(data)
+    
+    # Audit, metriche o profiling attivi: serve la str per hash e tipo carta
+    return validate_luhn(
+        data.decode('latin-1'), log_audit=log_audit,
+        hash_algorithm=hash_algorithm, hash_key=hash_key, audit_sink=audit_sink
+    )
+
+
+def _check_int_length(number: int, length: Optional[int]) -> None:
+    """Controlla la lunghezza del PAN intero (dedotta o esplicita)."""
+    if length is None:
+        if not _MIN_INT_PAN <= number < _MAX_INT_PAN:
+            raise ValueError(f"Il numero deve avere {MIN_CARD_LENGTH}-{MAX_CARD_LENGTH} cifre")
+    elif length < MIN_CARD_LENGTH or length > MAX_CARD_LENGTH:
         raise ValueError(f"Il numero deve avere {MIN_CARD_LENGTH}-{MAX_CARD_LENGTH} cifre")
+    elif number >= 10 ** length:
+        raise ValueError(f"Il numero ha più di {length} cifre")
+
+
+def _luhn_int_checksum_ok(number: int) -> bool:
+    """
+    Checksum di Luhn su un intero fino a 20 cifre, senza cicli: due divmod
+    per 10^8 e poi gruppi di 4 cifre dalla tabella precalcolata.
+    """
+    high, low = divmod(number, 100000000)
+    top, middle = divmod(high, 100000000)
+    quad_sum = _LUHN_QUAD_SUM
+    return (quad_sum[low // 10000] + quad_sum[low % 10000] + quad_sum[middle // 10000]
+            + quad_sum[middle % 10000] + quad_sum[top]) % 10 == 0
+
+
+def validate_luhn_int(
+    number: int,
+    length: Optional[int] = None,
+    log_audit: bool = False,
+    hash_algorithm: str = DEFAULT_HASH_ALGORITHM,
+    hash_key: Optional[bytes] = None,
+    audit_sink=None
+) -> bool:
+    """
+    Valida un numero di carta memorizzato come intero (es. colonna uint64).
     
-    digits = [int(d) for d in card_number]
-    checksum = 0
+    Args:
+        number: PAN come intero non negativo
+        length: Numero di cifre del PAN; se None viene dedotto dal valore.
+            Serve per i PAN con zeri iniziali, che l'intero non conserva
+        log_audit: Se True, registra la validazione nell'audit (hashata)
+        hash_algorithm: Backend di hashing per l'audit (default: sha3_256)
+        hash_key: Chiave segreta per i backend con chiave
+        audit_sink: Sink di audit (vedi validate_luhn)
+        
+    Returns:
+        True se il numero è valido, False altrimenti
+        
+    Raises:
+        TypeError: Se number non è un intero
+        ValueError: Se il numero è negativo o ha lunghezza errata
+        
+    Example:
+        >>> validate_luhn_int(4111111111111111)
+        True
+        
+    Note:
+        Nessuna conversione in str: il checksum somma i contributi di gruppi
+        di 4 cifre da una tabella precalcolata (gli zeri iniziali valgono 0).
+    """
+    if not isinstance(number, int) or isinstance(number, bool):
+        raise TypeError("Il numero deve essere un intero")
+    if number < 0:
+        raise ValueError("Il numero non può essere negativo")
+    _check_int_length(number, length)
     
-    # Processa tutte le cifre tranne l'ultima
-    for i, digit in enumerate(digits[:-1]):
-        # Raddoppia ogni seconda cifra (da destra)
-        if (len(digits) - i) % 2 == 0:
-            digit *= 2
-            if digit > 9:
-                digit -= 9
-        checksum += digit
+    if not log_audit and not METRICS.enabled and active_profiler() is None:
+        return _luhn_int_checksum_ok(number)
     
-    # Verifica se il check digit è corretto
-    check_digit = (10 - (checksum % 10)) % 10
-    is_valid = check_digit == digits[-1]
+    # Audit, metriche o profiling attivi: serve la str per hash e tipo carta
+    return validate_luhn(
+        str(number).zfill(length or 0), log_audit=log_audit,
+        hash_algorithm=hash_algorithm, hash_key=hash_key, audit_sink=audit_sink
+    )
+
+
+def validate_luhn_int_batch(numbers, length: Optional[int] = None):
+    """
+    Valida in blocco PAN interi; i valori di lunghezza errata risultano False.
     
-    # Log audit opzionale (numero hashato, non in chiaro)
-    if log_audit:
-        card_type = detect_card_type(card_number)
-        log_validation_to_csv(card_number, is_valid, card_type)
+    Args:
+        numbers: array('Q'), array NumPy di interi, oggetti convertibili con
+            numpy.asarray (es. pandas Series) o qualsiasi iterabile di interi
+        length: Numero di cifre comune a tutti i PAN (None = dedotto)
+        
+    Returns:
+        Array NumPy di bool per input ndarray, altrimenti lista di bool
+        
+    Raises:
+        TypeError: Se numbers ha un dtype non intero (es. float64, che non
+            rappresenta esattamente i PAN a 16 cifre)
+        
+    Note:
+        Se NumPy è installato anche array('Q') viene elaborato in forma
+        vettoriale, senza copia; altrimenti si usa il percorso per intero.
+    """
+    kind = getattr(getattr(numbers, 'dtype', None), 'kind', None)
+    if kind is not None and kind not in ('u', 'i', 'O'):
+        raise TypeError(
+            f"validate_luhn_int_batch richiede PAN interi, ricevuto dtype {numbers.dtype}: "
+            "convertire a un dtype intero (es. uint64) prima della validazione"
+        )
+    uint64_array = getattr(numbers, 'typecode', None) in ('Q', 'L') and getattr(numbers, 'itemsize', 0) == 8
+    if uint64_array or hasattr(numbers, 'dtype'):
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        if numpy is not None:
+            # array('Q') senza copia; pandas Series e simili tramite asarray
+            values = numpy.frombuffer(numbers, dtype=numpy.uint64) if uint64_array else numpy.asarray(numbers)
+            if values.ndim == 1 and values.dtype.kind in 'ui':
+                results = _luhn_uint64_batch(numpy, values, length)
+                return results if isinstance(numbers, numpy.ndarray) else results.tolist()
     
-    return is_valid
+    if length is None:
+        low_bound, high_bound = _MIN_INT_PAN, _MAX_INT_PAN
+    elif MIN_CARD_LENGTH <= length <= MAX_CARD_LENGTH:
+        low_bound, high_bound = 0, 10 ** length
+    else:
+        return [False for _ in numbers]
+    checksum_ok = _luhn_int_checksum_ok
+    return [low_bound <= number < high_bound and checksum_ok(number) for number in numbers]
+
+
+def _luhn_uint64_batch(numpy, values, length: Optional[int]):
+    """Checksum di Luhn vettoriale su un array di interi (5 gruppi di 4 cifre)."""
+    non_negative = values >= 0 if values.dtype.kind == 'i' else True
+    values = values.astype(numpy.uint64, copy=False)
+    quad_sum = numpy.array(_LUHN_QUAD_SUM, dtype=numpy.uint8)
+    if length is None:
+        valid_length = (values >= numpy.uint64(10 ** (MIN_CARD_LENGTH - 1))) & (values < numpy.uint64(10 ** MAX_CARD_LENGTH))
+    elif MIN_CARD_LENGTH <= length <= MAX_CARD_LENGTH:
+        valid_length = values < numpy.uint64(10 ** length)
+    else:
+        return numpy.zeros(len(values), dtype=bool)
+    
+    remaining = values.copy()
+    total = numpy.zeros(len(values), dtype=numpy.uint16)
+    group = numpy.uint64(10000)
+    for _ in range(5):
+        total += quad_sum[remaining % group]
+        remaining //= group
+    return valid_length & (total % 10 == 0) & non_negative
 
 
-def validate_cards_from_csv(csv_file: str, enable_audit: bool = True) -> List[Tuple[str, bool, str]]:
+def _expected_audit_hashes(csv_file: str, byte_offset: int, backend: HashBackend) -> Iterator[str]:
+    """Hash dei record di audit che le righe del CSV dopo byte_offset producono, in ordine."""
+    with open(csv_file, 'rb', buffering=DEFAULT_READ_BUFFER) as raw:
+        lines = OffsetLineReader(raw)
+        reader = csv.DictReader(lines)
+        if reader.fieldnames is None:
+            return
+        lines.seek(byte_offset)
+        for row in reader:
+            card = row.get('card_number', '').strip()
+            try:
+                _check_luhn(card)
+            except ValueError:
+                continue  # Errore di formato: validate_luhn non scrive audit
+            yield backend.digest(card)
+
+
+def validate_cards_from_csv(
+    csv_file: str,
+    enable_audit: bool = True,
+    hash_algorithm: str = DEFAULT_HASH_ALGORITHM,
+    hash_key: Optional[bytes] = None,
+    profiler: Optional[Profiler] = None,
+    audit_sink=None,
+    checkpoint_file: Optional[str] = None,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    resume: bool = False,
+    result_sink=None,
+    collect_results: bool = True,
+    memory_ceiling: Optional[int] = None
+) -> List[Tuple[str, bool, str]]:
     """
     Valida carte di credito lette da un file CSV.
     
     Args:
         csv_file: Percorso al file CSV (colonna 'card_number')
         enable_audit: Se True, registra i risultati nel file di audit
+        hash_algorithm: Backend di hashing per l'audit (default: sha3_256)
+        hash_key: Chiave segreta per i backend con chiave
+        profiler: Profiler da attivare per questa esecuzione; a fine run il
+            report per stadio viene scritto nel log
+        audit_sink: Sink di audit condiviso (es. con più processi scrittori);
+            viene svuotato con flush() a fine file
+        checkpoint_file: Se indicato, salva periodicamente l'avanzamento
+            (offset nel CSV, riga, posizione nel file di audit)
+        checkpoint_every: Numero di righe tra due checkpoint
+        resume: Se True, riprende dall'ultimo checkpoint di checkpoint_file
+        result_sink: Sink di output in streaming (es. CsvResultSink), riceve
+            ogni risultato appena calcolato
+        collect_results: Se False, i risultati non vengono accumulati in
+            memoria (usare con result_sink per memoria costante)
+        memory_ceiling: Se indicato, attiva la modalità a memoria limitata:
+            righe di lunghezza massima fissa, nessun accumulo dei risultati
+            (richiede collect_results=False, es. con ChunkedResultSink) e
+            MemoryError se l'RSS del processo supera questo numero di byte
         
     Returns:
-        Lista di tuple (numero_carta, è_valido, messaggio_errore)
+        Lista di tuple (numero_carta, è_valido, messaggio_errore); con resume
+        contiene solo le righe validate dopo il checkpoint, con
+        collect_results=False è vuota
         
     Note:
         Se enable_audit=True, ogni validazione viene registrata in 'validation_audit.csv'
         con il numero di carta HASHATO (SHA-3), non in chiaro
         Conforme GDPR e PCI DSS
+        Alla ripresa le righe di audit scritte dopo il checkpoint non vengono
+        rimosse: quelle del run interrotto non vengono ripetute, quelle di
+        altri scrittori restano intatte (vedi count_audited_rows)
     """
+    if profiler is not None:
+        with profile(profiler):
+            results = validate_cards_from_csv(
+                csv_file, enable_audit, hash_algorithm, hash_key, audit_sink=audit_sink,
+                checkpoint_file=checkpoint_file, checkpoint_every=checkpoint_every, resume=resume,
+                result_sink=result_sink, collect_results=collect_results,
+                memory_ceiling=memory_ceiling
+            )
+        logger.info(f"Profiling per stadio:\n{profiler.report()}")
+        return results
+    
+    if enable_audit:
+        # Valida subito backend e chiave: meglio fallire prima di leggere il file
+        get_hash_backend(hash_algorithm, hash_key)
+    
     try:
         import csv as csv_module
     except ImportError:
@@ -211,25 +790,118 @@ def validate_cards_from_csv(csv_file: str, enable_audit: bool = True) -> List[Tu
     
     results = []
     
+    ceiling = None
+    if memory_ceiling is not None:
+        if collect_results:
+            raise ValueError(
+                "La modalità a memoria limitata richiede collect_results=False "
+                "(usare un result_sink, es. ChunkedResultSink)"
+            )
+        ceiling = MemoryCeiling(memory_ceiling)
+    
     if not Path(csv_file).exists():
         raise FileNotFoundError(f"File non trovato: {csv_file}")
     
+    audit_file = None
+    if enable_audit:
+        audit_file = AUDIT_LOG_FILE if audit_sink is None else getattr(audit_sink, 'filename', None)
+    if checkpoint_file is not None and enable_audit and audit_file is None:
+        raise ValueError("Il checkpoint richiede un sink di audit con attributo 'filename'")
+    
+    already_audited = foreign = 0
+    checkpoint = load_checkpoint(checkpoint_file) if checkpoint_file and resume else None
+    if checkpoint is not None:
+        if os.path.abspath(checkpoint.csv_file) != os.path.abspath(csv_file):
+            raise ValueError(f"Il checkpoint si riferisce a un altro file: {checkpoint.csv_file}")
+        if checkpoint.completed:
+            logger.info(f"Validazione di {csv_file} già completata (checkpoint)")
+            return results
+        if enable_audit:
+            expected_hashes = _expected_audit_hashes(
+                csv_file, checkpoint.byte_offset, get_hash_backend(hash_algorithm, hash_key)
+            )
+            try:
+                already_audited, foreign = count_audited_rows(
+                    checkpoint.audit_file, checkpoint.audit_size, expected_hashes
+                )
+            finally:
+                expected_hashes.close()
+        if result_sink is not None:
+            result_sink.rewind(checkpoint.result_size)
+        logger.info(
+            f"Ripresa da riga {checkpoint.row_num} (offset {checkpoint.byte_offset}), "
+            f"{already_audited} righe di audit già registrate, {foreign} di altri scrittori"
+        )
+    
     try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv_module.DictReader(f)
+        with open(csv_file, 'rb', buffering=DEFAULT_READ_BUFFER) as raw:
+            lines = OffsetLineReader(
+                raw, max_line_bytes=DEFAULT_MAX_LINE_BYTES if ceiling is not None else -1
+            )
+            reader = csv_module.DictReader(lines)
             if reader.fieldnames is None or 'card_number' not in reader.fieldnames:
                 raise ValueError("Il CSV deve avere una colonna 'card_number'")
             
-            for row_num, row in enumerate(reader, start=2):
+            start_row = 2
+            if checkpoint is not None:
+                if checkpoint.byte_offset > os.path.getsize(csv_file):
+                    raise ValueError("Il checkpoint è oltre la fine del file CSV")
+                lines.seek(checkpoint.byte_offset)
+                start_row = checkpoint.row_num + 1
+            
+            def save_progress(row_num: int, completed: bool = False) -> None:
+                if audit_sink is not None:
+                    audit_sink.flush()
+                save_checkpoint(checkpoint_file, BatchCheckpoint(
+                    csv_file, lines.offset, row_num, audit_file,
+                    audit_position(audit_file), completed=completed,
+                    result_size=result_sink.tell() if result_sink is not None else 0
+                ))
+            
+            if checkpoint_file is not None and checkpoint is None:
+                # Checkpoint iniziale: un crash prima del primo checkpoint
+                # periodico non deve far ripartire da zero duplicando l'audit
+                save_progress(start_row - 1)
+            
+            active = active_profiler()
+            rows = reader if active is None else active.iter(reader, STAGE_CSV_PARSE)
+            
+            row_num = start_row - 1
+            for row_num, row in enumerate(rows, start=start_row):
                 card = row.get('card_number', '').strip()
                 try:
-                    is_valid = validate_luhn(card, log_audit=enable_audit)
-                    results.append((card, is_valid, ""))
+                    log_audit = enable_audit and not already_audited
+                    is_valid = validate_luhn(
+                        card, log_audit=log_audit,
+                        hash_algorithm=hash_algorithm, hash_key=hash_key,
+                        audit_sink=audit_sink
+                    )
+                    if enable_audit and not log_audit:
+                        # Già registrata dal run interrotto prima del crash
+                        already_audited -= 1
+                    error = ""
                     status = 'Valido' if is_valid else 'Non valido'
                     logger.info(f"Riga {row_num}: {card[-4:]}... - {status}")
                 except ValueError as e:
-                    results.append((card, False, str(e)))
+                    is_valid, error = False, str(e)
                     logger.warning(f"Riga {row_num}: {card} - Errore: {e}")
+                
+                if collect_results:
+                    results.append((card, is_valid, error))
+                if result_sink is not None:
+                    result_sink.write(row_num, card, is_valid, error)
+                
+                if checkpoint_file is not None and (row_num - 1) % checkpoint_every == 0:
+                    save_progress(row_num)
+                if ceiling is not None:
+                    ceiling.check()
+            
+            if audit_sink is not None:
+                audit_sink.flush()
+            if result_sink is not None:
+                result_sink.flush()
+            if checkpoint_file is not None:
+                save_progress(row_num, completed=True)
     
     except Exception as e:
         logger.error(f"Errore lettura CSV: {e}")
@@ -259,6 +931,7 @@ def get_card_input() -> str:
 
 def main():
     """Funzione principale."""
+    configure_logging()
     while True:
         try:
             card_number = get_card_input()
@@ -1,22 +1,140 @@
 """
 Validatore Luhn con interfaccia grafica PyQt6.
+
+Avvio rapido: la finestra compare con il solo tab di validazione singola;
+il tab batch (e i widget che usa solo lui) viene costruito alla prima
+apertura e il modulo core (hashing, audit, logging) viene importato alla
+prima validazione.
+
+Con LUHN_GUI_STARTUP_BENCH=1 l'applicazione stampa il tempo dal lancio al
+primo disegno della finestra ed esce (usato da benchmarks/bench_gui_startup.py).
 """
 
+import time
+
+_STARTUP = time.perf_counter()
+
+import os
 import sys
-import csv
 from pathlib import Path
 from typing import List, Tuple
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QTextEdit, QFileDialog,
-    QMessageBox, QTabWidget, QTableWidget, QTableWidgetItem,
-    QHeaderView, QCheckBox
+    QLabel, QLineEdit, QPushButton, QTextEdit, QMessageBox,
+    QTabWidget, QCheckBox
 )
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QIcon, QFont, QColor
+from PyQt6.QtCore import QSize, QTimer
+from PyQt6.QtGui import QFont
+
+# Limiti di memoria della GUI: righe mostrate in tabella e nel visualizzatore audit
+MAX_TABLE_ROWS = 10000
+MAX_AUDIT_VIEW_LINES = 1000
+
+STARTUP_BENCH_ENV_VAR = "LUHN_GUI_STARTUP_BENCH"
+
+BATCH_TAB_INDEX = 1
+
+# Unico foglio di stile, applicato una volta prima di creare i widget: i
+# pulsanti colorati sono selezionati per objectName invece di avere ognuno
+# il proprio stylesheet da analizzare
+STYLE_SHEET = """
+    QMainWindow {
+        background-color: #fafafa;
+    }
+    QLabel {
+        color: #333;
+    }
+    QLineEdit {
+        border: 2px solid #ddd;
+        border-radius: 5px;
+        padding: 8px;
+        font-size: 12pt;
+        background-color: white;
+    }
+    QLineEdit:focus {
+        border: 2px solid #4CAF50;
+    }
+    QTextEdit {
+        border: 2px solid #ddd;
+        border-radius: 5px;
+        padding: 8px;
+        background-color: white;
+    }
+    QTabWidget::pane {
+        border: 1px solid #ddd;
+    }
+    QTabBar::tab {
+        background-color: #e0e0e0;
+        padding: 8px 20px;
+        border: 1px solid #ccc;
+        margin-right: 2px;
+    }
+    QTabBar::tab:selected {
+        background-color: #4CAF50;
+        color: white;
+    }
+    QTableWidget {
+        border: 1px solid #ddd;
+        gridline-color: #eee;
+        background-color: white;
+    }
+    QHeaderView::section {
+        background-color: #4CAF50;
+        color: white;
+        padding: 5px;
+        border: none;
+    }
+    QPushButton#validateButton, QPushButton#auditButton, QPushButton#loadButton {
+        color: white;
+        font-weight: bold;
+        border-radius: 5px;
+    }
+    QPushButton#validateButton {
+        background-color: #4CAF50;
+    }
+    QPushButton#validateButton:hover {
+        background-color: #45a049;
+    }
+    QPushButton#validateButton:pressed {
+        background-color: #3d8b40;
+    }
+    QPushButton#auditButton {
+        background-color: #FF9800;
+    }
+    QPushButton#auditButton:hover {
+        background-color: #F57C00;
+    }
+    QPushButton#loadButton {
+        background-color: #2196F3;
+    }
+    QPushButton#loadButton:hover {
+        background-color: #0b7dda;
+    }
+    QLabel#infoLabel {
+        color: #666;
+        font-size: 9pt;
+    }
+    QLabel#csvInfoLabel {
+        color: #666;
+        font-size: 9pt;
+        background-color: #f5f5f5;
+        padding: 10px;
+    }
+"""
+
+
+_core_module = None
 
-from luhnalgorithm import validate_luhn, validate_cards_from_csv, AUDIT_LOG_FILE
+
+def _core():
+    """Importa il modulo core al primo uso e configura il logging (una volta sola)."""
+    global _core_module
+    if _core_module is None:
+        import luhnalgorithm
+        luhnalgorithm.configure_logging()
+        _core_module = luhnalgorithm
+    return _core_module
 
 
 class LuhnValidatorGUI(QMainWindow):
@@ -24,10 +142,13 @@ class LuhnValidatorGUI(QMainWindow):
     
     def __init__(self):
         super().__init__()
+        self.batch_tab_built = False
         self.init_ui()
     
     def init_ui(self):
         """Inizializza l'interfaccia utente."""
+        # Stile prima dei widget: un solo calcolo dello stile per widget
+        self.set_style()
         self.setWindowTitle("Validatore Luhn - Numero Carta di Credito")
         self.setGeometry(100, 100, 700, 600)
         self.setMinimumSize(QSize(700, 500))
@@ -54,13 +175,17 @@ class LuhnValidatorGUI(QMainWindow):
         # Tab 1: Validazione singola
         self.create_single_validation_tab()
         
-        # Tab 2: Validazione batch (CSV)
-        self.create_batch_validation_tab()
+        # Tab 2: Validazione batch (CSV), costruito alla prima apertura
+        self.batch_tab = QWidget()
+        self.tabs.addTab(self.batch_tab, "Validazione Batch (CSV)")
+        self.tabs.currentChanged.connect(self.on_tab_changed)
         
         central_widget.setLayout(main_layout)
-        
-        # Stile
-        self.set_style()
+    
+    def on_tab_changed(self, index: int):
+        """Costruisce il tab batch la prima volta che viene aperto."""
+        if index == BATCH_TAB_INDEX and not self.batch_tab_built:
+            self.create_batch_validation_tab()
     
     def create_single_validation_tab(self):
         """Crea il tab per validazione di un singolo numero."""
@@ -93,22 +218,9 @@ class LuhnValidatorGUI(QMainWindow):
         
         # Pulsante validazione
         validate_button = QPushButton("Valida")
+        validate_button.setObjectName("validateButton")
         validate_button.setMinimumHeight(40)
         validate_button.clicked.connect(self.validate_single_card)
-        validate_button.setStyleSheet("""
-            QPushButton {
-                background-color: #4CAF50;
-                color: white;
-                font-weight: bold;
-                border-radius: 5px;
-            }
-            QPushButton:hover {
-                background-color: #45a049;
-            }
-            QPushButton:pressed {
-                background-color: #3d8b40;
-            }
-        """)
         layout.addWidget(validate_button)
         
         # Area risultati
@@ -124,18 +236,8 @@ class LuhnValidatorGUI(QMainWindow):
         
         # Pulsante visualizza audit log
         view_audit_button = QPushButton("📊 Visualizza Audit Log")
+        view_audit_button.setObjectName("auditButton")
         view_audit_button.clicked.connect(self.view_audit_log)
-        view_audit_button.setStyleSheet("""
-            QPushButton {
-                background-color: #FF9800;
-                color: white;
-                font-weight: bold;
-                border-radius: 5px;
-            }
-            QPushButton:hover {
-                background-color: #F57C00;
-            }
-        """)
         layout.addWidget(view_audit_button)
         
         # Info
@@ -144,7 +246,7 @@ class LuhnValidatorGUI(QMainWindow):
             "ℹ️ I numeri vengono salvati NON in chiaro (SHA-3 hash)\n"
             "ℹ️ Premi INVIO o clicca 'Valida' per validare"
         )
-        info_label.setStyleSheet("color: #666; font-size: 9pt;")
+        info_label.setObjectName("infoLabel")
         layout.addWidget(info_label)
         
         layout.addStretch()
@@ -152,8 +254,10 @@ class LuhnValidatorGUI(QMainWindow):
         self.tabs.addTab(widget, "Singolo Numero")
     
     def create_batch_validation_tab(self):
-        """Crea il tab per validazione batch da CSV."""
-        widget = QWidget()
+        """Crea il contenuto del tab per validazione batch da CSV."""
+        from PyQt6.QtWidgets import QHeaderView, QTableWidget
+        
+        self.batch_tab_built = True
         layout = QVBoxLayout()
         
         # Descrizione
@@ -162,19 +266,9 @@ class LuhnValidatorGUI(QMainWindow):
         
         # Pulsante carica file
         load_button = QPushButton("📁 Carica CSV")
+        load_button.setObjectName("loadButton")
         load_button.setMinimumHeight(40)
         load_button.clicked.connect(self.load_csv_file)
-        load_button.setStyleSheet("""
-            QPushButton {
-                background-color: #2196F3;
-                color: white;
-                font-weight: bold;
-                border-radius: 5px;
-            }
-            QPushButton:hover {
-                background-color: #0b7dda;
-            }
-        """)
         layout.addWidget(load_button)
         
         # Tabella risultati
@@ -193,11 +287,10 @@ class LuhnValidatorGUI(QMainWindow):
             "4532015112830366\n"
             "5555555555554444"
         )
-        info_label.setStyleSheet("color: #666; font-size: 9pt; background-color: #f5f5f5; padding: 10px;")
+        info_label.setObjectName("csvInfoLabel")
         layout.addWidget(info_label)
         
-        widget.setLayout(layout)
-        self.tabs.addTab(widget, "Validazione Batch (CSV)")
+        self.batch_tab.setLayout(layout)
     
     def validate_single_card(self):
         """Valida un singolo numero di carta."""
@@ -210,17 +303,17 @@ class LuhnValidatorGUI(QMainWindow):
         try:
             # Valida e opzionalmente fa l'audit log
             enable_audit = self.audit_checkbox.isChecked()
-            is_valid = validate_luhn(card_number, log_audit=enable_audit)
+            is_valid = _core().validate_luhn(card_number, log_audit=enable_audit)
             
             if is_valid:
                 result_text = f"✓ VALIDAZIONE RIUSCITA!\n\nNumero: {card_number}\nStato: VALIDO"
                 if enable_audit:
-                    result_text += f"\n\n📋 Registrato in: {AUDIT_LOG_FILE}"
+                    result_text += f"\n\n📋 Registrato in: {_core().AUDIT_LOG_FILE}"
                 self.show_result(result_text, success=True)
             else:
                 result_text = f"✗ VALIDAZIONE FALLITA!\n\nNumero: {card_number}\nStato: NON VALIDO"
                 if enable_audit:
-                    result_text += f"\n\n📋 Registrato in: {AUDIT_LOG_FILE}"
+                    result_text += f"\n\n📋 Registrato in: {_core().AUDIT_LOG_FILE}"
                 self.show_result(result_text, error=True)
         
         except ValueError as e:
@@ -245,6 +338,8 @@ class LuhnValidatorGUI(QMainWindow):
     
     def load_csv_file(self):
         """Carica e valida un file CSV."""
+        from PyQt6.QtWidgets import QFileDialog
+        
         file_path, _ = QFileDialog.getOpenFileName(
             self, "Seleziona file CSV", "", "CSV Files (*.csv);;All Files (*)"
         )
@@ -253,9 +348,22 @@ class LuhnValidatorGUI(QMainWindow):
             return
         
         try:
-            results = validate_cards_from_csv(file_path)
-            self.populate_results_table(results)
-            QMessageBox.information(self, "Successo", f"Caricate {len(results)} carte dal file!")
+            from luhn_memory import ChunkedResultSink
+            
+            # I risultati arrivano a blocchi: in tabella solo le prime MAX_TABLE_ROWS
+            shown: List[Tuple[str, bool, str]] = []
+            
+            def keep_first(chunk):
+                room = MAX_TABLE_ROWS - len(shown)
+                shown.extend((card, is_valid, error) for _, card, is_valid, error in chunk[:room])
+            
+            with ChunkedResultSink(keep_first) as sink:
+                _core().validate_cards_from_csv(file_path, result_sink=sink, collect_results=False)
+            self.populate_results_table(shown)
+            message = f"Caricate {sink.rows_written} carte dal file!"
+            if sink.rows_written > len(shown):
+                message += f"\n(in tabella le prime {len(shown)})"
+            QMessageBox.information(self, "Successo", message)
         
         except FileNotFoundError as e:
             QMessageBox.critical(self, "Errore", f"File non trovato: {e}")
@@ -266,6 +374,9 @@ class LuhnValidatorGUI(QMainWindow):
     
     def populate_results_table(self, results: List[Tuple[str, bool, str]]):
         """Popola la tabella dei risultati."""
+        from PyQt6.QtGui import QColor
+        from PyQt6.QtWidgets import QTableWidgetItem
+        
         self.results_table.setRowCount(0)
         
         for row_num, (card, is_valid, error) in enumerate(results):
@@ -295,17 +406,23 @@ class LuhnValidatorGUI(QMainWindow):
     def view_audit_log(self):
         """Visualizza il file di audit log."""
         try:
-            if not Path(AUDIT_LOG_FILE).exists():
+            audit_file = _core().AUDIT_LOG_FILE
+            if not Path(audit_file).exists():
                 QMessageBox.information(self, "Audit Log", "Nessun audit log trovato.\nEsegui almeno una validazione con 'Registra in audit log' abilitato.")
                 return
             
-            with open(AUDIT_LOG_FILE, 'r', encoding='utf-8') as f:
-                content = f.read()
+            from luhn_memory import read_tail_lines
+            
+            # Solo le ultime righe: il file di audit può essere molto grande
+            header, lines = read_tail_lines(audit_file, MAX_AUDIT_VIEW_LINES)
+            content = "\n".join([header] + lines)
             
             # Crea una finestra di dialogo per mostrare il contenuto
             dialog = QMessageBox(self)
             dialog.setWindowTitle("📋 Audit Log (SHA-3 Hashed)")
-            dialog.setText("Validazioni registrate (numeri in hash SHA-3, NON in chiaro)")
+            dialog.setText(
+                f"Ultime {len(lines)} validazioni registrate (numeri in hash SHA-3, NON in chiaro)"
+            )
             dialog.setDetailedText(content)
             dialog.setStyleSheet("QMessageBox { min-width: 600px; }")
             dialog.exec()
@@ -315,55 +432,13 @@ class LuhnValidatorGUI(QMainWindow):
     
     def set_style(self):
         """Applica uno stile moderno all'applicazione."""
-        style = """
-            QMainWindow {
-                background-color: #fafafa;
-            }
-            QLabel {
-                color: #333;
-            }
-            QLineEdit {
-                border: 2px solid #ddd;
-                border-radius: 5px;
-                padding: 8px;
-                font-size: 12pt;
-                background-color: white;
-            }
-            QLineEdit:focus {
-                border: 2px solid #4CAF50;
-            }
-            QTextEdit {
-                border: 2px solid #ddd;
-                border-radius: 5px;
-                padding: 8px;
-                background-color: white;
-            }
-            QTabWidget::pane {
-                border: 1px solid #ddd;
-            }
-            QTabBar::tab {
-                background-color: #e0e0e0;
-                padding: 8px 20px;
-                border: 1px solid #ccc;
-                margin-right: 2px;
-            }
-            QTabBar::tab:selected {
-                background-color: #4CAF50;
-                color: white;
-            }
-            QTableWidget {
-                border: 1px solid #ddd;
-                gridline-color: #eee;
-                background-color: white;
-            }
-            QHeaderView::section {
-                background-color: #4CAF50;
-                color: white;
-                padding: 5px;
-                border: none;
-            }
-        """
-        self.setStyleSheet(style)
+        self.setStyleSheet(STYLE_SHEET)
+
+
+def report_first_paint(app: QApplication):
+    """Stampa il tempo dal lancio al primo disegno e chiude l'applicazione."""
+    print(f"first_paint_ms={(time.perf_counter() - _STARTUP) * 1000:.1f}", flush=True)
+    app.quit()
 
 
 def main():
@@ -371,6 +446,9 @@ def main():
     app = QApplication(sys.argv)
     window = LuhnValidatorGUI()
     window.show()
+    if os.environ.get(STARTUP_BENCH_ENV_VAR):
+        # Il timer a 0 scatta dopo gli eventi in coda, compreso il primo paint
+        QTimer.singleShot(0, lambda: report_first_paint(app))
     sys.exit(app.exec())
 
 
@@ -0,0 +1,120 @@
+"""
+Test per l'analisi incrementale del file di audit.
+"""
+
+import os
+
+import pytest
+
+from luhnalgorithm import log_validation_to_csv
+from luhn_audit_analytics import update_summary, load_summary, main
+
+
+@pytest.fixture
+def audit_file(tmp_path):
+    """File di audit con alcune validazioni."""
+    path = str(tmp_path / "audit.csv")
+    log_validation_to_csv("4111111111111111", True, "Visa", filename=path)
+    log_validation_to_csv("4111111111111112", False, "Visa", filename=path)
+    log_validation_to_csv("5555555555554444", True, "Mastercard", filename=path)
+    log_validation_to_csv("378282246310005", True, "American Express", filename=path)
+    return path
+
+
+class TestAuditAnalytics:
+    """Test suite per update_summary."""
+    
+    def test_aggregates(self, audit_file):
+        """Test dei totali per tipo, ora e lunghezza."""
+        summary = update_summary(audit_file)
+        
+        assert summary.rows == 4
+        assert summary.by_card_type["Visa"] == [1, 2]
+        assert summary.by_card_type["Mastercard"] == [1, 1]
+        assert summary.by_length == {"16": [2, 3], "15": [1, 1]}
+        assert sum(total for _, total in summary.by_hour.values()) == 4
+    
+    def test_incremental_reads_only_new_rows(self, audit_file):
+        """Test che la seconda esecuzione elabori solo le righe nuove."""
+        first = update_summary(audit_file)
+        offset = first.offset
+        
+        log_validation_to_csv("4111111111111111", True, "Visa", filename=audit_file)
+        second = update_summary(audit_file)
+        
+        assert second.rows == 5
+        assert second.by_card_type["Visa"] == [2, 3]
+        assert second.offset > offset
+    
+    def test_no_new_rows_is_stable(self, audit_file):
+        update_summary(audit_file)
+        assert update_summary(audit_file).rows == 4
+    
+    def test_summary_file_saved(self, audit_file):
+        update_summary(audit_file)
+        saved = load_summary(audit_file + ".summary.json")
+        assert saved.rows == 4
+    
+    def test_partial_last_line_deferred(self, audit_file):
+        """Test che una riga incompleta venga elaborata solo quando completa."""
+        with open(audit_file, 'rb') as f:
+            last_line = f.read().splitlines(keepends=True)[-1]
+        with open(audit_file, 'ab') as f:
+            f.write(last_line[:20])
+        
+        assert update_summary(audit_file).rows == 4
+        
+        with open(audit_file, 'ab') as f:
+            f.write(last_line[20:])
+        assert update_summary(audit_file).rows == 5
+    
+    def test_truncated_audit_recomputed(self, audit_file, tmp_path):
+        """Test che un audit ruotato venga ricalcolato da zero."""
+        update_summary(audit_file)
+        (tmp_path / "audit.csv").unlink()
+        log_validation_to_csv("4111111111111111", True, "Visa", filename=audit_file)
+        
+        summary = update_summary(audit_file)
+        assert summary.rows == 1
+        assert summary.by_card_type == {"Visa": [1, 1]}
+    
+    @pytest.mark.parametrize("rotation", ["rename", "truncate"])
+    def test_rotated_audit_with_more_rows_recomputed(self, tmp_path, rotation):
+        """Test che un audit ruotato più lungo dell'offset salvato venga ricalcolato."""
+        path = str(tmp_path / "audit.csv")
+        for _ in range(4):
+            log_validation_to_csv("4111111111111111", True, "Visa", filename=path)
+        assert update_summary(path).by_card_type == {"Visa": [4, 4]}
+        
+        if rotation == "rename":
+            os.replace(path, path + ".1")
+        else:
+            open(path, 'wb').close()
+        for _ in range(10):
+            log_validation_to_csv("5555555555554444", True, "Mastercard", filename=path)
+        
+        summary = update_summary(path)
+        assert summary.rows == 10
+        assert summary.by_card_type == {"Mastercard": [10, 10]}
+    
+    def test_cli_report(self, audit_file, capsys):
+        """Test del report da riga di comando."""
+        main([audit_file])
+        output = capsys.readouterr().out
+        
+        assert "4 validazioni" in output
+        assert "Mastercard" in output
+        assert "50.0%" in output
+
+    
+    def test_cli_missing_audit_file(self, tmp_path, capsys):
+        """Test che un audit mancante dia un errore senza traceback."""
+        with pytest.raises(SystemExit) as exc_info:
+            main([str(tmp_path / "assente.csv")])
+        
+        assert exc_info.value.code == 2
+        assert "non trovato" in capsys.readouterr().err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
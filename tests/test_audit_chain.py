@@ -0,0 +1,181 @@
+"""
+Test per la catena di hash dell'audit e la verifica incrementale.
+"""
+
+import csv
+import pytest
+
+from luhnalgorithm import validate_luhn, build_audit_record
+from luhn_audit_analytics import update_summary
+from luhn_audit_chain import (
+    CHAIN_KEY_ENV_VAR, ChainedAuditSink, verify_chain, main
+)
+
+KEY = b"chiave-di-firma"
+CARDS = ["4111111111111111", "5555555555554444", "4111111111111112", "378282246310005"]
+
+
+def write_chain(path, count, checkpoint_every=5, key=KEY):
+    with ChainedAuditSink(str(path), key=key, checkpoint_every=checkpoint_every, buffer_records=3) as sink:
+        for i in range(count):
+            validate_luhn(CARDS[i % len(CARDS)], log_audit=True, audit_sink=sink)
+
+
+def tamper(path, old, new, nth=1):
+    """Sostituisce la nth occorrenza di old nel file."""
+    data = path.read_bytes()
+    index = -1
+    for _ in range(nth):
+        index = data.index(old, index + 1)
+    path.write_bytes(data[:index] + new + data[index + len(old):])
+
+
+@pytest.fixture
+def chain_file(tmp_path):
+    path = tmp_path / "audit.csv"
+    write_chain(path, 12)
+    return path
+
+
+class TestChainedAuditSink:
+    """Test per la scrittura della catena."""
+    
+    def test_intact_chain_verifies(self, chain_file):
+        """Test di una catena integra con checkpoint periodici e finale."""
+        result = verify_chain(str(chain_file), key=KEY)
+        
+        assert result.ok, result.error
+        # 12 record + checkpoint dopo il 5° e il 10° + checkpoint finale
+        assert result.records_verified == 15
+        assert result.checkpoints_verified == 3
+        assert result.unsigned_records == 0
+    
+    def test_appends_continue_chain(self, chain_file):
+        """Test che un nuovo writer riprenda la catena dalla testa del file."""
+        write_chain(chain_file, 4)
+        
+        result = verify_chain(str(chain_file), key=KEY, full=True)
+        
+        assert result.ok, result.error
+        assert result.last_seq == 20
+    
+    @pytest.mark.parametrize("buffer_records", [1, 2, 100])
+    def test_checkpoint_spacing(self, tmp_path, buffer_records):
+        """Test che i checkpoint cadano ogni checkpoint_every record di validazione."""
+        path = tmp_path / "audit.csv"
+        with ChainedAuditSink(str(path), key=KEY, checkpoint_every=3, buffer_records=buffer_records) as sink:
+            for i in range(7):
+                sink.write(build_audit_record(CARDS[i % len(CARDS)], True, "Visa"))
+        # Un nuovo sink riprende il conteggio dalla coda del file
+        with ChainedAuditSink(str(path), key=KEY, checkpoint_every=3, buffer_records=buffer_records) as sink:
+            for i in range(5):
+                sink.write(build_audit_record(CARDS[i % len(CARDS)], True, "Visa"))
+        
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        markers = ''.join('C' if row['is_valid'] == 'CHECKPOINT' else 'r' for row in rows)
+        # 7 record + checkpoint finale, poi 5 record + checkpoint finale
+        assert markers == "rrrCrrrCrC" + "rrrCrrC"
+        assert [int(row['seq']) for row in rows] == list(range(1, len(rows) + 1))
+        assert verify_chain(str(path), key=KEY, full=True).ok
+    
+    def test_requires_key(self, tmp_path, monkeypatch):
+        monkeypatch.delenv(CHAIN_KEY_ENV_VAR, raising=False)
+        with pytest.raises(ValueError, match="chiave"):
+            ChainedAuditSink(str(tmp_path / "audit.csv"))
+    
+    def test_analytics_ignores_checkpoints(self, chain_file):
+        """Test che il report di compliance conti solo le validazioni."""
+        assert update_summary(str(chain_file)).rows == 12
+    
+    def test_rejects_plain_audit(self, tmp_path):
+        path = tmp_path / "audit.csv"
+        path.write_text("timestamp,card_hash\r\n", encoding='utf-8')
+        sink = ChainedAuditSink(str(path), key=KEY)
+        sink.write(build_audit_record("4111111111111111", True, "Visa"))
+        
+        with pytest.raises(ValueError, match="catena"):
+            sink.flush()
+
+
+class TestVerifyChain:
+    """Test per il rilevamento delle manomissioni."""
+    
+    def test_edited_field_detected(self, chain_file):
+        tamper(chain_file, b",Si,", b",No,")
+        
+        result = verify_chain(str(chain_file), key=KEY)
+        
+        assert not result.ok
+        assert "record_hash" in result.error
+    
+    def test_deleted_row_detected(self, chain_file):
+        lines = chain_file.read_bytes().split(b"\r\n")
+        chain_file.write_bytes(b"\r\n".join(lines[:3] + lines[4:]))
+        
+        result = verify_chain(str(chain_file), key=KEY)
+        
+        assert not result.ok
+        assert "sequenza" in result.error
+    
+    def test_recomputed_chain_fails_signature(self, chain_file, tmp_path):
+        """Test che una catena riscritta senza la chiave non superi i checkpoint."""
+        forged = tmp_path / "forged.csv"
+        write_chain(forged, 12, key=b"chiave-sbagliata")
+        
+        result = verify_chain(str(forged), key=KEY)
+        
+        assert not result.ok
+        assert "firma" in result.error
+    
+    def test_incremental_resume(self, chain_file, monkeypatch):
+        """Test che la seconda verifica legga solo i record nuovi."""
+        first = verify_chain(str(chain_file), key=KEY)
+        write_chain(chain_file, 3)
+        
+        second = verify_chain(str(chain_file), key=KEY)
+        
+        assert second.ok, second.error
+        assert second.resumed_from > 0
+        # solo i 3 record nuovi e il loro checkpoint finale
+        assert second.records_verified == 4
+        assert second.last_seq == first.last_seq + 4
+    
+    def test_tampered_after_checkpoint_detected_on_resume(self, chain_file):
+        verify_chain(str(chain_file), key=KEY)
+        write_chain(chain_file, 3)
+        tamper(chain_file, b",Si,", b",No,", nth=10)
+        
+        result = verify_chain(str(chain_file), key=KEY)
+        
+        assert not result.ok
+    
+    def test_truncation_detected(self, chain_file):
+        verify_chain(str(chain_file), key=KEY)
+        data = chain_file.read_bytes()
+        chain_file.write_bytes(data[:len(data) // 2])
+        
+        result = verify_chain(str(chain_file), key=KEY)
+        
+        assert not result.ok
+    
+    def test_forged_state_ignored(self, chain_file):
+        """Test che uno stato senza MAC valido causi una verifica completa."""
+        verify_chain(str(chain_file), key=KEY)
+        state = chain_file.with_name("audit.csv.chain.json")
+        state.write_text(state.read_text().replace('"seq": 15', '"seq": 16'))
+        
+        result = verify_chain(str(chain_file), key=KEY)
+        
+        assert result.ok
+        assert result.resumed_from == 0
+    
+    def test_cli_exit_code(self, chain_file, monkeypatch, capsys):
+        monkeypatch.setenv(CHAIN_KEY_ENV_VAR, KEY.decode())
+        main([str(chain_file)])
+        assert "OK" in capsys.readouterr().out
+        
+        tamper(chain_file, b",Si,", b",No,")
+        with pytest.raises(SystemExit) as exc:
+            main([str(chain_file), "--full"])
+        assert exc.value.code == 1
@@ -3,10 +3,14 @@ Test per il sistema di audit logging con SHA-3.
 """
 
 import pytest
+import csv
 import hashlib
 import os
 from pathlib import Path
-from luhnalgorithm import hash_card_number, log_validation_to_csv, AUDIT_LOG_FILE
+from luhnalgorithm import (
+    hash_card_number, log_validation_to_csv, AUDIT_LOG_FILE, AUDIT_FIELDNAMES,
+    available_hash_backends, get_hash_backend, register_hash_backend
+)
 
 
 class TestAuditLogging:
@@ -105,9 +109,10 @@ class TestAuditLogging:
         assert "is_valid" in lines[0]
         assert "card_type" in lines[0]
         assert "card_length" in lines[0]
+        assert "hash_algorithm" in lines[0]
         
         # Verifica numero di colonne
-        assert len(lines[1].split(',')) == 5
+        assert len(lines[1].split(',')) == 6
     
     def test_log_multiple_entries(self):
         """Test logging di più validazioni."""
@@ -174,6 +179,35 @@ class TestAuditLogging:
         # Verifica formato ISO (2026-02-12T18:23:13...)
         assert "T" in timestamp, "Timestamp non in formato ISO"
         assert "-" in timestamp, "Data non in formato ISO"
+    
+    def test_legacy_header_rotated(self, tmp_path):
+        """Test che un audit con l'header a 5 colonne venga archiviato, non esteso."""
+        audit_file = tmp_path / "audit.csv"
+        legacy = "timestamp,card_hash,is_valid,card_type,card_length\n2025-01-01T00:00:00,abc,Si,Visa,16\n"
+        audit_file.write_text(legacy, encoding='utf-8')
+        
+        log_validation_to_csv("4111111111111111", True, "Visa", filename=str(audit_file))
+        
+        with open(audit_file, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == AUDIT_FIELDNAMES
+        assert len(rows) == 2
+        assert rows[1][2] == 'sha3_256'
+        
+        archived = list(tmp_path.glob("audit.csv.legacy-*"))
+        assert len(archived) == 1
+        assert archived[0].read_text(encoding='utf-8') == legacy
+    
+    def test_matching_header_appended(self, tmp_path):
+        """Test che un audit con l'header corrente venga esteso senza rotazione."""
+        audit_file = tmp_path / "audit.csv"
+        log_validation_to_csv("4111111111111111", True, "Visa", filename=str(audit_file))
+        log_validation_to_csv("5555555555554444", True, "Mastercard", filename=str(audit_file))
+        
+        with open(audit_file, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.reader(f))
+        assert len(rows) == 3
+        assert not list(tmp_path.glob("audit.csv.legacy-*"))
 
 
 class TestHashSecurity:
@@ -206,5 +240,76 @@ class TestHashSecurity:
         assert hash1 != hash2, "Hash dovrebbe essere diverso per numeri diversi"
 
 
+class TestHashBackends:
+    """Test per il registro dei backend di hashing."""
+    
+    KEY = b"chiave-di-test-non-segreta"
+    
+    def test_builtin_backends_registered(self):
+        """Test che i backend predefiniti siano disponibili."""
+        backends = available_hash_backends()
+        for name in ('sha3_256', 'sha3_512', 'blake2b_keyed', 'hmac_sha256'):
+            assert name in backends
+    
+    def test_blake2b_keyed_matches_hashlib(self):
+        """Test che BLAKE2b con chiave corrisponda a hashlib."""
+        card = "4111111111111111"
+        expected = hashlib.blake2b(card.encode(), key=self.KEY, digest_size=32).hexdigest()
+        assert hash_card_number(card, algorithm='blake2b_keyed', key=self.KEY) == expected
+    
+    def test_hmac_sha256_matches_hmac(self):
+        """Test che HMAC-SHA256 corrisponda al modulo hmac."""
+        import hmac
+        card = "4111111111111111"
+        expected = hmac.new(self.KEY, card.encode(), hashlib.sha256).hexdigest()
+        assert hash_card_number(card, algorithm='hmac_sha256', key=self.KEY) == expected
+    
+    def test_keyed_backend_depends_on_key(self):
+        """Test che chiavi diverse producano hash diversi."""
+        card = "4111111111111111"
+        hash1 = hash_card_number(card, algorithm='hmac_sha256', key=b"chiave-1")
+        hash2 = hash_card_number(card, algorithm='hmac_sha256', key=b"chiave-2")
+        assert hash1 != hash2
+    
+    def test_keyed_backend_requires_key(self, monkeypatch):
+        """Test che un backend con chiave senza chiave sollevi errore."""
+        monkeypatch.delenv("LUHN_AUDIT_HASH_KEY", raising=False)
+        with pytest.raises(ValueError, match="richiede una chiave"):
+            hash_card_number("4111111111111111", algorithm='blake2b_keyed')
+    
+    def test_key_from_environment(self, monkeypatch):
+        """Test che la chiave venga letta dalla variabile d'ambiente."""
+        monkeypatch.setenv("LUHN_AUDIT_HASH_KEY", self.KEY.decode())
+        card = "4111111111111111"
+        assert hash_card_number(card, algorithm='hmac_sha256') == \
+            hash_card_number(card, algorithm='hmac_sha256', key=self.KEY)
+    
+    def test_backend_built_once(self):
+        """Test che il backend venga costruito una sola volta."""
+        assert get_hash_backend('hmac_sha256', self.KEY) is get_hash_backend('hmac_sha256', self.KEY)
+    
+    def test_register_custom_backend(self):
+        """Test registrazione di un backend personalizzato."""
+        register_hash_backend('sha256_test', lambda key: hashlib.sha256())
+        card = "4111111111111111"
+        assert hash_card_number(card, algorithm='sha256_test') == hashlib.sha256(card.encode()).hexdigest()
+    
+    def test_backend_recorded_in_audit(self, tmp_path):
+        """Test che il backend usato sia registrato nell'audit log."""
+        audit_file = tmp_path / "audit.csv"
+        log_validation_to_csv(
+            "4111111111111111", True, "Visa", filename=str(audit_file),
+            hash_algorithm='blake2b_keyed', hash_key=self.KEY
+        )
+        
+        with open(audit_file, 'r') as f:
+            rows = list(csv.DictReader(f))
+        
+        assert rows[0]['hash_algorithm'] == 'blake2b_keyed'
+        assert rows[0]['card_hash'] == hash_card_number(
+            "4111111111111111", algorithm='blake2b_keyed', key=self.KEY
+        )
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,299 @@
+"""
+Test per i sink di audit con più processi scrittori.
+"""
+
+import csv
+import multiprocessing
+import threading
+import pytest
+
+from luhnalgorithm import (
+    AUDIT_FIELDNAMES, build_audit_record, validate_luhn, validate_cards_from_csv
+)
+from luhn_audit_sink import (
+    AsyncAuditWriter, LockedAuditSink, QueueAuditWriter, append_audit_records
+)
+
+WORKERS = 8
+RECORDS_PER_WORKER = 400
+CARDS = ["4111111111111111", "5555555555554444", "378282246310005", "4111111111111112"]
+
+
+def _locked_worker(filename: str, worker_id: int) -> None:
+    """Worker che scrive con LockedAuditSink (buffer piccolo per forzare molte scritture)."""
+    with LockedAuditSink(filename, buffer_records=7) as sink:
+        for i in range(RECORDS_PER_WORKER):
+            validate_luhn(CARDS[(worker_id + i) % len(CARDS)], log_audit=True, audit_sink=sink)
+
+
+def _queue_worker(sink, worker_id: int) -> None:
+    """Worker che invia i record al processo scrittore unico."""
+    for i in range(RECORDS_PER_WORKER):
+        validate_luhn(CARDS[(worker_id + i) % len(CARDS)], log_audit=True, audit_sink=sink)
+
+
+def _run_workers(target, first_arg) -> None:
+    processes = [
+        multiprocessing.Process(target=target, args=(first_arg, worker_id))
+        for worker_id in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+
+def _assert_audit_intact(filename, expected_rows: int) -> None:
+    """Verifica un solo header e nessuna riga spezzata o interlacciata."""
+    with open(filename, 'r', encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    
+    assert rows[0] == AUDIT_FIELDNAMES
+    assert len(rows) == expected_rows + 1
+    for row in rows[1:]:
+        assert len(row) == len(AUDIT_FIELDNAMES)
+        assert row[0] != 'timestamp', "Header duplicato"
+        assert len(row[1]) == 64
+        assert row[3] in ('Si', 'No')
+
+
+class TestLockedAuditSink:
+    """Test suite per LockedAuditSink."""
+    
+    def test_header_written_once(self, tmp_path):
+        """Test che l'header venga scritto solo alla creazione del file."""
+        audit_file = str(tmp_path / "audit.csv")
+        record = build_audit_record("4111111111111111", True, "Visa")
+        append_audit_records(audit_file, [record])
+        append_audit_records(audit_file, [record, record])
+        
+        _assert_audit_intact(audit_file, 3)
+    
+    def test_legacy_header_rotated(self, tmp_path):
+        """Test che le righe non vengano accodate sotto un header diverso."""
+        audit_file = tmp_path / "audit.csv"
+        legacy = "timestamp,card_hash,is_valid,card_type,card_length\r\n"
+        audit_file.write_bytes(legacy.encode('utf-8'))
+        
+        with LockedAuditSink(str(audit_file)) as sink:
+            validate_luhn("4111111111111111", log_audit=True, audit_sink=sink)
+        
+        _assert_audit_intact(audit_file, 1)
+        archived = list(tmp_path.glob("audit.csv.legacy-*"))
+        assert len(archived) == 1
+        assert archived[0].read_bytes() == legacy.encode('utf-8')
+    
+    def test_buffered_until_flush(self, tmp_path):
+        """Test che i record restino nel buffer fino al flush."""
+        audit_file = tmp_path / "audit.csv"
+        sink = LockedAuditSink(str(audit_file), buffer_records=10)
+        sink.write(build_audit_record("4111111111111111", True, "Visa"))
+        assert not audit_file.exists()
+        
+        sink.close()
+        _assert_audit_intact(audit_file, 1)
+    
+    def test_batch_csv_uses_sink(self, tmp_path):
+        """Test che validate_cards_from_csv scriva tramite il sink."""
+        csv_file = tmp_path / "carte.csv"
+        csv_file.write_text("card_number\n4111111111111111\n4111111111111112\n", encoding='utf-8')
+        audit_file = tmp_path / "audit.csv"
+        
+        validate_cards_from_csv(str(csv_file), audit_sink=LockedAuditSink(str(audit_file)))
+        
+        _assert_audit_intact(audit_file, 2)
+    
+    def test_concurrent_writers_stress(self, tmp_path):
+        """Stress test: molti processi sullo stesso file di audit."""
+        audit_file = str(tmp_path / "audit.csv")
+        _run_workers(_locked_worker, audit_file)
+        
+        _assert_audit_intact(audit_file, WORKERS * RECORDS_PER_WORKER)
+
+
+class TestQueueAuditWriter:
+    """Test suite per QueueAuditWriter."""
+    
+    def test_single_process(self, tmp_path):
+        """Test scrittura dal processo principale."""
+        audit_file = str(tmp_path / "audit.csv")
+        with QueueAuditWriter(audit_file, batch_size=2) as writer:
+            sink = writer.sink()
+            for card in CARDS:
+                validate_luhn(card, log_audit=True, audit_sink=sink)
+        
+        _assert_audit_intact(audit_file, len(CARDS))
+    
+    def test_concurrent_writers_stress(self, tmp_path):
+        """Stress test: molti processi worker verso un unico scrittore."""
+        audit_file = str(tmp_path / "audit.csv")
+        with QueueAuditWriter(audit_file, batch_size=50, flush_interval=0.05) as writer:
+            _run_workers(_queue_worker, writer.sink())
+        
+        _assert_audit_intact(audit_file, WORKERS * RECORDS_PER_WORKER)
+    
+    def test_no_plaintext_in_audit(self, tmp_path):
+        """Test che il file scritto dal processo scrittore non contenga PAN."""
+        audit_file = tmp_path / "audit.csv"
+        with QueueAuditWriter(str(audit_file)) as writer:
+            validate_luhn("4111111111111111", log_audit=True, audit_sink=writer.sink())
+        
+        assert "4111111111111111" not in audit_file.read_text(encoding='utf-8')
+
+
+class _BlockedAsyncWriter(AsyncAuditWriter):
+    """AsyncAuditWriter con il thread scrittore fermo finché release non è impostato."""
+    
+    def __init__(self, *args, **kwargs):
+        self.release = threading.Event()
+        super().__init__(*args, **kwargs)
+    
+    def _run(self):
+        self.release.wait()
+        super()._run()
+
+
+class TestAsyncAuditWriter:
+    """Test suite per AsyncAuditWriter."""
+    
+    def test_flush_writes_all_records(self, tmp_path):
+        """Test che flush() porti su disco tutti i record accodati."""
+        audit_file = str(tmp_path / "audit.csv")
+        writer = AsyncAuditWriter(audit_file, batch_size=3)
+        try:
+            for card in CARDS * 5:
+                validate_luhn(card, log_audit=True, audit_sink=writer)
+            assert writer.flush(timeout=10)
+            _assert_audit_intact(audit_file, len(CARDS) * 5)
+        finally:
+            writer.close()
+    
+    def test_close_flushes(self, tmp_path):
+        """Test che la chiusura svuoti la coda."""
+        audit_file = str(tmp_path / "audit.csv")
+        with AsyncAuditWriter(audit_file, batch_size=1000, flush_interval=10) as writer:
+            for card in CARDS:
+                writer.write(build_audit_record(card, True, "Visa"))
+        
+        _assert_audit_intact(audit_file, len(CARDS))
+    
+    def test_drop_policy_counts_dropped(self, tmp_path):
+        """Test della politica drop con coda piena."""
+        audit_file = str(tmp_path / "audit.csv")
+        writer = _BlockedAsyncWriter(audit_file, max_queue=2, policy="drop")
+        record = build_audit_record("4111111111111111", True, "Visa")
+        for _ in range(5):
+            writer.write(record)
+        
+        assert writer.dropped == 3
+        writer.release.set()
+        writer.close()
+        _assert_audit_intact(audit_file, 2)
+    
+    def test_spill_policy_keeps_all_records(self, tmp_path):
+        """Test della politica spill: nessun record perso."""
+        audit_file = str(tmp_path / "audit.csv")
+        writer = _BlockedAsyncWriter(audit_file, max_queue=2, policy="spill")
+        record = build_audit_record("4111111111111111", True, "Visa")
+        for _ in range(5):
+            writer.write(record)
+        
+        assert writer.spilled == 3
+        writer.release.set()
+        writer.close()
+        _assert_audit_intact(audit_file, 5)
+        assert not (tmp_path / "audit.csv.spill").exists()
+    
+    def test_spill_drained_in_chunks(self, tmp_path, monkeypatch):
+        """Test che l'overflow venga riversato a blocchi fissi senza righe spezzate."""
+        import luhn_audit_sink
+        monkeypatch.setattr(luhn_audit_sink, "SPILL_CHUNK_BYTES", 37)
+        reads = []
+        
+        class _RecordingWriter(_BlockedAsyncWriter):
+            def _counted_chunks(self, f):
+                for chunk in super()._counted_chunks(f):
+                    reads.append(len(chunk))
+                    yield chunk
+        
+        audit_file = str(tmp_path / "audit.csv")
+        writer = _RecordingWriter(audit_file, max_queue=2, policy="spill")
+        record = build_audit_record("4111111111111111", True, "Visa")
+        for _ in range(20):
+            writer.write(record)
+        
+        writer.release.set()
+        writer.close()
+        _assert_audit_intact(audit_file, 20)
+        assert writer.written == 20
+        assert max(reads) <= 37
+    
+    def test_failed_drain_is_retried_without_loss(self, tmp_path, monkeypatch):
+        """Test che un riversamento fallito non venga sovrascritto dal successivo."""
+        import luhn_audit_sink
+        original_append = luhn_audit_sink._append_audit_chunks
+        failing = threading.Event()
+        failing.set()
+        
+        def _flaky_append(filename, chunks):
+            if failing.is_set():
+                raise OSError("disco pieno")
+            original_append(filename, chunks)
+        
+        monkeypatch.setattr(luhn_audit_sink, "_append_audit_chunks", _flaky_append)
+        audit_file = str(tmp_path / "audit.csv")
+        writer = _BlockedAsyncWriter(audit_file, max_queue=2, policy="spill")
+        record = build_audit_record("4111111111111111", True, "Visa")
+        for _ in range(5):
+            writer.write(record)
+        writer.release.set()
+        writer.flush()
+        # Blocco fallito riversato nell'overflow, riversamento rimasto in sospeso
+        assert (tmp_path / "audit.csv.spill.draining").exists()
+        
+        for _ in range(3):
+            writer.write(record)
+        writer.flush()
+        assert (tmp_path / "audit.csv.spill").exists()
+        
+        failing.clear()
+        writer.close()
+        _assert_audit_intact(audit_file, 8)
+        assert writer.written == 8
+        assert writer.dropped == 0
+        assert not (tmp_path / "audit.csv.spill").exists()
+        assert not (tmp_path / "audit.csv.spill.draining").exists()
+    
+    def test_failed_write_counted_as_dropped(self, tmp_path, monkeypatch):
+        """Test che i record di una scrittura fallita siano contati in dropped."""
+        import luhn_audit_sink
+        
+        def _failing_append(filename, records):
+            raise OSError("disco pieno")
+        
+        monkeypatch.setattr(luhn_audit_sink, "append_audit_records", _failing_append)
+        writer = AsyncAuditWriter(str(tmp_path / "audit.csv"), policy="block")
+        record = build_audit_record("4111111111111111", True, "Visa")
+        for _ in range(4):
+            writer.write(record)
+        writer.close()
+        
+        assert writer.written == 0
+        assert writer.dropped == 4
+    
+    def test_invalid_policy(self, tmp_path):
+        """Test con politica di backpressure non supportata."""
+        with pytest.raises(ValueError, match="backpressure"):
+            AsyncAuditWriter(str(tmp_path / "audit.csv"), policy="ignora")
+    
+    def test_write_after_close(self, tmp_path):
+        """Test che non si possa scrivere dopo la chiusura."""
+        writer = AsyncAuditWriter(str(tmp_path / "audit.csv"))
+        writer.close()
+        with pytest.raises(ValueError, match="chiuso"):
+            writer.write(build_audit_record("4111111111111111", True, "Visa"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
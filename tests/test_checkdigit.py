@@ -0,0 +1,107 @@
+"""
+Test per il motore generico di cifre di controllo.
+"""
+
+import pytest
+
+from luhn_checkdigit import (
+    LUHN, LUHN_MOD_36, VERHOEFF, DAMM, SCHEMES, get_scheme, luhn_mod_n, register_scheme
+)
+
+ALL_SCHEMES = [LUHN, LUHN_MOD_36, VERHOEFF, DAMM]
+
+
+class TestKnownValues:
+    """Test con valori di riferimento noti per ogni schema."""
+    
+    def test_luhn_cards(self):
+        assert LUHN.is_valid("4111111111111111") is True
+        assert LUHN.is_valid("378282246310005") is True
+        assert LUHN.is_valid("4111111111111112") is False
+    
+    def test_luhn_imei(self):
+        """Test con un IMEI (Luhn su 15 cifre)."""
+        assert LUHN.is_valid("490154203237518") is True
+        assert LUHN.generate_check_digit("49015420323751") == "8"
+    
+    def test_verhoeff(self):
+        assert VERHOEFF.generate_check_digit("236") == "3"
+        assert VERHOEFF.is_valid("2363") is True
+        assert VERHOEFF.is_valid("2364") is False
+    
+    def test_damm(self):
+        assert DAMM.generate_check_digit("572") == "4"
+        assert DAMM.is_valid("5724") is True
+        assert DAMM.is_valid("5274") is False
+    
+    def test_luhn_mod_10_equals_luhn(self):
+        """Test che Luhn mod 10 coincida con Luhn classico."""
+        scheme = luhn_mod_n("0123456789")
+        for value in ("4111111111111111", "5555555555554444", "4111111111111112"):
+            assert scheme.is_valid(value) == LUHN.is_valid(value)
+
+
+class TestCommonApi:
+    """Test delle API comuni a tutti gli schemi."""
+    
+    @pytest.mark.parametrize("scheme", ALL_SCHEMES, ids=lambda s: s.name)
+    def test_generated_digit_is_unique_valid(self, scheme):
+        """Test che la cifra generata sia l'unica che rende valido il payload."""
+        payload = scheme.alphabet[3:9] * 2
+        full = scheme.append_check_digit(payload)
+        
+        assert scheme.is_valid(full)
+        assert sum(scheme.is_valid(payload + symbol) for symbol in scheme.alphabet) == 1
+    
+    @pytest.mark.parametrize("scheme", ALL_SCHEMES, ids=lambda s: s.name)
+    def test_detects_adjacent_transposition(self, scheme):
+        """Test che uno scambio di cifre adiacenti venga rilevato (tranne 0<->9 per Luhn)."""
+        full = scheme.append_check_digit("1234567")
+        swapped = full[:2] + full[3] + full[2] + full[4:]
+        assert scheme.is_valid(swapped) is False
+    
+    @pytest.mark.parametrize("scheme", ALL_SCHEMES, ids=lambda s: s.name)
+    def test_bytes_input(self, scheme):
+        full = scheme.append_check_digit("8675309")
+        assert scheme.is_valid(full.encode('ascii'))
+        assert scheme.is_valid(memoryview(full.encode('ascii')))
+    
+    def test_validate_batch(self):
+        values = ["4111111111111111", b"4111111111111112", "41x1", ""]
+        assert LUHN.validate_batch(values) == [True, False, False, False]
+    
+    def test_validate_stream(self):
+        lines = ["2363\n", "2364\n", "23a3\n"]
+        results = list(VERHOEFF.validate_stream(lines))
+        
+        assert [(value, ok) for value, ok, _ in results] == [("2363", True), ("2364", False), ("23a3", False)]
+        assert "non ammessi" in results[2][2]
+    
+    def test_invalid_symbols(self):
+        with pytest.raises(ValueError, match="non ammessi"):
+            DAMM.is_valid("57A4")
+        with pytest.raises(ValueError, match="non validi"):
+            LUHN.is_valid("٤١١١")
+        with pytest.raises(ValueError, match="vuoto"):
+            LUHN.is_valid("")
+
+
+class TestRegistry:
+    """Test per il registro degli schemi."""
+    
+    def test_builtin_schemes(self):
+        for name in ("luhn", "luhn_mod_36", "verhoeff", "damm"):
+            assert get_scheme(name) is SCHEMES[name]
+    
+    def test_unknown_scheme(self):
+        with pytest.raises(ValueError, match="Schema non supportato"):
+            get_scheme("iso7064")
+    
+    def test_register_custom_alphabet(self):
+        scheme = luhn_mod_n("0123456789ABCDEF", name="luhn_hex_test")
+        register_scheme(scheme)
+        assert get_scheme("luhn_hex_test").is_valid(scheme.append_check_digit("1F2E3D"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,239 @@
+"""
+Test per checkpoint e ripresa della validazione batch.
+"""
+
+import csv
+import io
+import pytest
+
+import luhnalgorithm
+from luhnalgorithm import (
+    validate_cards_from_csv, hash_card_number, log_validation_to_csv, AUDIT_LOG_FILE
+)
+from luhn_audit_sink import LockedAuditSink
+import luhn_checkpoint
+from luhn_checkpoint import OffsetLineReader, load_checkpoint
+
+CARDS = ["4111111111111111", "5555555555554444", "378282246310005", "4111111111111112", "12345"]
+TOTAL_ROWS = 53
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Directory di lavoro con un CSV di input."""
+    monkeypatch.chdir(tmp_path)
+    with open(tmp_path / "carte.csv", 'w', newline='', encoding='utf-8') as f:
+        f.write("card_number\r\n")
+        for i in range(TOTAL_ROWS):
+            f.write(CARDS[i % len(CARDS)] + "\r\n")
+    return tmp_path
+
+
+def _audit_hashes(audit_file):
+    with open(audit_file, 'r', encoding='utf-8', newline='') as f:
+        return [row['card_hash'] for row in csv.DictReader(f)]
+
+
+def _crash_after(monkeypatch, calls_before_crash: int):
+    """Fa fallire validate_luhn dopo un certo numero di chiamate."""
+    original = luhnalgorithm.validate_luhn
+    state = {'calls': 0}
+    
+    def crashing(card, **kwargs):
+        state['calls'] += 1
+        if state['calls'] > calls_before_crash:
+            raise RuntimeError("crash simulato")
+        return original(card, **kwargs)
+    
+    monkeypatch.setattr(luhnalgorithm, "validate_luhn", crashing)
+    return original
+
+
+class TestCheckpointResume:
+    """Test suite per checkpoint e ripresa."""
+    
+    def test_checkpoint_written(self, workdir):
+        """Test che a fine run il checkpoint sia marcato come completato."""
+        validate_cards_from_csv("carte.csv", checkpoint_file="run.ckpt", checkpoint_every=10)
+        checkpoint = load_checkpoint("run.ckpt")
+        
+        assert checkpoint.completed
+        assert checkpoint.row_num == TOTAL_ROWS + 1
+        assert checkpoint.byte_offset == (workdir / "carte.csv").stat().st_size
+    
+    def test_resume_after_crash_no_duplicates_no_gaps(self, workdir, monkeypatch):
+        """Test che la ripresa produca lo stesso audit di un run senza crash."""
+        validate_cards_from_csv("carte.csv")
+        expected = _audit_hashes(AUDIT_LOG_FILE)
+        (workdir / AUDIT_LOG_FILE).unlink()
+        
+        original = _crash_after(monkeypatch, 37)
+        with pytest.raises(RuntimeError):
+            validate_cards_from_csv("carte.csv", checkpoint_file="run.ckpt", checkpoint_every=10)
+        checkpoint = load_checkpoint("run.ckpt")
+        assert checkpoint.row_num == 31
+        # Righe di audit scritte dopo l'ultimo checkpoint, da non duplicare
+        assert (workdir / AUDIT_LOG_FILE).stat().st_size > checkpoint.audit_size
+        
+        monkeypatch.setattr(luhnalgorithm, "validate_luhn", original)
+        results = validate_cards_from_csv(
+            "carte.csv", checkpoint_file="run.ckpt", checkpoint_every=10, resume=True
+        )
+        
+        assert len(results) == TOTAL_ROWS - 30
+        assert _audit_hashes(AUDIT_LOG_FILE) == expected
+    
+    def test_resume_with_sink(self, workdir, monkeypatch):
+        """Test della ripresa con un sink di audit bufferizzato."""
+        audit_file = str(workdir / "sink_audit.csv")
+        validate_cards_from_csv("carte.csv", audit_sink=LockedAuditSink(audit_file))
+        expected = _audit_hashes(audit_file)
+        (workdir / "sink_audit.csv").unlink()
+        
+        original = _crash_after(monkeypatch, 25)
+        with pytest.raises(RuntimeError):
+            validate_cards_from_csv(
+                "carte.csv", audit_sink=LockedAuditSink(audit_file, buffer_records=4),
+                checkpoint_file="run.ckpt", checkpoint_every=10
+            )
+        
+        monkeypatch.setattr(luhnalgorithm, "validate_luhn", original)
+        validate_cards_from_csv(
+            "carte.csv", audit_sink=LockedAuditSink(audit_file),
+            checkpoint_file="run.ckpt", checkpoint_every=10, resume=True
+        )
+        
+        assert _audit_hashes(audit_file) == expected
+    
+    def test_crash_before_first_checkpoint(self, workdir, monkeypatch):
+        """Test della ripresa dopo un crash precedente al primo checkpoint periodico."""
+        (workdir / "venti.csv").write_text(
+            "card_number\n" + "".join(CARDS[i % 4] + "\n" for i in range(20)), encoding='utf-8'
+        )
+        validate_cards_from_csv("venti.csv")
+        expected = _audit_hashes(AUDIT_LOG_FILE)
+        (workdir / AUDIT_LOG_FILE).unlink()
+        
+        original = _crash_after(monkeypatch, 5)
+        with pytest.raises(RuntimeError):
+            validate_cards_from_csv("venti.csv", checkpoint_file="run.ckpt", checkpoint_every=100)
+        checkpoint = load_checkpoint("run.ckpt")
+        assert checkpoint.row_num == 1
+        assert checkpoint.byte_offset == len("card_number\n")
+        
+        monkeypatch.setattr(luhnalgorithm, "validate_luhn", original)
+        results = validate_cards_from_csv(
+            "venti.csv", checkpoint_file="run.ckpt", checkpoint_every=100, resume=True
+        )
+        
+        assert len(results) == 20
+        assert _audit_hashes(AUDIT_LOG_FILE) == expected
+    
+    def test_resume_keeps_other_writers_rows(self, workdir, monkeypatch):
+        """Test che la ripresa non rimuova le righe di audit di altri scrittori."""
+        validate_cards_from_csv("carte.csv")
+        expected = _audit_hashes(AUDIT_LOG_FILE)
+        (workdir / AUDIT_LOG_FILE).unlink()
+        
+        original = _crash_after(monkeypatch, 15)
+        with pytest.raises(RuntimeError):
+            validate_cards_from_csv("carte.csv", checkpoint_file="run.ckpt", checkpoint_every=10)
+        monkeypatch.setattr(luhnalgorithm, "validate_luhn", original)
+        
+        # Righe del run interrotto oltre il checkpoint, poi un altro scrittore
+        checkpoint = load_checkpoint("run.ckpt")
+        assert (workdir / AUDIT_LOG_FILE).stat().st_size > checkpoint.audit_size
+        written = len(_audit_hashes(AUDIT_LOG_FILE))
+        log_validation_to_csv("5555555555554444", True, "Mastercard")
+        other = hash_card_number("5555555555554444")
+        
+        validate_cards_from_csv(
+            "carte.csv", checkpoint_file="run.ckpt", checkpoint_every=10, resume=True
+        )
+        
+        hashes = _audit_hashes(AUDIT_LOG_FILE)
+        assert hashes[written] == other
+        assert hashes[:written] + hashes[written + 1:] == expected
+    
+    def test_resume_completed_run_is_noop(self, workdir):
+        """Test che riprendere un run completato non duplichi l'audit."""
+        validate_cards_from_csv("carte.csv", checkpoint_file="run.ckpt")
+        before = _audit_hashes(AUDIT_LOG_FILE)
+        
+        results = validate_cards_from_csv("carte.csv", checkpoint_file="run.ckpt", resume=True)
+        
+        assert results == []
+        assert _audit_hashes(AUDIT_LOG_FILE) == before
+    
+    def test_resume_without_checkpoint_starts_over(self, workdir):
+        """Test che senza checkpoint la ripresa parta dall'inizio."""
+        results = validate_cards_from_csv("carte.csv", checkpoint_file="run.ckpt", resume=True)
+        assert len(results) == TOTAL_ROWS
+    
+    def test_checkpoint_for_other_file_rejected(self, workdir):
+        """Test che un checkpoint di un altro file venga rifiutato."""
+        validate_cards_from_csv("carte.csv", enable_audit=False, checkpoint_file="run.ckpt")
+        (workdir / "altre.csv").write_text("card_number\n4111111111111111\n", encoding='utf-8')
+        
+        with pytest.raises(ValueError, match="altro file"):
+            validate_cards_from_csv("altre.csv", checkpoint_file="run.ckpt", resume=True)
+    
+    def test_resume_cr_only_csv(self, workdir, monkeypatch):
+        """Test di checkpoint e ripresa su un CSV con soli CR come fine riga."""
+        data = (workdir / "carte.csv").read_bytes().replace(b"\r\n", b"\r")
+        (workdir / "carte_cr.csv").write_bytes(data)
+        
+        original = _crash_after(monkeypatch, 25)
+        with pytest.raises(RuntimeError):
+            validate_cards_from_csv("carte_cr.csv", checkpoint_file="run.ckpt", checkpoint_every=10)
+        monkeypatch.setattr(luhnalgorithm, "validate_luhn", original)
+        results = validate_cards_from_csv(
+            "carte_cr.csv", checkpoint_file="run.ckpt", checkpoint_every=10, resume=True
+        )
+        
+        assert [card for card, _, _ in results] == [CARDS[i % len(CARDS)] for i in range(20, TOTAL_ROWS)]
+        assert load_checkpoint("run.ckpt").byte_offset == len(data)
+
+
+class TestOffsetLineReader:
+    """Test suite per OffsetLineReader."""
+    
+    DATA = b"a,b\r\n1,2\n3,4\r5,6\r\r7,8\r\n9"
+    
+    @pytest.mark.parametrize("block_bytes", [1, 2, 3, 64 * 1024])
+    def test_universal_newlines(self, monkeypatch, block_bytes):
+        """Test che '\\n', '\\r\\n' e '\\r' terminino le righe anche a cavallo dei blocchi."""
+        monkeypatch.setattr(luhn_checkpoint, "READ_BLOCK_BYTES", block_bytes)
+        reader = OffsetLineReader(io.BytesIO(self.DATA))
+        lines, offsets = [], []
+        for line in reader:
+            lines.append(line)
+            offsets.append(reader.offset)
+        
+        assert lines == ["a,b\r\n", "1,2\n", "3,4\r", "5,6\r", "\r", "7,8\r\n", "9"]
+        assert offsets == [5, 9, 13, 17, 18, 23, 24]
+    
+    def test_csv_with_cr_only(self):
+        """Test che il modulo csv legga un file con soli CR."""
+        rows = list(csv.reader(OffsetLineReader(io.BytesIO(b'a,b\r1,"x\ry"\r2,3\r'))))
+        assert rows == [["a", "b"], ["1", "x\ry"], ["2", "3"]]
+    
+    def test_seek(self):
+        """Test che seek() scarti le righe già lette dal blocco."""
+        reader = OffsetLineReader(io.BytesIO(self.DATA))
+        next(reader)
+        reader.seek(9)
+        assert next(reader) == "3,4\r"
+        assert reader.offset == 13
+    
+    def test_max_line_bytes(self, monkeypatch):
+        """Test che una riga troppo lunga venga rifiutata con il suo offset."""
+        monkeypatch.setattr(luhn_checkpoint, "READ_BLOCK_BYTES", 4)
+        reader = OffsetLineReader(io.BytesIO(b"ab\rcdefghij\rk"), max_line_bytes=5)
+        assert next(reader) == "ab\r"
+        with pytest.raises(ValueError, match="offset 3"):
+            next(reader)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
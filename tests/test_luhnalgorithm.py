@@ -2,8 +2,17 @@
 Test unitari per il validatore Luhn.
 """
 
+import csv
+import os
+import random
+import subprocess
+import sys
+from array import array
+
 import pytest
-from luhnalgorithm import validate_luhn
+from luhnalgorithm import (
+    hash_card_number, validate_luhn, validate_luhn_bytes, validate_luhn_int, validate_luhn_int_batch
+)
 
 
 class TestValidateLuhn:
@@ -95,5 +104,166 @@ class TestEdgeCases:
         assert isinstance(result, bool)
 
 
+class TestNormalizeAndBytes:
+    """Test per la modalità normalize e l'API a bytes."""
+    
+    def test_normalize_spaces(self):
+        """Test rimozione degli spazi."""
+        assert validate_luhn("4111 1111 1111 1111", normalize=True) is True
+    
+    def test_normalize_dashes(self):
+        """Test rimozione dei trattini."""
+        assert validate_luhn("5555-5555-5555-4444", normalize=True) is True
+    
+    def test_normalize_keeps_letters_invalid(self):
+        """Test che la normalizzazione non rimuova caratteri non separatori."""
+        with pytest.raises(ValueError, match="Il numero deve contenere solo cifre"):
+            validate_luhn("4111 1111 1111 111a", normalize=True)
+    
+    def test_unicode_digits_rejected(self):
+        """Test che le cifre Unicode non ASCII vengano rifiutate."""
+        with pytest.raises(ValueError, match="Il numero deve contenere solo cifre"):
+            validate_luhn("٤١١١١١١١١١١١١١١١")
+    
+    def test_bytes_valid(self):
+        """Test con input bytes."""
+        assert validate_luhn_bytes(b"4111111111111111") is True
+        assert validate_luhn_bytes(b"4111111111111112") is False
+    
+    def test_bytearray_and_memoryview(self):
+        """Test con bytearray e memoryview."""
+        buffer = bytearray(b"xx378282246310005yy")
+        assert validate_luhn_bytes(memoryview(buffer)[2:-2]) is True
+        assert validate_luhn_bytes(bytearray(b"378282246310005")) is True
+    
+    def test_bytes_normalize(self):
+        """Test normalizzazione su bytes con separatori e a capo."""
+        assert validate_luhn_bytes(b"4111-1111-1111-1111\r\n", normalize=True) is True
+    
+    def test_bytes_errors_match_str(self):
+        """Test che gli errori siano gli stessi dell'API str."""
+        with pytest.raises(ValueError, match="Il numero non può essere vuoto"):
+            validate_luhn_bytes(b"")
+        with pytest.raises(ValueError, match="Il numero deve contenere solo cifre"):
+            validate_luhn_bytes("٤١١١".encode('utf-8') + b"111111111111")
+        with pytest.raises(ValueError, match="Il numero deve avere 13-19 cifre"):
+            validate_luhn_bytes(b"123456789")
+    
+    def test_bytes_audit(self, tmp_path, monkeypatch):
+        """Test dell'audit da input bytes."""
+        monkeypatch.chdir(tmp_path)
+        assert validate_luhn_bytes(b"4111 1111 1111 1111", log_audit=True, normalize=True) is True
+        content = (tmp_path / "validation_audit.csv").read_text(encoding='utf-8')
+        assert "4111111111111111" not in content
+        assert "Visa" in content
+
+
+class TestIntegerAPI:
+    """Test suite per l'API su interi."""
+    
+    def test_matches_string_path(self):
+        """Test di equivalenza con validate_luhn su valori casuali."""
+        rng = random.Random(42)
+        for _ in range(2000):
+            number = rng.randrange(10 ** 12, 10 ** 19)
+            assert validate_luhn_int(number) == validate_luhn(str(number))
+    
+    def test_known_cards(self):
+        assert validate_luhn_int(4111111111111111) is True
+        assert validate_luhn_int(378282246310005) is True
+        assert validate_luhn_int(4111111111111112) is False
+    
+    def test_leading_zeros_with_length(self):
+        """Test dei PAN con zeri iniziali: lunghezza esplicita."""
+        card = "0000000041111113"
+        number = int(card)
+        assert validate_luhn_int(number, length=16) == validate_luhn(card)
+        with pytest.raises(ValueError, match="13-19 cifre"):
+            validate_luhn_int(number)
+    
+    def test_errors(self):
+        with pytest.raises(ValueError, match="più di 16 cifre"):
+            validate_luhn_int(41111111111111110, length=16)
+        with pytest.raises(ValueError, match="negativo"):
+            validate_luhn_int(-4111111111111111)
+        with pytest.raises(ValueError, match="13-19 cifre"):
+            validate_luhn_int(2 ** 64 - 1)
+        with pytest.raises(TypeError):
+            validate_luhn_int("4111111111111111")
+    
+    def test_audit_keeps_leading_zeros(self, tmp_path, monkeypatch):
+        """Test che l'audit registri la lunghezza dichiarata, zeri iniziali compresi."""
+        monkeypatch.chdir(tmp_path)
+        assert validate_luhn_int(41111113, length=16, log_audit=True) is True
+        with open(tmp_path / "validation_audit.csv", 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 1
+        assert rows[0]['card_length'] == '16'
+        assert rows[0]['card_hash'] == hash_card_number("0000000041111113")
+    
+    def test_batch_array(self):
+        """Test del batch su array('Q'): lunghezze errate risultano False."""
+        numbers = array('Q', [4111111111111111, 4111111111111112, 12345, 2 ** 64 - 1, 378282246310005])
+        assert validate_luhn_int_batch(numbers) == [True, False, False, False, True]
+        assert validate_luhn_int_batch([4111111111111111], length=12) == [False]
+    
+    def test_batch_other_dtype_objects(self):
+        """Test che un oggetto con dtype che non è un ndarray (es. pandas Series) venga accettato."""
+        class _Series(list):
+            dtype = "int64"
+        
+        numbers = _Series([4111111111111111, 4111111111111112, 12345])
+        assert validate_luhn_int_batch(numbers) == [True, False, False]
+    
+    def test_batch_rejects_float_dtype(self):
+        """Test che un array in virgola mobile venga rifiutato invece di perdere cifre."""
+        class _FloatDtype:
+            kind = 'f'
+            
+            def __str__(self):
+                return "float64"
+        
+        class _FloatSeries(list):
+            dtype = _FloatDtype()
+        
+        with pytest.raises(TypeError, match="float64"):
+            validate_luhn_int_batch(_FloatSeries([4111111111111111.0]))
+    
+    def test_batch_numpy_float_rejected(self):
+        numpy = pytest.importorskip("numpy")
+        with pytest.raises(TypeError, match="intero"):
+            validate_luhn_int_batch(numpy.array([4111111111111111.0]))
+    
+    def test_batch_numpy(self):
+        """Test del batch vettoriale NumPy contro il percorso per intero."""
+        numpy = pytest.importorskip("numpy")
+        rng = random.Random(7)
+        values = [rng.randrange(0, 2 ** 64) for _ in range(1000)] + [4111111111111111, 12345]
+        
+        results = validate_luhn_int_batch(numpy.array(values, dtype=numpy.uint64))
+        
+        assert results.tolist() == validate_luhn_int_batch(values)
+        assert validate_luhn_int_batch(array('Q', values)) == validate_luhn_int_batch(values)
+        signed = numpy.array([4111111111111111, -4111111111111111], dtype=numpy.int64)
+        assert validate_luhn_int_batch(signed).tolist() == [True, False]
+
+
+class TestImportSideEffects:
+    """Test che l'import del core resti leggero (avvio rapido della GUI)."""
+    
+    def test_import_does_not_configure_logging(self):
+        """Test: nessun handler sul root logger e nessun http.server all'import."""
+        core_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "core")
+        script = (
+            "import logging, sys; import luhnalgorithm; "
+            "print(len(logging.getLogger().handlers), 'http.server' in sys.modules)"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", script], env=dict(os.environ, PYTHONPATH=core_dir),
+            capture_output=True, text=True, check=True
+        )
+        assert out.stdout.split() == ["0", "False"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,178 @@
+"""
+Test per la modalità a memoria limitata della validazione batch.
+"""
+
+import logging
+import os
+import subprocess
+import sys
+import textwrap
+import tracemalloc
+import pytest
+
+from luhnalgorithm import validate_cards_from_csv
+from luhn_memory import ChunkedResultSink, MemoryCeiling, current_rss, read_tail_lines
+
+CORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "core")
+CARDS = ["4111111111111111", "5555555555554444", "4111111111111112", "378282246310005"]
+
+
+def write_cards_csv(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("card_number\n")
+        for i in range(rows):
+            f.write(CARDS[i % len(CARDS)] + "\n")
+    return str(path)
+
+
+def bounded_run(csv_file):
+    """Validazione in modalità limitata; restituisce il numero di righe."""
+    sink = ChunkedResultSink(lambda chunk: None, chunk_rows=1000)
+    validate_cards_from_csv(
+        csv_file, enable_audit=False, result_sink=sink,
+        collect_results=False, memory_ceiling=1 << 40
+    )
+    return sink.rows_written
+
+
+@pytest.fixture
+def quiet_logger(caplog):
+    """Evita che i log per riga restino in memoria nel gestore di pytest."""
+    caplog.set_level(logging.WARNING, logger="luhnalgorithm")
+
+
+class TestBoundedMemory:
+    """Test che la memoria resti costante al crescere del file."""
+    
+    def test_tracemalloc_peak_is_flat(self, tmp_path, quiet_logger):
+        """Test del picco di allocazioni: 10k righe contro 50k righe."""
+        small = write_cards_csv(tmp_path / "small.csv", 10_000)
+        large = write_cards_csv(tmp_path / "large.csv", 50_000)
+        
+        peaks = []
+        for csv_file in (small, large):
+            tracemalloc.start()
+            try:
+                bounded_run(csv_file)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        
+        # 5 volte le righe, stesso picco (a meno di rumore)
+        assert peaks[1] < peaks[0] * 1.25 + 64 * 1024
+    
+    def test_collecting_results_grows(self, tmp_path, quiet_logger):
+        """Controprova: accumulando i risultati il picco cresce."""
+        csv_file = write_cards_csv(tmp_path / "cards.csv", 10_000)
+        
+        tracemalloc.start()
+        try:
+            bounded_run(csv_file)
+            bounded_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+            validate_cards_from_csv(csv_file, enable_audit=False)
+            collected_peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        
+        assert collected_peak > 2 * bounded_peak
+    
+    @pytest.mark.skipif(current_rss() is None, reason="RSS non misurabile su questa piattaforma")
+    def test_peak_rss_is_flat(self, tmp_path):
+        """Test del picco di RSS in processi separati: 10k contro 100k righe."""
+        script = textwrap.dedent("""
+            import logging, resource, sys
+            logging.disable(logging.INFO)
+            from luhnalgorithm import validate_cards_from_csv
+            from luhn_memory import ChunkedResultSink
+            sink = ChunkedResultSink(lambda chunk: None)
+            validate_cards_from_csv(sys.argv[1], enable_audit=False, result_sink=sink,
+                                    collect_results=False, memory_ceiling=1 << 40)
+            print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+        """)
+        env = dict(os.environ, PYTHONPATH=CORE_DIR)
+        
+        peaks = []
+        for rows in (10_000, 100_000):
+            csv_file = write_cards_csv(tmp_path / f"cards_{rows}.csv", rows)
+            out = subprocess.run(
+                [sys.executable, "-c", script, csv_file],
+                env=env, capture_output=True, text=True, check=True
+            )
+            peaks.append(int(out.stdout.split()[-1]))
+        
+        # ru_maxrss è in KiB su Linux: tolleranza di 4 MiB
+        assert peaks[1] - peaks[0] < 4 * 1024
+    
+    def test_ceiling_exceeded_raises(self, tmp_path, quiet_logger):
+        """Test del tetto di memoria troppo basso."""
+        if current_rss() is None:
+            pytest.skip("RSS non misurabile su questa piattaforma")
+        csv_file = write_cards_csv(tmp_path / "cards.csv", 10)
+        
+        with pytest.raises(MemoryError, match="Tetto di memoria"):
+            validate_cards_from_csv(
+                csv_file, enable_audit=False, collect_results=False, memory_ceiling=1024
+            )
+    
+    def test_ceiling_requires_streaming(self, tmp_path):
+        """Test che la modalità limitata rifiuti l'accumulo dei risultati."""
+        csv_file = write_cards_csv(tmp_path / "cards.csv", 10)
+        
+        with pytest.raises(ValueError, match="collect_results=False"):
+            validate_cards_from_csv(csv_file, enable_audit=False, memory_ceiling=1 << 30)
+    
+    def test_overlong_line_rejected(self, tmp_path, quiet_logger):
+        """Test che una riga enorme senza a capo non venga caricata in memoria."""
+        csv_file = tmp_path / "cards.csv"
+        csv_file.write_bytes(b"card_number\n4111111111111111\n" + b"9" * (1 << 20))
+        
+        with pytest.raises(ValueError, match="Riga oltre"):
+            bounded_run(str(csv_file))
+    
+    def test_invalid_ceiling(self):
+        with pytest.raises(ValueError):
+            MemoryCeiling(0)
+
+
+class TestChunkedResultSink:
+    """Test per ChunkedResultSink."""
+    
+    def test_chunks_are_bounded(self, tmp_path, quiet_logger):
+        """Test di blocchi di dimensione fissa e ultimo blocco parziale."""
+        csv_file = write_cards_csv(tmp_path / "cards.csv", 25)
+        sizes = []
+        first_rows = []
+        
+        def on_chunk(chunk):
+            sizes.append(len(chunk))
+            first_rows.append(chunk[0])
+        
+        with ChunkedResultSink(on_chunk, chunk_rows=10) as sink:
+            validate_cards_from_csv(csv_file, enable_audit=False, result_sink=sink, collect_results=False)
+        
+        assert sizes == [10, 10, 5]
+        assert first_rows[0] == (2, "4111111111111111", True, "")
+        assert sink.tell() == 25
+
+
+class TestReadTailLines:
+    """Test per la lettura a ritroso dell'audit."""
+    
+    def test_header_and_last_lines(self, tmp_path):
+        path = tmp_path / "audit.csv"
+        path.write_text("h1,h2\r\n" + "".join(f"r{i},x\r\n" for i in range(500)), encoding='utf-8')
+        
+        header, lines = read_tail_lines(str(path), 3, block_size=16)
+        
+        assert header == "h1,h2"
+        assert lines == ["r497,x", "r498,x", "r499,x"]
+    
+    def test_short_file(self, tmp_path):
+        path = tmp_path / "audit.csv"
+        path.write_text("h1,h2\nr0,x", encoding='utf-8')
+        
+        assert read_tail_lines(str(path), 10) == ("h1,h2", ["r0,x"])
+        
+        path.write_text("h1,h2\n", encoding='utf-8')
+        assert read_tail_lines(str(path), 10) == ("h1,h2", [])
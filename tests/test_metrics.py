@@ -0,0 +1,168 @@
+"""
+Test per il registro di metriche e l'esportazione Prometheus.
+"""
+
+import pytest
+import urllib.request
+
+from luhn_metrics import (
+    METRICS, VALIDATIONS, VALIDATION_LATENCY, HASH_LATENCY, AUDIT_WRITE_LATENCY,
+    LatencyHistogram, MetricsRegistry, enable_metrics, disable_metrics
+)
+from luhnalgorithm import validate_luhn, log_validation_to_csv
+
+
+@pytest.fixture
+def metrics():
+    """Abilita le metriche globali e le azzera prima e dopo il test."""
+    METRICS.reset()
+    enable_metrics()
+    yield METRICS
+    disable_metrics()
+    METRICS.reset()
+
+
+class TestLatencyHistogram:
+    """Test per l'istogramma di latenza in stile HDR."""
+    
+    def test_percentiles_within_relative_error(self):
+        """Test che i percentili abbiano errore relativo < 2%."""
+        histogram = LatencyHistogram("test_seconds", "test")
+        for value in range(1, 100_001):
+            histogram.observe_ns(value * 10)
+        
+        for q, expected in ((50, 500_000), (99, 990_000), (100, 1_000_000)):
+            assert abs(histogram.percentile(q) - expected) / expected < 0.02
+    
+    def test_small_values_exact(self):
+        """Test che i valori piccoli siano registrati esattamente."""
+        histogram = LatencyHistogram("test_seconds", "test")
+        histogram.observe_ns(42)
+        assert histogram.percentile(50) == 42
+        assert histogram.count == 1
+        assert histogram.min_ns == 42
+    
+    def test_empty_histogram(self):
+        """Test percentile su istogramma vuoto."""
+        assert LatencyHistogram("test_seconds", "test").percentile(99) == 0
+
+
+class TestValidationMetrics:
+    """Test per le metriche raccolte da validate_luhn."""
+    
+    def test_counters_by_result_and_card_type(self, metrics):
+        """Test dei contatori per esito e tipo di carta."""
+        validate_luhn("4111111111111111")
+        validate_luhn("4111111111111112")
+        validate_luhn("5555555555554444")
+        with pytest.raises(ValueError):
+            validate_luhn("41111")
+        
+        assert VALIDATIONS.get(('valid', 'Visa')) == 1
+        assert VALIDATIONS.get(('invalid', 'Visa')) == 1
+        assert VALIDATIONS.get(('valid', 'Mastercard')) == 1
+        assert VALIDATIONS.get(('error', 'Visa')) == 1
+        assert VALIDATION_LATENCY.count == 3
+    
+    def test_audit_latencies_recorded(self, metrics, tmp_path):
+        """Test che hashing e scrittura audit vengano misurati."""
+        log_validation_to_csv("4111111111111111", True, "Visa", filename=str(tmp_path / "audit.csv"))
+        
+        assert HASH_LATENCY.count == 1
+        assert AUDIT_WRITE_LATENCY.count == 1
+    
+    def test_card_type_computed_once(self, metrics, monkeypatch):
+        """Test che con metriche e audit il tipo di carta venga calcolato una volta."""
+        import luhnalgorithm
+        calls = []
+        original = luhnalgorithm.detect_card_type
+        monkeypatch.setattr(luhnalgorithm, "detect_card_type", lambda card: calls.append(card) or original(card))
+        records = []
+        
+        class _Sink:
+            def write(self, record):
+                records.append(record)
+        
+        validate_luhn("5555555555554444", log_audit=True, audit_sink=_Sink())
+        
+        assert len(calls) == 1
+        assert records[0]['card_type'] == 'Mastercard'
+        assert VALIDATIONS.get(('valid', 'Mastercard')) == 1
+    
+    def test_sink_audit_write_recorded(self, metrics, tmp_path):
+        """Test che le scritture dei sink di audit vengano misurate."""
+        from luhn_audit_sink import AsyncAuditWriter, LockedAuditSink
+        
+        with LockedAuditSink(str(tmp_path / "locked.csv")) as sink:
+            validate_luhn("4111111111111111", log_audit=True, audit_sink=sink)
+        assert AUDIT_WRITE_LATENCY.count == 1
+        
+        with AsyncAuditWriter(str(tmp_path / "async.csv")) as writer:
+            validate_luhn("4111111111111111", log_audit=True, audit_sink=writer)
+        assert AUDIT_WRITE_LATENCY.count == 2
+    
+    def test_disabled_records_nothing(self):
+        """Test che con metriche disabilitate non venga registrato nulla."""
+        METRICS.reset()
+        assert not METRICS.enabled
+        
+        validate_luhn("4111111111111111")
+        
+        assert VALIDATIONS.get(('valid', 'Visa')) == 0
+        assert VALIDATION_LATENCY.count == 0
+
+
+class TestPrometheusExport:
+    """Test per l'esportazione nel formato di Prometheus."""
+    
+    def test_render_format(self, metrics):
+        """Test del formato testuale di esposizione."""
+        validate_luhn("4111111111111111")
+        text = METRICS.render_prometheus()
+        
+        assert "# TYPE luhn_validations_total counter" in text
+        assert 'luhn_validations_total{result="valid",card_type="Visa"} 1' in text
+        assert "# TYPE luhn_validation_seconds histogram" in text
+        assert 'luhn_validation_seconds_bucket{le="+Inf"} 1' in text
+        assert "luhn_validation_seconds_count 1" in text
+    
+    def test_label_escaping(self):
+        """Test dell'escape dei valori delle etichette."""
+        registry = MetricsRegistry(enabled=True)
+        counter = registry.counter("test_total", "test", ("card_type",))
+        counter.inc(('Tipo "speciale"',))
+        
+        assert 'card_type="Tipo \\"speciale\\""' in registry.render_prometheus()
+    
+    def test_write_prometheus_file(self, metrics, tmp_path):
+        """Test della scrittura su file."""
+        validate_luhn("4111111111111111")
+        output = tmp_path / "luhn.prom"
+        METRICS.write_prometheus(str(output))
+        
+        assert output.read_text(encoding='utf-8') == METRICS.render_prometheus()
+    
+    def test_http_endpoint(self, metrics):
+        """Test dell'endpoint HTTP locale."""
+        validate_luhn("4111111111111111")
+        server = METRICS.start_http_server(port=0)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+                body = response.read().decode('utf-8')
+        finally:
+            server.shutdown()
+            server.server_close()
+        
+        assert 'luhn_validations_total{result="valid",card_type="Visa"} 1' in body
+    
+    def test_duplicate_registration(self):
+        """Test che una metrica non possa essere registrata due volte."""
+        registry = MetricsRegistry()
+        registry.counter("test_total", "test")
+        with pytest.raises(ValueError, match="già registrata"):
+            registry.counter("test_total", "test")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
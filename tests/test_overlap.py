@@ -0,0 +1,151 @@
+"""
+Test per il confronto out-of-core dei PAN tra file.
+"""
+
+import csv
+import os
+import pytest
+
+import luhn_overlap
+from luhnalgorithm import hash_card_number, log_validation_to_csv
+from luhn_overlap import OverlapSource, choose_partitions, find_overlap, main
+
+
+def write_feed(path, cards):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("card_number\n" + "\n".join(cards) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def feeds(tmp_path):
+    new = write_feed(tmp_path / "nuovo.csv", [
+        "4111111111111111", "5555555555554444", "378282246310005", "4111111111111111", ""
+    ])
+    old = write_feed(tmp_path / "vecchio.csv", [
+        "6011111111111117", "4111111111111111", "378282246310005", "378282246310005"
+    ])
+    return new, old
+
+
+def read_overlap(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['card_hash']: (row['left_rows'], row['right_rows']) for row in csv.DictReader(f)}
+
+
+class TestFindOverlap:
+    """Test suite per find_overlap."""
+    
+    @pytest.mark.parametrize("partitions", [1, 4, 64])
+    def test_counts_and_rows(self, feeds, tmp_path, partitions):
+        """Test di conteggi e numeri di riga con diverse partizioni."""
+        new, old = feeds
+        output = str(tmp_path / "overlap.csv")
+        
+        report = find_overlap(OverlapSource(new), OverlapSource(old), output, partitions=partitions)
+        
+        assert report.left_rows == 4
+        assert report.left_skipped == 1
+        assert report.right_rows == 4
+        assert report.common_cards == 2
+        assert report.left_matches == 3
+        assert report.right_matches == 3
+        assert read_overlap(output) == {
+            hash_card_number("4111111111111111"): ("2 5", "3"),
+            hash_card_number("378282246310005"): ("4", "4 5"),
+        }
+    
+    def test_no_plaintext_on_disk(self, feeds, tmp_path):
+        """Test che output e file di spill non contengano PAN in chiaro."""
+        new, old = feeds
+        work_dir = tmp_path / "spill"
+        work_dir.mkdir()
+        output = tmp_path / "overlap.csv"
+        
+        find_overlap(OverlapSource(new), OverlapSource(old), str(output), work_dir=str(work_dir))
+        
+        assert "4111111111111111" not in output.read_text(encoding='utf-8')
+        assert os.listdir(work_dir) == []
+    
+    def test_against_audit_log(self, feeds, tmp_path):
+        """Test del confronto con l'audit (solo righe dello stesso backend)."""
+        new, _ = feeds
+        audit = str(tmp_path / "audit.csv")
+        log_validation_to_csv("5555555555554444", True, "Mastercard", filename=audit)
+        log_validation_to_csv("4111111111111111", True, "Visa", filename=audit,
+                              hash_algorithm="blake2b_keyed", hash_key=b"k" * 32)
+        
+        report = find_overlap(OverlapSource(new), OverlapSource(audit, audit=True))
+        
+        assert report.common_cards == 1
+        assert report.right_rows == 1
+        assert report.right_skipped == 1
+    
+    def test_keyed_backend(self, feeds):
+        """Test con backend con chiave."""
+        new, old = feeds
+        
+        report = find_overlap(
+            OverlapSource(new), OverlapSource(old),
+            hash_algorithm="hmac_sha256", hash_key=b"segreto"
+        )
+        
+        assert report.common_cards == 2
+    
+    def test_missing_column(self, tmp_path, feeds):
+        bad = tmp_path / "bad.csv"
+        bad.write_text("pan\n4111111111111111\n", encoding='utf-8')
+        
+        with pytest.raises(ValueError, match="card_number"):
+            find_overlap(OverlapSource(str(bad)), OverlapSource(feeds[1]))
+    
+    def test_choose_partitions(self, feeds):
+        """Test del dimensionamento: potenza di 2 limitata."""
+        assert choose_partitions(list(feeds)) == 1
+        assert choose_partitions(list(feeds), memory_budget=100) == 16
+        assert choose_partitions(list(feeds), memory_budget=1) == 512
+    
+    def test_oversized_partition_repartitioned(self, tmp_path, monkeypatch):
+        """Test che una partizione oltre il budget venga ripartizionata senza perdere corrispondenze."""
+        cards = [f"4{i:015d}" for i in range(400)]
+        new = write_feed(tmp_path / "nuovo.csv", cards[:300])
+        old = write_feed(tmp_path / "vecchio.csv", cards[200:] + cards[250:260])
+        expected = find_overlap(OverlapSource(new), OverlapSource(old), str(tmp_path / "atteso.csv"))
+        
+        splits = []
+        original_split = luhn_overlap._split_partition
+        
+        def spy(path, digest_size, partitions, level):
+            splits.append(level)
+            return original_split(path, digest_size, partitions, level)
+        
+        monkeypatch.setattr(luhn_overlap, "_split_partition", spy)
+        monkeypatch.setattr(luhn_overlap, "MAX_PARTITIONS", 2)
+        work_dir = tmp_path / "spill"
+        work_dir.mkdir()
+        output = str(tmp_path / "overlap.csv")
+        report = find_overlap(
+            OverlapSource(new), OverlapSource(old), output,
+            partitions=1, memory_budget=2000, work_dir=str(work_dir)
+        )
+        
+        assert max(splits) >= 2
+        assert report.common_cards == expected.common_cards == 100
+        assert report.right_matches == 110
+        assert read_overlap(output) == read_overlap(str(tmp_path / "atteso.csv"))
+        assert os.listdir(work_dir) == []
+    
+    def test_repeated_digest_not_split_forever(self, tmp_path):
+        """Test che una partizione con un solo digest ripetuto venga unita in memoria."""
+        new = write_feed(tmp_path / "nuovo.csv", ["4111111111111111"] * 200)
+        old = write_feed(tmp_path / "vecchio.csv", ["4111111111111111"] * 50)
+        
+        report = find_overlap(OverlapSource(new), OverlapSource(old), partitions=1, memory_budget=100)
+        
+        assert report.common_cards == 1
+        assert report.left_matches == 200
+        assert report.right_matches == 50
+    
+    def test_cli(self, feeds, capsys):
+        main(list(feeds))
+        assert "Carte in comune: 2" in capsys.readouterr().out
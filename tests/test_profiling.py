@@ -0,0 +1,102 @@
+"""
+Test per il profiling per stadio della pipeline batch.
+"""
+
+import json
+import pytest
+
+from luhn_profiling import Profiler, profile, active_profiler
+from luhnalgorithm import validate_luhn, validate_cards_from_csv
+
+
+@pytest.fixture
+def cards_csv(tmp_path):
+    """Crea un CSV di test con carte valide, non valide ed errate."""
+    csv_file = tmp_path / "carte.csv"
+    csv_file.write_text(
+        "card_number\n4111111111111111\n5555555555554444\n4111111111111112\n12345\n",
+        encoding='utf-8'
+    )
+    return csv_file
+
+
+class TestProfiler:
+    """Test suite per Profiler e gli span."""
+    
+    def test_no_profiler_by_default(self):
+        """Test che nessun profiler sia attivo di default."""
+        assert active_profiler() is None
+    
+    def test_profile_context_restores_previous(self):
+        """Test che il context manager ripristini lo stato precedente."""
+        with profile() as prof:
+            assert active_profiler() is prof
+        assert active_profiler() is None
+    
+    def test_span_counts_calls(self):
+        """Test del conteggio di chiamate per stadio."""
+        prof = Profiler()
+        for _ in range(3):
+            with prof.span("stadio"):
+                pass
+        
+        assert prof.stats()["stadio"]["calls"] == 3
+    
+    def test_callback_invoked(self):
+        """Test che il callback riceva ogni span."""
+        received = []
+        prof = Profiler(callback=lambda name, start, duration: received.append(name))
+        with prof.span("stadio"):
+            pass
+        
+        assert received == ["stadio"]
+    
+    def test_validate_luhn_spans(self, tmp_path, monkeypatch):
+        """Test degli span di validate_luhn con audit."""
+        monkeypatch.chdir(tmp_path)
+        with profile() as prof:
+            validate_luhn("4111111111111111", log_audit=True)
+        
+        stats = prof.stats()
+        for stage in ("validate_digits", "detect_card_type", "hash", "audit_io"):
+            assert stats[stage]["calls"] == 1
+
+
+class TestBatchProfiling:
+    """Test per il profiling di validate_cards_from_csv."""
+    
+    def test_per_stage_report(self, cards_csv, tmp_path, monkeypatch):
+        """Test del report per stadio su un run batch."""
+        monkeypatch.chdir(tmp_path)
+        prof = Profiler()
+        validate_cards_from_csv(str(cards_csv), profiler=prof)
+        
+        stats = prof.stats()
+        assert stats["csv_parse"]["calls"] == 4
+        assert stats["validate_digits"]["calls"] == 4
+        assert stats["hash"]["calls"] == 3
+        assert stats["audit_io"]["calls"] == 3
+        assert "csv_parse" in prof.report()
+        assert active_profiler() is None
+    
+    def test_chrome_trace_export(self, cards_csv, tmp_path):
+        """Test dell'export in formato Chrome trace-event."""
+        prof = Profiler(trace=True)
+        validate_cards_from_csv(str(cards_csv), enable_audit=False, profiler=prof)
+        
+        trace_file = tmp_path / "trace.json"
+        prof.export_chrome_trace(str(trace_file))
+        events = json.loads(trace_file.read_text(encoding='utf-8'))["traceEvents"]
+        
+        assert len(events) == 8
+        assert {event["ph"] for event in events} == {"X"}
+        assert {event["name"] for event in events} == {"csv_parse", "validate_digits"}
+    
+    def test_trace_requires_trace_mode(self, tmp_path):
+        """Test che l'export richieda trace=True."""
+        with pytest.raises(ValueError, match="trace=True"):
+            Profiler().export_chrome_trace(str(tmp_path / "trace.json"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
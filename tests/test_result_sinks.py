@@ -0,0 +1,137 @@
+"""
+Test per i sink di output in streaming della validazione batch.
+"""
+
+import csv
+import json
+import pytest
+
+import luhnalgorithm
+from luhnalgorithm import mask_card_number, validate_cards_from_csv
+from luhn_checkpoint import load_checkpoint, save_checkpoint
+from luhn_result_sinks import CsvResultSink, JsonlResultSink, MaskedReportSink
+
+CARDS = ["4111111111111111", "5555555555554444", "4111111111111112", "12345"]
+
+
+@pytest.fixture
+def cards_csv(tmp_path, monkeypatch):
+    """CSV di input in una directory di lavoro temporanea."""
+    monkeypatch.chdir(tmp_path)
+    csv_file = tmp_path / "carte.csv"
+    csv_file.write_text("card_number\n" + "\n".join(CARDS) + "\n", encoding='utf-8')
+    return csv_file
+
+
+class TestMaskCardNumber:
+    """Test per il mascheramento del PAN."""
+    
+    def test_mask_keeps_first_six_last_four(self):
+        assert mask_card_number("4111111111111111") == "411111******1111"
+    
+    def test_mask_amex(self):
+        assert mask_card_number("378282246310005") == "378282*****0005"
+    
+    def test_mask_invalid_input_fully(self):
+        assert mask_card_number("12345") == "*****"
+        assert mask_card_number("4111-1111-1111-1111") == "*" * 19
+
+
+class TestResultSinks:
+    """Test suite per i sink di output."""
+    
+    def test_csv_sink(self, cards_csv, tmp_path):
+        """Test del sink CSV."""
+        output = tmp_path / "risultati.csv"
+        with CsvResultSink(str(output)) as sink:
+            results = validate_cards_from_csv(str(cards_csv), enable_audit=False, result_sink=sink)
+        
+        with open(output, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        
+        assert [row['card_number'] for row in rows] == CARDS
+        assert [row['is_valid'] for row in rows] == ['Si', 'Si', 'No', 'No']
+        assert rows[3]['error'] == "Il numero deve avere 13-19 cifre"
+        assert len(results) == len(CARDS)
+    
+    def test_jsonl_sink(self, cards_csv, tmp_path):
+        """Test del sink JSON Lines."""
+        output = tmp_path / "risultati.jsonl"
+        with JsonlResultSink(str(output)) as sink:
+            validate_cards_from_csv(str(cards_csv), enable_audit=False, result_sink=sink)
+        
+        records = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+        
+        assert [r['row_num'] for r in records] == [2, 3, 4, 5]
+        assert [r['is_valid'] for r in records] == [True, True, False, False]
+    
+    def test_masked_report_has_no_plaintext(self, cards_csv, tmp_path):
+        """Test che il report mascherato non contenga PAN in chiaro."""
+        output = tmp_path / "report.csv"
+        with MaskedReportSink(str(output)) as sink:
+            validate_cards_from_csv(str(cards_csv), enable_audit=False, result_sink=sink)
+        
+        content = output.read_text(encoding='utf-8')
+        for card in CARDS:
+            assert card not in content
+        assert "411111******1111" in content
+        assert "Mastercard" in content
+    
+    def test_collect_results_false(self, cards_csv, tmp_path):
+        """Test che senza raccolta i risultati non restino in memoria."""
+        with CsvResultSink(str(tmp_path / "risultati.csv")) as sink:
+            results = validate_cards_from_csv(
+                str(cards_csv), enable_audit=False, result_sink=sink, collect_results=False
+            )
+        
+        assert results == []
+        assert sink.rows_written == len(CARDS)
+    
+    def test_resume_rewinds_result_file(self, cards_csv, tmp_path, monkeypatch):
+        """Test che la ripresa da checkpoint non duplichi i risultati."""
+        output = tmp_path / "risultati.csv"
+        original = luhnalgorithm.validate_luhn
+        calls = {'n': 0}
+        
+        def crashing(card, **kwargs):
+            calls['n'] += 1
+            if calls['n'] > 3:
+                raise RuntimeError("crash simulato")
+            return original(card, **kwargs)
+        
+        monkeypatch.setattr(luhnalgorithm, "validate_luhn", crashing)
+        with CsvResultSink(str(output), buffer_size=1) as sink:
+            with pytest.raises(RuntimeError):
+                validate_cards_from_csv(
+                    str(cards_csv), result_sink=sink, checkpoint_file="run.ckpt", checkpoint_every=2
+                )
+        
+        monkeypatch.setattr(luhnalgorithm, "validate_luhn", original)
+        with CsvResultSink(str(output), append=True) as sink:
+            validate_cards_from_csv(
+                str(cards_csv), result_sink=sink, checkpoint_file="run.ckpt",
+                checkpoint_every=2, resume=True
+            )
+        
+        with open(output, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        assert [row['card_number'] for row in rows] == CARDS
+    
+    def test_resume_requires_append(self, cards_csv, tmp_path):
+        """Test che la ripresa con un sink troncato venga rifiutata."""
+        output = str(tmp_path / "risultati.csv")
+        with CsvResultSink(output) as sink:
+            validate_cards_from_csv(str(cards_csv), result_sink=sink, checkpoint_file="run.ckpt")
+        ckpt = load_checkpoint("run.ckpt")
+        ckpt.completed = False
+        save_checkpoint("run.ckpt", ckpt)
+        
+        with CsvResultSink(output) as sink:
+            with pytest.raises(ValueError, match="append=True"):
+                validate_cards_from_csv(
+                    str(cards_csv), result_sink=sink, checkpoint_file="run.ckpt", resume=True
+                )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,180 @@
+"""
+Test per il vault locale di tokenizzazione.
+"""
+
+import sqlite3
+import pytest
+
+from luhnalgorithm import validate_luhn
+from luhn_vault import SCHEME_AESGCM, SCHEME_BLAKE2B, VAULT_KEY_ENV_VAR, TokenVault
+
+KEY = b"chiave-del-vault"
+CARDS = ["4111111111111111", "5555555555554444", "378282246310005", "4222222222222"]
+
+
+@pytest.fixture
+def vault(tmp_path):
+    with TokenVault(str(tmp_path / "vault.db"), key=KEY, cache_size=2) as v:
+        yield v
+
+
+class TestTokenize:
+    """Test per la generazione dei token."""
+    
+    def test_token_is_format_preserving(self, vault):
+        """Test di lunghezza, ultime 4 cifre e checksum di Luhn."""
+        for card in CARDS:
+            token = vault.tokenize(card)
+            assert token != card
+            assert len(token) == len(card)
+            assert token[-4:] == card[-4:]
+            assert token.isdigit() and token[0] != "0"
+            assert validate_luhn(token)
+    
+    def test_tokenize_is_deterministic(self, vault):
+        assert vault.tokenize(CARDS[0]) == vault.tokenize(CARDS[0])
+        assert len(vault) == 1
+    
+    def test_batch_with_duplicates(self, vault):
+        """Test del batch: stesso PAN, stesso token, una sola riga."""
+        tokens = vault.tokenize_many(CARDS + [CARDS[0]])
+        
+        assert tokens[0] == tokens[-1]
+        assert len(set(tokens)) == len(CARDS)
+        assert len(vault) == len(CARDS)
+    
+    def test_invalid_pan_rejected_atomically(self, vault):
+        """Test che un PAN non valido annulli tutto il batch."""
+        with pytest.raises(ValueError, match="Luhn"):
+            vault.tokenize_many([CARDS[0], "4111111111111112"])
+        with pytest.raises(ValueError):
+            vault.tokenize("abc")
+        
+        assert len(vault) == 0
+    
+    @pytest.mark.parametrize("method", ["_new_token", "_encrypt"])
+    def test_failure_mid_batch_releases_reservations(self, vault, monkeypatch, method):
+        """Test che un errore a metà batch non lasci token prenotati nell'indice."""
+        original = getattr(vault, method)
+        calls = []
+        
+        def failing(pan):
+            calls.append(pan)
+            if len(calls) == 3:
+                raise ValueError("Spazio dei token esaurito")
+            return original(pan)
+        
+        monkeypatch.setattr(vault, method, failing)
+        with pytest.raises(ValueError, match="esaurito"):
+            vault.tokenize_many(CARDS)
+        monkeypatch.setattr(vault, method, original)
+        
+        assert len(vault) == 0
+        tokens = vault.tokenize_many(CARDS)
+        assert len(vault) == len(CARDS)
+        assert vault.detokenize_many(tokens) == CARDS
+    
+    def test_second_instance_reuses_existing_token(self, tmp_path):
+        """Test di due istanze sullo stesso database: stesso PAN, stesso token."""
+        path = str(tmp_path / "vault.db")
+        with TokenVault(path, key=KEY) as first, TokenVault(path, key=KEY) as second:
+            token = first.tokenize(CARDS[0])
+            
+            assert second.tokenize(CARDS[0]) == token
+            tokens = second.tokenize_many([CARDS[1], CARDS[0]])
+            assert tokens[1] == token
+            assert first.tokenize_many([CARDS[1]]) == tokens[:1]
+            assert len(first) == len(second) == 2
+            assert second.detokenize_many(tokens) == [CARDS[1], CARDS[0]]
+    
+    def test_requires_key(self, tmp_path, monkeypatch):
+        monkeypatch.delenv(VAULT_KEY_ENV_VAR, raising=False)
+        with pytest.raises(ValueError, match="chiave"):
+            TokenVault(str(tmp_path / "vault.db"))
+
+
+class TestDetokenize:
+    """Test per la detokenizzazione e la persistenza."""
+    
+    def test_round_trip(self, vault):
+        tokens = vault.tokenize_many(CARDS)
+        
+        assert vault.detokenize_many(tokens) == CARDS
+        assert vault.detokenize(tokens[2]) == CARDS[2]
+    
+    def test_lru_cache_is_bounded(self, vault):
+        """Test della cache LRU: popolata anche da tokenize, limitata a cache_size."""
+        tokens = vault.tokenize_many(CARDS)
+        assert list(vault._cache) == tokens[-2:]
+        
+        assert vault.detokenize(tokens[0]) == CARDS[0]
+        assert list(vault._cache) == [tokens[3], tokens[0]]
+        assert vault.detokenize(tokens[3]) == CARDS[3]
+        assert list(vault._cache) == [tokens[0], tokens[3]]
+    
+    def test_unknown_token(self, vault):
+        with pytest.raises(ValueError, match="sconosciuto"):
+            vault.detokenize("4000000000000002")
+    
+    def test_persistence_and_index_reload(self, tmp_path):
+        path = str(tmp_path / "vault.db")
+        with TokenVault(path, key=KEY) as v:
+            tokens = v.tokenize_many(CARDS)
+        
+        with TokenVault(path, key=KEY) as v:
+            assert len(v) == len(CARDS)
+            assert v.tokenize(CARDS[1]) == tokens[1]
+            assert v.detokenize_many(tokens) == CARDS
+    
+    def test_no_plaintext_in_database(self, tmp_path):
+        path = str(tmp_path / "vault.db")
+        with TokenVault(path, key=KEY) as v:
+            v.tokenize_many(CARDS)
+        
+        with open(path, 'rb') as f:
+            data = f.read()
+        for card in CARDS:
+            assert card.encode() not in data
+    
+    def test_wrong_key_and_tampering_detected(self, tmp_path):
+        path = str(tmp_path / "vault.db")
+        with TokenVault(path, key=KEY) as v:
+            token = v.tokenize(CARDS[0])
+        
+        with TokenVault(path, key=b"altra-chiave", cache_size=0) as v:
+            with pytest.raises(ValueError, match="alterato"):
+                v.detokenize(token)
+        
+        db = sqlite3.connect(path)
+        blob = db.execute("SELECT pan_encrypted FROM tokens").fetchone()[0]
+        db.execute("UPDATE tokens SET pan_encrypted = ?", (blob[:20] + bytes([blob[20] ^ 1]) + blob[21:],))
+        db.commit()
+        db.close()
+        with TokenVault(path, key=KEY, cache_size=0) as v:
+            with pytest.raises(ValueError, match="alterato"):
+                v.detokenize(token)
+    
+    def test_blake2b_fallback_scheme(self, tmp_path, monkeypatch):
+        """Test del fallback senza cryptography: schema BLAKE2b nel primo byte."""
+        path = str(tmp_path / "vault.db")
+        with TokenVault(path, key=KEY, cache_size=0) as v:
+            monkeypatch.setattr(v, "_aead", None)
+            token = v.tokenize(CARDS[0])
+            blob = v._db.execute("SELECT pan_encrypted FROM tokens").fetchone()[0]
+            
+            assert blob[0] == SCHEME_BLAKE2B
+            assert v.detokenize(token) == CARDS[0]
+    
+    def test_aesgcm_scheme(self, tmp_path, monkeypatch):
+        """Test di AES-GCM con cryptography e del messaggio d'errore senza."""
+        pytest.importorskip("cryptography")
+        path = str(tmp_path / "vault.db")
+        with TokenVault(path, key=KEY, cache_size=0) as v:
+            token = v.tokenize(CARDS[0])
+            blob = v._db.execute("SELECT pan_encrypted FROM tokens").fetchone()[0]
+            
+            assert blob[0] == SCHEME_AESGCM
+            assert v.detokenize(token) == CARDS[0]
+            monkeypatch.setattr(v, "_aead", None)
+            with pytest.raises(ValueError, match="cryptography"):
+                v.detokenize(token)
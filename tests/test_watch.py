@@ -0,0 +1,172 @@
+"""
+Test per il daemon di ingestione da cartella.
+"""
+
+import csv
+import os
+import pytest
+
+from luhn_watch import WatchFolderDaemon
+
+
+def drop_file(daemon, name, cards):
+    """Deposita un CSV nella inbox."""
+    path = os.path.join(daemon.inbox, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("card_number\n" + "\n".join(cards) + "\n")
+    return path
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    d = WatchFolderDaemon(
+        str(tmp_path / "watch"), workers=2, poll_interval=0.01, settle_seconds=0,
+        use_processes=False, audit_file=str(tmp_path / "audit.csv")
+    )
+    yield d
+    d.close()
+
+
+class TestWatchFolderDaemon:
+    """Test suite per WatchFolderDaemon."""
+    
+    def test_processes_file_to_done(self, daemon, tmp_path):
+        """Test del percorso inbox -> done con report mascherato."""
+        drop_file(daemon, "lotto1.csv", ["4111111111111111", "4111111111111112", "12345"])
+        
+        assert daemon.wait_idle(timeout=10)
+        
+        assert os.listdir(daemon.inbox) == []
+        assert os.listdir(daemon.processing) == []
+        assert sorted(os.listdir(daemon.done)) == ["lotto1.csv", "lotto1.csv.report.csv"]
+        with open(os.path.join(daemon.done, "lotto1.csv.report.csv"), newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        assert [r['is_valid'] for r in rows] == ["Si", "No", "No"]
+        assert "4111111111111111" not in rows[0]['masked_pan']
+        
+        stats = daemon.stats()
+        assert stats['files_done'] == 1
+        assert stats['rows_processed'] == 3
+        assert stats['queue_depth'] == 0
+        assert (tmp_path / "audit.csv").exists()
+    
+    def test_bad_file_goes_to_failed(self, daemon):
+        """Test dello spostamento in failed/ con il motivo dell'errore."""
+        path = os.path.join(daemon.inbox, "rotto.csv")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("pan\n4111111111111111\n")
+        
+        assert daemon.wait_idle(timeout=10)
+        
+        assert sorted(os.listdir(daemon.failed)) == ["rotto.csv", "rotto.csv.error.txt"]
+        with open(os.path.join(daemon.failed, "rotto.csv.error.txt"), encoding='utf-8') as f:
+            assert "card_number" in f.read()
+        assert os.listdir(daemon.done) == []
+        assert daemon.stats()['files_failed'] == 1
+    
+    def test_pool_is_bounded(self, daemon):
+        """Test che non vengano presi in carico più file dei worker."""
+        for i in range(5):
+            drop_file(daemon, f"lotto{i}.csv", ["4111111111111111"])
+        
+        claimed = daemon.run_once()
+        
+        assert claimed == 2
+        assert daemon.queue_depth == 3
+        assert daemon.wait_idle(timeout=10)
+        assert daemon.stats()['files_done'] == 5
+    
+    def test_ignores_partial_and_fresh_files(self, tmp_path):
+        """Test che file temporanei e appena scritti restino nella inbox."""
+        d = WatchFolderDaemon(
+            str(tmp_path / "watch"), workers=1, settle_seconds=60,
+            use_processes=False, enable_audit=False
+        )
+        try:
+            drop_file(d, "lotto.csv.part", ["4111111111111111"])
+            drop_file(d, "fresco.csv", ["4111111111111111"])
+            
+            assert d.run_once() == 0
+            assert sorted(os.listdir(d.inbox)) == ["fresco.csv", "lotto.csv.part"]
+        finally:
+            d.close()
+    
+    def test_claim_is_exclusive(self, daemon):
+        """Test che un file già preso da un altro daemon venga saltato."""
+        drop_file(daemon, "lotto.csv", ["4111111111111111"])
+        
+        assert daemon._claim("lotto.csv") is not None
+        assert daemon._claim("lotto.csv") is None
+    
+    def test_recovers_interrupted_files(self, tmp_path):
+        """Test che i file di un daemon terminato tornino nella inbox."""
+        root = tmp_path / "watch"
+        (root / "processing" / "1234-morto").mkdir(parents=True)
+        (root / "processing" / "1234-morto" / "lotto.csv").write_text("card_number\n4111111111111111\n")
+        
+        d = WatchFolderDaemon(str(root), use_processes=False, enable_audit=False)
+        d.close()
+        
+        assert os.listdir(d.inbox) == ["lotto.csv"]
+        assert os.listdir(root / "processing") == []
+    
+    def test_live_daemon_files_not_recovered(self, daemon, tmp_path):
+        """Test che un secondo daemon non sottragga i file di uno ancora attivo."""
+        drop_file(daemon, "lotto.csv", ["4111111111111111"])
+        claimed = daemon._claim("lotto.csv")
+        
+        other = WatchFolderDaemon(
+            daemon.root, use_processes=False, enable_audit=False, settle_seconds=0
+        )
+        try:
+            assert other.run_once() == 0
+        finally:
+            other.close()
+        
+        assert os.path.exists(claimed)
+        assert os.listdir(daemon.inbox) == []
+    
+    def test_same_name_does_not_overwrite(self, daemon):
+        """Test che un file con lo stesso nome non sovrascriva quello in done/."""
+        drop_file(daemon, "lotto.csv", ["4111111111111111"])
+        assert daemon.wait_idle(timeout=10)
+        drop_file(daemon, "lotto.csv", ["5555555555554444", "378282246310005"])
+        assert daemon.wait_idle(timeout=10)
+        
+        assert sorted(os.listdir(daemon.done)) == [
+            "lotto.1.csv", "lotto.1.csv.report.csv", "lotto.csv", "lotto.csv.report.csv"
+        ]
+        with open(os.path.join(daemon.done, "lotto.1.csv.report.csv"), newline='', encoding='utf-8') as f:
+            assert len(list(csv.DictReader(f))) == 2
+    
+    def test_failed_file_keeps_audit_of_validated_rows(self, daemon, tmp_path):
+        """Test che le righe validate prima di un errore restino nell'audit."""
+        path = os.path.join(daemon.inbox, "misto.csv")
+        with open(path, 'wb') as f:
+            f.write(b"card_number\n" + b"4111111111111111\n" * 10 + b"\xff\xfe\n")
+        
+        assert daemon.wait_idle(timeout=10)
+        
+        assert sorted(os.listdir(daemon.failed)) == ["misto.csv", "misto.csv.error.txt"]
+        assert os.listdir(daemon.done) == []
+        with open(tmp_path / "audit.csv", newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 10
+        assert all(row['is_valid'] == 'Si' for row in rows)
+    
+    def test_process_pool(self, tmp_path):
+        """Test con pool di processi e audit condiviso."""
+        d = WatchFolderDaemon(
+            str(tmp_path / "watch"), workers=2, poll_interval=0.01, settle_seconds=0,
+            audit_file=str(tmp_path / "audit.csv")
+        )
+        try:
+            for i in range(3):
+                drop_file(d, f"lotto{i}.csv", ["4111111111111111", "5555555555554444"])
+            assert d.wait_idle(timeout=30)
+        finally:
+            d.close()
+        
+        assert d.stats()['files_done'] == 3
+        with open(tmp_path / "audit.csv", newline='', encoding='utf-8') as f:
+            assert len(list(csv.DictReader(f))) == 6